@@ -0,0 +1,63 @@
+# Copyright (C) 2018-present qi7chen@github. All rights reserved.
+# Distributed under the terms and conditions of the Apache License.
+# See accompanying files LICENSE.
+
+# JsonDataWriter转换数据行的耗时
+# 用法: python benchmarks/bench_json_writer.py [行数]
+
+import os
+import sys
+import time
+import random
+from argparse import Namespace
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from tabugen.parser.sheet_parser import SpreadSheetParser
+from tabugen.writer.json import JsonDataWriter
+import tabugen.predef as predef
+import tabugen.util.helper as helper
+
+
+def make_table(num_rows: int) -> list[list[str]]:
+    header = ['ID', 'Name', 'Level', 'Rate', 'Enable', 'Items', 'Drops', 'Cost[0]', 'Cost[1]', 'Cost[2]']
+    types = ['int', 'string', 'int16', 'float64', 'bool', 'int[]', '<string,int>', 'int', 'int', 'int']
+    table = [header, types]
+    for i in range(num_rows):
+        row = [
+            str(i + 1),
+            'name%d' % i,
+            str(random.randint(1, 100)),
+            '%.3f' % random.random(),
+            random.choice(['', '1']),
+            helper.Delim1.join(str(random.randint(1, 1000)) for _ in range(3)),
+            helper.Delim1.join(['Food:%d' % random.randint(1, 100), 'Gold:%d' % random.randint(1, 100)]),
+            str(random.randint(1, 100)),
+            str(random.randint(1, 100)),
+            str(random.randint(1, 100)),
+        ]
+        table.append(row)
+    return table
+
+
+def main():
+    num_rows = 200000
+    if len(sys.argv) > 1:
+        num_rows = int(sys.argv[1])
+
+    parser = SpreadSheetParser()
+    meta = {predef.PredefClassName: 'BenchConfig', predef.PredefParseKVMode: False}
+    struct = parser.parse_table_struct(meta, make_table(num_rows))
+    struct.options = meta
+    struct.parse_array_fields()
+
+    args = Namespace(legacy=False, narrow_int=False, json_snake_case=False)
+    writer = JsonDataWriter()
+    start = time.perf_counter()
+    rows = list(writer.generate(struct, args))
+    elapsed = time.perf_counter() - start
+    print('converted %d rows in %.3fs, %.0f rows/s' % (len(rows), elapsed, len(rows) / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# Copyright (C) 2018-present qi7chen@github. All rights reserved.
+# Distributed under the terms and conditions of the Apache License.
+# See accompanying files LICENSE.
+
+# 推导一列类型的耗时，对比逐个单元格调用parse_cell_type
+# 用法: python benchmarks/bench_type_infer.py [行数]
+
+import os
+import sys
+import time
+import random
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import tabugen.util.tableutil as tableutil
+
+
+def make_table(num_rows: int) -> list[list[str]]:
+    table = [['ID', 'Level', 'Rate', 'Name']]
+    for i in range(num_rows):
+        table.append([str(i + 1), str(random.randint(1, 100)), '%.3f' % random.random(), 'name%d' % i])
+    return table
+
+
+# 逐个单元格判断类型
+def infer_by_cell(table: list[list[str]], start_row: int, col: int) -> str:
+    type_name = ''
+    for n in range(start_row, len(table)):
+        kind = tableutil.parse_cell_type(table[n][col])
+        if type_name == '':
+            type_name = kind
+        elif type_name != kind:
+            return 'string'
+    return type_name
+
+
+def main():
+    num_rows = 200000
+    if len(sys.argv) > 1:
+        num_rows = int(sys.argv[1])
+
+    table = make_table(num_rows)
+    columns = range(len(table[0]))
+    start = time.perf_counter()
+    expected = [infer_by_cell(table, 1, col) for col in columns]
+    elapsed1 = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = [tableutil.infer_column_type(table, 1, col).type_name for col in columns]
+    elapsed2 = time.perf_counter() - start
+    assert result == expected, (result, expected)
+
+    policy = tableutil.SamplePolicy.parse('stratified:1000')
+    start = time.perf_counter()
+    sampled = [tableutil.infer_column_type(table, 1, col, policy).type_name for col in columns]
+    elapsed3 = time.perf_counter() - start
+    print('%d rows, types %s' % (num_rows, result))
+    print('parse_cell_type: %.3fs, infer_column_type: %.3fs, stratified:1000 %s %.4fs' % (
+        elapsed1, elapsed2, sampled, elapsed3))
+
+
+if __name__ == '__main__':
+    main()
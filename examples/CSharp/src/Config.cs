@@ -76,28 +76,25 @@ public struct ItemBoxDefine
         this.Total = Conv.ParseInt(table.GetRowCell("Total", rowIndex));
         this.Time = Conv.ParseInt(table.GetRowCell("Time", rowIndex));
         this.Repeat = table.GetRowCell("Repeat", rowIndex);
-        for (int col = 0; col < table.ColumnCount; col++) {
-            var name = string.Format("GoodsID[{}]", col);
+        foreach (var name in new string[] {"GoodsID[0]", "GoodsID[1]", "GoodsID[2]"}) {
             if (!table.HasColumn(name)) {
-                break;
+                continue;
             }
             var elem = table.GetRowCell(name, rowIndex);
             this.GoodsIDs.Add(elem);
         }
-        for (int col = 0; col < table.ColumnCount; col++) {
-            var name = string.Format("Num[{}]", col);
+        foreach (var name in new string[] {"Num[0]", "Num[1]", "Num[2]"}) {
             if (!table.HasColumn(name)) {
-                break;
+                continue;
             }
-            var elem = Conv.ParseLong(table.GetRowCell("Nums", rowIndex));
+            var elem = Conv.ParseLong(table.GetRowCell(name, rowIndex));
             this.Nums.Add(elem);
         }
-        for (int col = 0; col < table.ColumnCount; col++) {
-            var name = string.Format("Probability[{}]", col);
+        foreach (var name in new string[] {"Probability[0]", "Probability[1]", "Probability[2]"}) {
             if (!table.HasColumn(name)) {
-                break;
+                continue;
             }
-            var elem = Conv.ParseInt(table.GetRowCell("Probabilitys", rowIndex));
+            var elem = Conv.ParseInt(table.GetRowCell(name, rowIndex));
             this.Probabilitys.Add(elem);
         }
     }
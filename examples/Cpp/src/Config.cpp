@@ -33,74 +33,143 @@ int GlobalDefine::ParseFrom(const IDataFrame* table, GlobalDefine* ptr) {
     return 0;
 }
 
-int ItemBoxDefine::ParseRow(const IDataFrame* table, int rowIndex, ItemBoxDefine* ptr) {
-    ASSERT(ptr != nullptr);
-    ptr->ID = table->GetRowCell("ID", rowIndex);
-    ptr->Total = parseTo<int32_t>(table->GetRowCell("Total", rowIndex));
-    ptr->Time = parseTo<int32_t>(table->GetRowCell("Time", rowIndex));
-    ptr->Repeat = table->GetRowCell("Repeat", rowIndex);
-    for (int col = 0; col < table->GetColumnCount(); col++) {
-        const string& name = fmt::format("GoodsID[{}]", col);
-        if (!table->HasColumn(name)) {
-            break;
+void ItemBoxDefine::ResolveColumns(const IDataFrame* table, ColumnIndex* idx) {
+    ASSERT(idx != nullptr);
+    idx->ID = table->GetColumnIndex("ID");
+    idx->Total = table->GetColumnIndex("Total");
+    idx->Time = table->GetColumnIndex("Time");
+    idx->Repeat = table->GetColumnIndex("Repeat");
+    for (const char* name : {"GoodsID[0]", "GoodsID[1]", "GoodsID[2]"}) {
+        int col = table->GetColumnIndex(name);
+        if (col >= 0) {
+            idx->GoodsIDs.push_back(col);
         }
-        auto elem = table->GetRowCell(name, rowIndex);
-        ptr->GoodsIDs.push_back(elem);
     }
-    for (int col = 0; col < table->GetColumnCount(); col++) {
-        const string& name = fmt::format("Num[{}]", col);
-        if (!table->HasColumn(name)) {
-            break;
+    for (const char* name : {"Num[0]", "Num[1]", "Num[2]"}) {
+        int col = table->GetColumnIndex(name);
+        if (col >= 0) {
+            idx->Nums.push_back(col);
         }
-        auto elem = parseTo<int64_t>(table->GetRowCell(name, rowIndex));
-        ptr->Nums.push_back(elem);
     }
-    for (int col = 0; col < table->GetColumnCount(); col++) {
-        const string& name = fmt::format("Probability[{}]", col);
-        if (!table->HasColumn(name)) {
-            break;
+    for (const char* name : {"Probability[0]", "Probability[1]", "Probability[2]"}) {
+        int col = table->GetColumnIndex(name);
+        if (col >= 0) {
+            idx->Probabilitys.push_back(col);
         }
-        auto elem = parseTo<int32_t>(table->GetRowCell(name, rowIndex));
+    }
+}
+
+int ItemBoxDefine::ParseRow(const IDataFrame* table, const ColumnIndex& idx, int rowIndex, ItemBoxDefine* ptr) {
+    ASSERT(ptr != nullptr);
+    ptr->ID = table->GetCellAt(idx.ID, rowIndex);
+    ptr->Total = parseTo<int32_t>(table->GetCellAt(idx.Total, rowIndex));
+    ptr->Time = parseTo<int32_t>(table->GetCellAt(idx.Time, rowIndex));
+    ptr->Repeat = table->GetCellAt(idx.Repeat, rowIndex);
+    ptr->GoodsIDs.reserve(idx.GoodsIDs.size());
+    for (int col : idx.GoodsIDs) {
+        auto elem = table->GetCellAt(col, rowIndex);
+        ptr->GoodsIDs.push_back(elem);
+    }
+    ptr->Nums.reserve(idx.Nums.size());
+    for (int col : idx.Nums) {
+        auto elem = parseTo<int64_t>(table->GetCellAt(col, rowIndex));
+        ptr->Nums.push_back(elem);
+    }
+    ptr->Probabilitys.reserve(idx.Probabilitys.size());
+    for (int col : idx.Probabilitys) {
+        auto elem = parseTo<int32_t>(table->GetCellAt(col, rowIndex));
         ptr->Probabilitys.push_back(elem);
     }
     return 0;
 }
 
-int NewbieGuide::ParseRow(const IDataFrame* table, int rowIndex, NewbieGuide* ptr) {
+int ItemBoxDefine::ParseRow(const IDataFrame* table, int rowIndex, ItemBoxDefine* ptr) {
+    ColumnIndex idx;
+    ResolveColumns(table, &idx);
+    return ParseRow(table, idx, rowIndex, ptr);
+}
+
+void NewbieGuide::ResolveColumns(const IDataFrame* table, ColumnIndex* idx) {
+    ASSERT(idx != nullptr);
+    idx->Name = table->GetColumnIndex("Name");
+    idx->Desc = table->GetColumnIndex("Desc");
+    idx->Category = table->GetColumnIndex("Category");
+    idx->Target = table->GetColumnIndex("Target");
+    idx->Accomplishment = table->GetColumnIndex("Accomplishment");
+    idx->RewardGoods = table->GetColumnIndex("RewardGoods");
+}
+
+int NewbieGuide::ParseRow(const IDataFrame* table, const ColumnIndex& idx, int rowIndex, NewbieGuide* ptr) {
     ASSERT(ptr != nullptr);
-    ptr->Name = table->GetRowCell("Name", rowIndex);
-    ptr->Desc = table->GetRowCell("Desc", rowIndex);
-    ptr->Category = parseTo<int32_t>(table->GetRowCell("Category", rowIndex));
-    ptr->Target = table->GetRowCell("Target", rowIndex);
-    ptr->Accomplishment = parseArray<int>(table->GetRowCell("Accomplishment", rowIndex), TabDelim1);
-    ptr->RewardGoods = parseMap<string,int>(table->GetRowCell("RewardGoods", rowIndex), TabDelim1, TabDelim2);
+    ptr->Name = table->GetCellAt(idx.Name, rowIndex);
+    ptr->Desc = table->GetCellAt(idx.Desc, rowIndex);
+    ptr->Category = parseTo<int32_t>(table->GetCellAt(idx.Category, rowIndex));
+    ptr->Target = table->GetCellAt(idx.Target, rowIndex);
+    ptr->Accomplishment = parseArray<int>(table->GetCellAt(idx.Accomplishment, rowIndex), TabDelim1);
+    ptr->RewardGoods = parseMap<string,int>(table->GetCellAt(idx.RewardGoods, rowIndex), TabDelim1, TabDelim2);
     return 0;
 }
 
-int SoldierDefine::ParseRow(const IDataFrame* table, int rowIndex, SoldierDefine* ptr) {
+int NewbieGuide::ParseRow(const IDataFrame* table, int rowIndex, NewbieGuide* ptr) {
+    ColumnIndex idx;
+    ResolveColumns(table, &idx);
+    return ParseRow(table, idx, rowIndex, ptr);
+}
+
+void SoldierDefine::ResolveColumns(const IDataFrame* table, ColumnIndex* idx) {
+    ASSERT(idx != nullptr);
+    idx->ID = table->GetColumnIndex("ID");
+    idx->Name = table->GetColumnIndex("Name");
+    idx->Level = table->GetColumnIndex("Level");
+    idx->BuildingName = table->GetColumnIndex("BuildingName");
+    idx->BuildingLevel = table->GetColumnIndex("BuildingLevel");
+    idx->RequireSpace = table->GetColumnIndex("RequireSpace");
+    idx->Volume = table->GetColumnIndex("Volume");
+    idx->UpgradeTime = table->GetColumnIndex("UpgradeTime");
+    idx->UpgradeRes = table->GetColumnIndex("UpgradeRes");
+    idx->UpgradeCost = table->GetColumnIndex("UpgradeCost");
+    idx->ConsumeRes = table->GetColumnIndex("ConsumeRes");
+    idx->ConsumeCost = table->GetColumnIndex("ConsumeCost");
+    idx->ConsumeTime = table->GetColumnIndex("ConsumeTime");
+    idx->Act = table->GetColumnIndex("Act");
+    idx->Hp = table->GetColumnIndex("Hp");
+    idx->BombLoad = table->GetColumnIndex("BombLoad");
+    idx->AtkFrequency = table->GetColumnIndex("AtkFrequency");
+    idx->AtkRange = table->GetColumnIndex("AtkRange");
+    idx->MovingSpeed = table->GetColumnIndex("MovingSpeed");
+    idx->EnableBurn = table->GetColumnIndex("EnableBurn");
+}
+
+int SoldierDefine::ParseRow(const IDataFrame* table, const ColumnIndex& idx, int rowIndex, SoldierDefine* ptr) {
     ASSERT(ptr != nullptr);
-    ptr->ID = parseTo<int32_t>(table->GetRowCell("ID", rowIndex));
-    ptr->Name = table->GetRowCell("Name", rowIndex);
-    ptr->Level = parseTo<int32_t>(table->GetRowCell("Level", rowIndex));
-    ptr->BuildingName = table->GetRowCell("BuildingName", rowIndex);
-    ptr->BuildingLevel = parseTo<int32_t>(table->GetRowCell("BuildingLevel", rowIndex));
-    ptr->RequireSpace = parseTo<int32_t>(table->GetRowCell("RequireSpace", rowIndex));
-    ptr->Volume = parseTo<int32_t>(table->GetRowCell("Volume", rowIndex));
-    ptr->UpgradeTime = parseTo<int32_t>(table->GetRowCell("UpgradeTime", rowIndex));
-    ptr->UpgradeRes = table->GetRowCell("UpgradeRes", rowIndex);
-    ptr->UpgradeCost = parseTo<int32_t>(table->GetRowCell("UpgradeCost", rowIndex));
-    ptr->ConsumeRes = table->GetRowCell("ConsumeRes", rowIndex);
-    ptr->ConsumeCost = parseTo<int32_t>(table->GetRowCell("ConsumeCost", rowIndex));
-    ptr->ConsumeTime = parseTo<int32_t>(table->GetRowCell("ConsumeTime", rowIndex));
-    ptr->Act = parseTo<int32_t>(table->GetRowCell("Act", rowIndex));
-    ptr->Hp = parseTo<int32_t>(table->GetRowCell("Hp", rowIndex));
-    ptr->BombLoad = table->GetRowCell("BombLoad", rowIndex);
-    ptr->AtkFrequency = parseTo<double>(table->GetRowCell("AtkFrequency", rowIndex));
-    ptr->AtkRange = parseTo<double>(table->GetRowCell("AtkRange", rowIndex));
-    ptr->MovingSpeed = parseTo<double>(table->GetRowCell("MovingSpeed", rowIndex));
-    ptr->EnableBurn = table->GetRowCell("EnableBurn", rowIndex);
+    ptr->ID = parseTo<int32_t>(table->GetCellAt(idx.ID, rowIndex));
+    ptr->Name = table->GetCellAt(idx.Name, rowIndex);
+    ptr->Level = parseTo<int32_t>(table->GetCellAt(idx.Level, rowIndex));
+    ptr->BuildingName = table->GetCellAt(idx.BuildingName, rowIndex);
+    ptr->BuildingLevel = parseTo<int32_t>(table->GetCellAt(idx.BuildingLevel, rowIndex));
+    ptr->RequireSpace = parseTo<int32_t>(table->GetCellAt(idx.RequireSpace, rowIndex));
+    ptr->Volume = parseTo<int32_t>(table->GetCellAt(idx.Volume, rowIndex));
+    ptr->UpgradeTime = parseTo<int32_t>(table->GetCellAt(idx.UpgradeTime, rowIndex));
+    ptr->UpgradeRes = table->GetCellAt(idx.UpgradeRes, rowIndex);
+    ptr->UpgradeCost = parseTo<int32_t>(table->GetCellAt(idx.UpgradeCost, rowIndex));
+    ptr->ConsumeRes = table->GetCellAt(idx.ConsumeRes, rowIndex);
+    ptr->ConsumeCost = parseTo<int32_t>(table->GetCellAt(idx.ConsumeCost, rowIndex));
+    ptr->ConsumeTime = parseTo<int32_t>(table->GetCellAt(idx.ConsumeTime, rowIndex));
+    ptr->Act = parseTo<int32_t>(table->GetCellAt(idx.Act, rowIndex));
+    ptr->Hp = parseTo<int32_t>(table->GetCellAt(idx.Hp, rowIndex));
+    ptr->BombLoad = table->GetCellAt(idx.BombLoad, rowIndex);
+    ptr->AtkFrequency = parseTo<double>(table->GetCellAt(idx.AtkFrequency, rowIndex));
+    ptr->AtkRange = parseTo<double>(table->GetCellAt(idx.AtkRange, rowIndex));
+    ptr->MovingSpeed = parseTo<double>(table->GetCellAt(idx.MovingSpeed, rowIndex));
+    ptr->EnableBurn = table->GetCellAt(idx.EnableBurn, rowIndex);
     return 0;
 }
 
+int SoldierDefine::ParseRow(const IDataFrame* table, int rowIndex, SoldierDefine* ptr) {
+    ColumnIndex idx;
+    ResolveColumns(table, &idx);
+    return ParseRow(table, idx, rowIndex, ptr);
+}
+
 
 } // namespace config 
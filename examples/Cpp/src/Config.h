@@ -24,8 +24,11 @@ static const char* const TabDelim2 = ":";
 struct IDataFrame
 {
     virtual int GetColumnCount() const = 0;
+    virtual int GetRowCount() const = 0;
     virtual bool HasColumn(const std::string& name) const = 0;
     virtual std::string GetRowCell(const std::string& cell, int rowIndex) const = 0;
+    virtual int GetColumnIndex(const std::string& name) const = 0;         // -1 if column not found
+    virtual std::string GetCellAt(int column, int rowIndex) const = 0;      // empty string if column is -1
     virtual std::string GetKeyField(const std::string& key) const = 0;
 };
 
@@ -60,6 +63,17 @@ struct ItemBoxDefine
     vector<int64_t>    Nums;           // 道具数量
     vector<int32_t>    Probabilitys;   // 抽取概率
 
+    struct ColumnIndex {
+        int ID = -1;
+        int Total = -1;
+        int Time = -1;
+        int Repeat = -1;
+        vector<int> GoodsIDs;
+        vector<int> Nums;
+        vector<int> Probabilitys;
+    };
+    static void ResolveColumns(const IDataFrame* table, ColumnIndex* idx);
+    static int ParseRow(const IDataFrame* table, const ColumnIndex& idx, int rowIndex, ItemBoxDefine* ptr);
     static int ParseRow(const IDataFrame* table, int rowIndex, ItemBoxDefine* ptr);
 };
 
@@ -73,6 +87,16 @@ struct NewbieGuide
     vector<int>                   Accomplishment;     // 需要完成任务
     unordered_map<string, int>    RewardGoods;        // 任务奖励
 
+    struct ColumnIndex {
+        int Name = -1;
+        int Desc = -1;
+        int Category = -1;
+        int Target = -1;
+        int Accomplishment = -1;
+        int RewardGoods = -1;
+    };
+    static void ResolveColumns(const IDataFrame* table, ColumnIndex* idx);
+    static int ParseRow(const IDataFrame* table, const ColumnIndex& idx, int rowIndex, NewbieGuide* ptr);
     static int ParseRow(const IDataFrame* table, int rowIndex, NewbieGuide* ptr);
 };
 
@@ -100,6 +124,30 @@ struct SoldierDefine
     double     MovingSpeed = 0.0;      // 移动速度
     string     EnableBurn;             // 开启燃烧
 
+    struct ColumnIndex {
+        int ID = -1;
+        int Name = -1;
+        int Level = -1;
+        int BuildingName = -1;
+        int BuildingLevel = -1;
+        int RequireSpace = -1;
+        int Volume = -1;
+        int UpgradeTime = -1;
+        int UpgradeRes = -1;
+        int UpgradeCost = -1;
+        int ConsumeRes = -1;
+        int ConsumeCost = -1;
+        int ConsumeTime = -1;
+        int Act = -1;
+        int Hp = -1;
+        int BombLoad = -1;
+        int AtkFrequency = -1;
+        int AtkRange = -1;
+        int MovingSpeed = -1;
+        int EnableBurn = -1;
+    };
+    static void ResolveColumns(const IDataFrame* table, ColumnIndex* idx);
+    static int ParseRow(const IDataFrame* table, const ColumnIndex& idx, int rowIndex, SoldierDefine* ptr);
     static int ParseRow(const IDataFrame* table, int rowIndex, SoldierDefine* ptr);
 };
 
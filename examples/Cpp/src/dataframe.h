@@ -21,6 +21,11 @@ public:
         return (int)doc_.GetColumnCount();
     }
 
+    int GetRowCount() const override
+    {
+        return (int)doc_.GetRowCount();
+    }
+
     bool HasColumn(const std::string& name) const override
     {
         int colIdx = doc_.GetColumnIdx(name);
@@ -36,6 +41,19 @@ public:
         return "";
     }
 
+    int GetColumnIndex(const std::string& name) const override
+    {
+        return doc_.GetColumnIdx(name);
+    }
+
+    std::string GetCellAt(int column, int rowIndex) const override
+    {
+        if (column >= 0) {
+            return doc_.GetCell<std::string>(column, rowIndex);
+        }
+        return "";
+    }
+
     std::string GetKeyField(const std::string& key) const override
     {
         auto iter = table_.find(key);
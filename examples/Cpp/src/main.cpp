@@ -49,9 +49,11 @@ static void testSoldierConfig()
     auto filepath = fmt::format("{}/soldier_define.csv", resPath);
     rapidcsv::Document doc(filepath);
     DataFrame table(doc);
+    SoldierDefine::ColumnIndex idx;
+    SoldierDefine::ResolveColumns(&table, &idx);
     for (size_t row = 0; row < doc.GetRowCount(); row++) {
         config::SoldierDefine item;
-        SoldierDefine::ParseRow(&table, int(row), &item);
+        SoldierDefine::ParseRow(&table, idx, int(row), &item);
         printSoldierProperty(item);
     }
 }
@@ -87,9 +89,11 @@ static void testNewbieGuideConfig()
     auto filepath = fmt::format("{}/newbie_guide.csv", resPath);
     rapidcsv::Document doc(filepath);
     DataFrame table(doc);
+    NewbieGuide::ColumnIndex idx;
+    NewbieGuide::ResolveColumns(&table, &idx);
     for (size_t row = 0; row < doc.GetRowCount(); row++) {
         config::NewbieGuide item;
-        NewbieGuide::ParseRow(&table, int(row), &item);
+        NewbieGuide::ParseRow(&table, idx, int(row), &item);
         printNewbieGuide(item);
     }
 }
@@ -164,9 +168,11 @@ static void testBoxConfig()
     auto filepath = fmt::format("{}/item_box_define.csv", resPath);
     rapidcsv::Document doc(filepath);
     DataFrame table(doc);
+    ItemBoxDefine::ColumnIndex idx;
+    ItemBoxDefine::ResolveColumns(&table, &idx);
     for (size_t row = 0; row < doc.GetRowCount(); row++) {
         config::ItemBoxDefine item;
-        ItemBoxDefine::ParseRow(&table, int(row), &item);
+        ItemBoxDefine::ParseRow(&table, idx, int(row), &item);
         printBoxProbability(item);
     }
 }
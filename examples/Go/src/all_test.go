@@ -8,6 +8,7 @@ import (
 	"encoding/json"
 	"os"
 	"path/filepath"
+	"reflect"
 	"testing"
 )
 
@@ -140,3 +141,22 @@ func TestSoldierAutogenJsonConfig(t *testing.T) {
 		t.Logf("%v\n", cfg)
 	}
 }
+
+func TestSoldierParseAllCsvConfig(t *testing.T) {
+	filename := filepath.Join(basePath, "soldier_define.csv")
+	table, err := ReadCSVFileToTable(filename)
+	if err != nil {
+		t.Fatalf("%v", err)
+	}
+	var list = ParseAllSoldierDefine(table)
+	if len(list) != table.RowSize() {
+		t.Fatalf("unexpected size %d != %d", len(list), table.RowSize())
+	}
+	for row := 0; row < table.RowSize(); row++ {
+		var conf SoldierDefine
+		conf.ParseRow(table, row)
+		if !reflect.DeepEqual(conf, list[row]) {
+			t.Fatalf("row %d not equal: %v != %v", row, conf, list[row])
+		}
+	}
+}
@@ -54,37 +54,84 @@ type ItemBoxDefine struct {
 	Probabilitys []int32  // 抽取概率
 }
 
-func (p *ItemBoxDefine) ParseRow(table *GDTable, row int) {
-	p.ID = strings.TrimSpace(table.GetCell("ID", row))
-	p.Total = ParseI32(table.GetCell("Total", row))
-	p.Time = ParseI32(table.GetCell("Time", row))
-	p.Repeat = strings.TrimSpace(table.GetCell("Repeat", row))
-	for col := 0; col < table.ColSize(); col++ {
-		var name = fmt.Sprintf("GoodsID[%d]", col)
-		if !table.HasColumn(name) {
-			break
+// ItemBoxDefineColumns ItemBoxDefine的列位置
+type ItemBoxDefineColumns struct {
+	ID           int
+	Total        int
+	Time         int
+	Repeat       int
+	GoodsIDs     []int
+	Nums         []int
+	Probabilitys []int
+}
+
+func (c *ItemBoxDefineColumns) Resolve(table *GDTable) {
+	c.ID = table.ColumnIndex("ID")
+	c.Total = table.ColumnIndex("Total")
+	c.Time = table.ColumnIndex("Time")
+	c.Repeat = table.ColumnIndex("Repeat")
+	for _, name := range []string{"GoodsID[0]", "GoodsID[1]", "GoodsID[2]"} {
+		if col := table.ColumnIndex(name); col >= 0 {
+			c.GoodsIDs = append(c.GoodsIDs, col)
+		}
+	}
+	for _, name := range []string{"Num[0]", "Num[1]", "Num[2]"} {
+		if col := table.ColumnIndex(name); col >= 0 {
+			c.Nums = append(c.Nums, col)
+		}
+	}
+	for _, name := range []string{"Probability[0]", "Probability[1]", "Probability[2]"} {
+		if col := table.ColumnIndex(name); col >= 0 {
+			c.Probabilitys = append(c.Probabilitys, col)
+		}
+	}
+}
+
+func (p *ItemBoxDefine) ParseRowAt(table *GDTable, cols *ItemBoxDefineColumns, row int) {
+	p.ID = strings.TrimSpace(table.GetCellAt(cols.ID, row))
+	p.Total = ParseI32(table.GetCellAt(cols.Total, row))
+	p.Time = ParseI32(table.GetCellAt(cols.Time, row))
+	p.Repeat = strings.TrimSpace(table.GetCellAt(cols.Repeat, row))
+	if n := len(cols.GoodsIDs); n > 0 {
+		p.GoodsIDs = make([]string, 0, n)
+		for _, col := range cols.GoodsIDs {
+			var elem = strings.TrimSpace(table.GetCellAt(col, row))
+			p.GoodsIDs = append(p.GoodsIDs, elem)
 		}
-		var elem = strings.TrimSpace(table.GetCell(name, row))
-		p.GoodsIDs = append(p.GoodsIDs, elem)
 	}
-	for col := 0; col < table.ColSize(); col++ {
-		var name = fmt.Sprintf("Num[%d]", col)
-		if !table.HasColumn(name) {
-			break
+	if n := len(cols.Nums); n > 0 {
+		p.Nums = make([]int64, 0, n)
+		for _, col := range cols.Nums {
+			var elem = ParseI64(table.GetCellAt(col, row))
+			p.Nums = append(p.Nums, elem)
 		}
-		var elem = ParseI64(table.GetCell(name, row))
-		p.Nums = append(p.Nums, elem)
 	}
-	for col := 0; col < table.ColSize(); col++ {
-		var name = fmt.Sprintf("Probability[%d]", col)
-		if !table.HasColumn(name) {
-			break
+	if n := len(cols.Probabilitys); n > 0 {
+		p.Probabilitys = make([]int32, 0, n)
+		for _, col := range cols.Probabilitys {
+			var elem = ParseI32(table.GetCellAt(col, row))
+			p.Probabilitys = append(p.Probabilitys, elem)
 		}
-		var elem = ParseI32(table.GetCell(name, row))
-		p.Probabilitys = append(p.Probabilitys, elem)
 	}
 }
 
+func (p *ItemBoxDefine) ParseRow(table *GDTable, row int) {
+	var cols ItemBoxDefineColumns
+	cols.Resolve(table)
+	p.ParseRowAt(table, &cols, row)
+}
+
+// ParseAllItemBoxDefine 解析所有数据行
+func ParseAllItemBoxDefine(table *GDTable) []ItemBoxDefine {
+	var cols ItemBoxDefineColumns
+	cols.Resolve(table)
+	var list = make([]ItemBoxDefine, table.RowSize())
+	for i := range list {
+		list[i].ParseRowAt(table, &cols, i)
+	}
+	return list
+}
+
 // NewbieGuide, generated from NewbieGuide.xlsx
 type NewbieGuide struct {
 	Name           string           // 名称
@@ -95,13 +142,49 @@ type NewbieGuide struct {
 	RewardGoods    map[string]int32 // 任务奖励
 }
 
+// NewbieGuideColumns NewbieGuide的列位置
+type NewbieGuideColumns struct {
+	Name           int
+	Desc           int
+	Category       int
+	Target         int
+	Accomplishment int
+	RewardGoods    int
+}
+
+func (c *NewbieGuideColumns) Resolve(table *GDTable) {
+	c.Name = table.ColumnIndex("Name")
+	c.Desc = table.ColumnIndex("Desc")
+	c.Category = table.ColumnIndex("Category")
+	c.Target = table.ColumnIndex("Target")
+	c.Accomplishment = table.ColumnIndex("Accomplishment")
+	c.RewardGoods = table.ColumnIndex("RewardGoods")
+}
+
+func (p *NewbieGuide) ParseRowAt(table *GDTable, cols *NewbieGuideColumns, row int) {
+	p.Name = strings.TrimSpace(table.GetCellAt(cols.Name, row))
+	p.Desc = strings.TrimSpace(table.GetCellAt(cols.Desc, row))
+	p.Category = ParseI32(table.GetCellAt(cols.Category, row))
+	p.Target = strings.TrimSpace(table.GetCellAt(cols.Target, row))
+	p.Accomplishment = ParseSlice(table.GetCellAt(cols.Accomplishment, row), ParseI32)
+	p.RewardGoods = ParseMap(table.GetCellAt(cols.RewardGoods, row), strings.TrimSpace, ParseI32)
+}
+
 func (p *NewbieGuide) ParseRow(table *GDTable, row int) {
-	p.Name = strings.TrimSpace(table.GetCell("Name", row))
-	p.Desc = strings.TrimSpace(table.GetCell("Desc", row))
-	p.Category = ParseI32(table.GetCell("Category", row))
-	p.Target = strings.TrimSpace(table.GetCell("Target", row))
-	p.Accomplishment = ParseSlice(table.GetCell("Accomplishment", row), ParseI32)
-	p.RewardGoods = ParseMap(table.GetCell("RewardGoods", row), strings.TrimSpace, ParseI32)
+	var cols NewbieGuideColumns
+	cols.Resolve(table)
+	p.ParseRowAt(table, &cols, row)
+}
+
+// ParseAllNewbieGuide 解析所有数据行
+func ParseAllNewbieGuide(table *GDTable) []NewbieGuide {
+	var cols NewbieGuideColumns
+	cols.Resolve(table)
+	var list = make([]NewbieGuide, table.RowSize())
+	for i := range list {
+		list[i].ParseRowAt(table, &cols, i)
+	}
+	return list
 }
 
 // SoldierDefine, generated from Soldier.xlsx
@@ -128,25 +211,89 @@ type SoldierDefine struct {
 	EnableBurn    string  // 开启燃烧
 }
 
+// SoldierDefineColumns SoldierDefine的列位置
+type SoldierDefineColumns struct {
+	ID            int
+	Name          int
+	Level         int
+	BuildingName  int
+	BuildingLevel int
+	RequireSpace  int
+	Volume        int
+	UpgradeTime   int
+	UpgradeRes    int
+	UpgradeCost   int
+	ConsumeRes    int
+	ConsumeCost   int
+	ConsumeTime   int
+	Act           int
+	Hp            int
+	BombLoad      int
+	AtkFrequency  int
+	AtkRange      int
+	MovingSpeed   int
+	EnableBurn    int
+}
+
+func (c *SoldierDefineColumns) Resolve(table *GDTable) {
+	c.ID = table.ColumnIndex("ID")
+	c.Name = table.ColumnIndex("Name")
+	c.Level = table.ColumnIndex("Level")
+	c.BuildingName = table.ColumnIndex("BuildingName")
+	c.BuildingLevel = table.ColumnIndex("BuildingLevel")
+	c.RequireSpace = table.ColumnIndex("RequireSpace")
+	c.Volume = table.ColumnIndex("Volume")
+	c.UpgradeTime = table.ColumnIndex("UpgradeTime")
+	c.UpgradeRes = table.ColumnIndex("UpgradeRes")
+	c.UpgradeCost = table.ColumnIndex("UpgradeCost")
+	c.ConsumeRes = table.ColumnIndex("ConsumeRes")
+	c.ConsumeCost = table.ColumnIndex("ConsumeCost")
+	c.ConsumeTime = table.ColumnIndex("ConsumeTime")
+	c.Act = table.ColumnIndex("Act")
+	c.Hp = table.ColumnIndex("Hp")
+	c.BombLoad = table.ColumnIndex("BombLoad")
+	c.AtkFrequency = table.ColumnIndex("AtkFrequency")
+	c.AtkRange = table.ColumnIndex("AtkRange")
+	c.MovingSpeed = table.ColumnIndex("MovingSpeed")
+	c.EnableBurn = table.ColumnIndex("EnableBurn")
+}
+
+func (p *SoldierDefine) ParseRowAt(table *GDTable, cols *SoldierDefineColumns, row int) {
+	p.ID = ParseI32(table.GetCellAt(cols.ID, row))
+	p.Name = strings.TrimSpace(table.GetCellAt(cols.Name, row))
+	p.Level = ParseI32(table.GetCellAt(cols.Level, row))
+	p.BuildingName = strings.TrimSpace(table.GetCellAt(cols.BuildingName, row))
+	p.BuildingLevel = ParseI32(table.GetCellAt(cols.BuildingLevel, row))
+	p.RequireSpace = ParseI32(table.GetCellAt(cols.RequireSpace, row))
+	p.Volume = ParseI32(table.GetCellAt(cols.Volume, row))
+	p.UpgradeTime = ParseI32(table.GetCellAt(cols.UpgradeTime, row))
+	p.UpgradeRes = strings.TrimSpace(table.GetCellAt(cols.UpgradeRes, row))
+	p.UpgradeCost = ParseI32(table.GetCellAt(cols.UpgradeCost, row))
+	p.ConsumeRes = strings.TrimSpace(table.GetCellAt(cols.ConsumeRes, row))
+	p.ConsumeCost = ParseI32(table.GetCellAt(cols.ConsumeCost, row))
+	p.ConsumeTime = ParseI32(table.GetCellAt(cols.ConsumeTime, row))
+	p.Act = ParseI32(table.GetCellAt(cols.Act, row))
+	p.Hp = ParseI32(table.GetCellAt(cols.Hp, row))
+	p.BombLoad = strings.TrimSpace(table.GetCellAt(cols.BombLoad, row))
+	p.AtkFrequency = ParseF64(table.GetCellAt(cols.AtkFrequency, row))
+	p.AtkRange = ParseF64(table.GetCellAt(cols.AtkRange, row))
+	p.MovingSpeed = ParseF64(table.GetCellAt(cols.MovingSpeed, row))
+	p.EnableBurn = strings.TrimSpace(table.GetCellAt(cols.EnableBurn, row))
+}
+
 func (p *SoldierDefine) ParseRow(table *GDTable, row int) {
-	p.ID = ParseI32(table.GetCell("ID", row))
-	p.Name = strings.TrimSpace(table.GetCell("Name", row))
-	p.Level = ParseI32(table.GetCell("Level", row))
-	p.BuildingName = strings.TrimSpace(table.GetCell("BuildingName", row))
-	p.BuildingLevel = ParseI32(table.GetCell("BuildingLevel", row))
-	p.RequireSpace = ParseI32(table.GetCell("RequireSpace", row))
-	p.Volume = ParseI32(table.GetCell("Volume", row))
-	p.UpgradeTime = ParseI32(table.GetCell("UpgradeTime", row))
-	p.UpgradeRes = strings.TrimSpace(table.GetCell("UpgradeRes", row))
-	p.UpgradeCost = ParseI32(table.GetCell("UpgradeCost", row))
-	p.ConsumeRes = strings.TrimSpace(table.GetCell("ConsumeRes", row))
-	p.ConsumeCost = ParseI32(table.GetCell("ConsumeCost", row))
-	p.ConsumeTime = ParseI32(table.GetCell("ConsumeTime", row))
-	p.Act = ParseI32(table.GetCell("Act", row))
-	p.Hp = ParseI32(table.GetCell("Hp", row))
-	p.BombLoad = strings.TrimSpace(table.GetCell("BombLoad", row))
-	p.AtkFrequency = ParseF64(table.GetCell("AtkFrequency", row))
-	p.AtkRange = ParseF64(table.GetCell("AtkRange", row))
-	p.MovingSpeed = ParseF64(table.GetCell("MovingSpeed", row))
-	p.EnableBurn = strings.TrimSpace(table.GetCell("EnableBurn", row))
+	var cols SoldierDefineColumns
+	cols.Resolve(table)
+	p.ParseRowAt(table, &cols, row)
+}
+
+// ParseAllSoldierDefine 解析所有数据行
+func ParseAllSoldierDefine(table *GDTable) []SoldierDefine {
+	var cols SoldierDefineColumns
+	cols.Resolve(table)
+	var list = make([]SoldierDefine, table.RowSize())
+	for i := range list {
+		list[i].ParseRowAt(table, &cols, i)
+	}
+	return list
 }
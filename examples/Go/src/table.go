@@ -277,6 +277,25 @@ func (t *GDTable) GetCell(name string, rowIdx int) string {
 	return ""
 }
 
+// ColumnIndex 列的位置，列不存在返回-1
+func (t *GDTable) ColumnIndex(name string) int {
+	if col, ok := t.HeadNames[name]; ok {
+		return int(col)
+	}
+	return -1
+}
+
+// GetCellAt 获取指定列（位置）指定行的数据
+func (t *GDTable) GetCellAt(col, rowIdx int) string {
+	if col >= 0 && rowIdx >= 0 && rowIdx < len(t.Rows) {
+		var row = t.Rows[rowIdx]
+		if col < len(row) {
+			return row[col]
+		}
+	}
+	return ""
+}
+
 // GetRow 获取指定行的所有数据
 func (t *GDTable) GetRow(rowIdx int) []string {
 	if rowIdx >= 0 && rowIdx < t.RowSize() {
@@ -6,19 +6,26 @@
 
 
 import argparse
+import concurrent.futures
 import sys
 
 import tabugen.util.helper as helper
+import tabugen.util.tableutil as tableutil
+import tabugen.util.typedvalue as typedvalue
+import tabugen.util.trace as trace
 from tabugen.registry import get_struct_parser, get_code_generator, get_data_writer
 from tabugen.version import VER_STRING
+from tabugen.watch import WatchSession
 
 
 valid_delimiters = [':', ',', '|', '=']
 
+# 可以包含{kind}的输出路径参数
+output_path_options = ['cpp_out', 'go_out', 'cs_out', 'out_data_path']
 
-def run(args: argparse.Namespace):
-    parser = get_struct_parser('excel')
 
+# 根据参数创建代码生成器
+def create_code_generators(args: argparse.Namespace) -> list:
     pairs = [
         (args.cpp_out, 'cpp'),
         (args.go_out, 'go'),
@@ -34,31 +41,199 @@ def run(args: argparse.Namespace):
                 print('%s code generator is not implemented' % name.title())
                 sys.exit(1)
             code_generators.append((codegen, filepath))
+    return code_generators
 
-    if len(code_generators) == 0 and args.out_data_format is None:
-        print('no code generation and data output, nothing would happen')
-        sys.exit(1)
-
-    parser.init(args)
-    descriptors = parser.parse_all()
-    print(len(descriptors), 'file parsed')
 
+# 生成代码
+def generate_code(descriptors: list, code_generators: list, args: argparse.Namespace):
     if len(descriptors) > 0:
         for pair in code_generators:
             codegen = pair[0]
             filepath = pair[1]
             if args.gen_csv_parse:
                 codegen.enable_gen_parse('csv')
-            codegen.run(descriptors, filepath, args)
+            if args.gen_binary_parse:
+                codegen.enable_gen_parse('binary')
+            if args.embed_data:
+                codegen.enable_embed_data()
+            if args.reorder_fields:
+                codegen.enable_reorder_fields()
+            with trace.span('generate %s' % codegen.name(), 'codegen', path=filepath):
+                codegen.run(descriptors, filepath, args)
+
 
-    if not args.without_data and args.out_data_format is not None:
-        writer = get_data_writer(args.out_data_format)
-        if writer is None:
-            print('data writer %s not found' % args.out_data_format)
+# 导出格式及对应的输出路径，--out_data_format=csv,json
+# --out_data_path可以是所有格式共用的路径，也可以分别指定，如csv=res/server,json=res/tools
+def parse_data_outputs(args: argparse.Namespace) -> list[tuple[str, str]]:
+    formats = [x.strip() for x in args.out_data_format.split(',') if len(x.strip()) > 0]
+    paths = {}
+    if args.out_data_path.find('=') > 0:
+        paths = helper.parse_kv_to_dict(args.out_data_path)
+    outputs = []
+    for fmt in formats:
+        if get_data_writer(fmt) is None:
+            print('data writer %s not found' % fmt)
             sys.exit(1)
+        if fmt in [x[0] for x in outputs]:
+            print('data format %s is duplicated' % fmt)
+            sys.exit(1)
+        path = args.out_data_path
+        if len(paths) > 0:
+            if fmt not in paths:
+                print('output path of data format %s is not specified' % fmt)
+                sys.exit(1)
+            path = paths[fmt]
+        outputs.append((fmt, path))
+    return outputs
+
+
+def write_format_data(writer, descriptors: list, args: argparse.Namespace):
+    with trace.span('write %s' % writer.name(), 'write', path=args.out_data_path):
         writer.process(descriptors, args)
 
 
+# 导出数据，多个格式共享解析结果，各个格式的写入互不依赖，并行执行
+# 写入时的输出使用helper.log整行打印，避免多个线程的输出交错
+def write_data(descriptors: list, args: argparse.Namespace):
+    if args.without_data or args.out_data_format is None:
+        return
+    tasks = []
+    for fmt, path in parse_data_outputs(args):
+        out_args = argparse.Namespace(**vars(args))
+        out_args.out_data_format = fmt
+        out_args.out_data_path = path
+        tasks.append((get_data_writer(fmt), out_args))
+    # 统计内存时逐个格式写入，避免并行写入的内存互相干扰
+    if len(tasks) == 1 or trace.mem_enabled:
+        for writer, out_args in tasks:
+            write_format_data(writer, descriptors, out_args)
+        return
+    # 先完成类型转换，各个格式共享转换结果
+    for struct in descriptors:
+        typedvalue.get_typed_table(struct, args)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix='writer') as executor:
+        futures = [executor.submit(write_format_data, writer, descriptors, out_args) for writer, out_args in tasks]
+        for future in futures:
+            future.result()
+
+
+# 输出路径中的{kind}替换为项目类型
+def project_kind_args(args: argparse.Namespace, kind: str) -> argparse.Namespace:
+    kind_args = argparse.Namespace(**vars(args))
+    for name in output_path_options:
+        path = getattr(args, name)
+        if path is not None:
+            setattr(kind_args, name, path.replace('{kind}', kind))
+    return kind_args
+
+
+# 每个项目类型的导出参数和代码生成器
+def create_project_targets(args: argparse.Namespace) -> list:
+    kinds = [args.project_kind]
+    if args.project_kinds:
+        kinds = args.project_kinds
+    targets = []
+    for kind in kinds:
+        kind_args = project_kind_args(args, kind)
+        targets.append((kind, kind_args, create_code_generators(kind_args)))
+    return targets
+
+
+# 多个项目类型时从完整的解析结果中筛选出各自的字段
+def project_kind_views(descriptors: list, kind: str, args: argparse.Namespace) -> list:
+    if not args.project_kinds:
+        return descriptors
+    return [struct.project_kind_view(kind, args.legacy) for struct in descriptors]
+
+
+def generate_targets_code(descriptors: list, targets: list, args: argparse.Namespace):
+    for kind, kind_args, code_generators in targets:
+        generate_code(project_kind_views(descriptors, kind, args), code_generators, kind_args)
+
+
+def write_targets_data(descriptors: list, targets: list, args: argparse.Namespace):
+    for kind, kind_args, _ in targets:
+        write_data(project_kind_views(descriptors, kind, args), kind_args)
+
+
+def print_parse_errors(parser):
+    print('%d file(s) failed to parse:' % len(parser.errors))
+    for filename, _ in parser.errors:
+        print('   ', filename)
+
+
+# 解析并导出一次，监视模式返回WatchSession
+def export(parser, targets: list, args: argparse.Namespace):
+    parser.init(args)
+    descriptors = parser.parse_all()
+    print(len(descriptors), 'file parsed')
+    if args.mem_report:
+        trace.record_tables(descriptors)
+    if len(parser.errors) > 0:
+        print_parse_errors(parser)
+        if not args.watch:
+            sys.exit(1)
+
+    session = None
+    if args.watch:
+        session = WatchSession(parser, args,
+                               lambda structs: generate_targets_code(structs, targets, args),
+                               lambda structs: write_targets_data(structs, targets, args))
+        session.track(descriptors)
+
+    generate_targets_code(descriptors, targets, args)
+    write_targets_data(descriptors, targets, args)
+    return session
+
+
+# 流水线模式，每个文件解析后立即导出数据并释放数据行，只保留生成代码需要的结构定义
+# 内存占用取决于最大的单个文件，而不是所有文件的总和
+def export_pipeline(parser, targets: list, args: argparse.Namespace):
+    parser.init(args)
+    descriptors = []
+    for struct in parser.iter_parse():
+        if args.mem_report:
+            trace.record_tables([struct])
+        write_targets_data([struct], targets, args)
+        # 嵌入到代码中的数据需要保留到生成代码
+        if not (args.embed_data and typedvalue.can_embed(struct, args)):
+            struct.release_data()
+        descriptors.append(struct)
+    print(len(descriptors), 'file parsed')
+    if len(parser.errors) > 0:
+        print_parse_errors(parser)
+        sys.exit(1)
+    generate_targets_code(descriptors, targets, args)
+
+
+def run(args: argparse.Namespace):
+    parser = get_struct_parser('excel')
+    targets = create_project_targets(args)
+
+    if len(targets[0][2]) == 0 and args.out_data_format is None:
+        print('no code generation and data output, nothing would happen')
+        sys.exit(1)
+
+    if args.trace:
+        trace.enable()
+    if args.mem_report:
+        trace.enable_memory()
+    try:
+        if args.pipeline:
+            session = export_pipeline(parser, targets, args)
+        else:
+            session = export(parser, targets, args)
+    finally:
+        # 解析失败退出时也保存已经记录的事件
+        if args.trace:
+            trace.save(args.trace)
+        if args.mem_report:
+            trace.print_memory_report()
+
+    if session is not None:
+        session.run_forever()
+
+
 # 校验参数
 def verify_args(args: argparse.Namespace):
     if args.package is None:
@@ -67,6 +242,39 @@ def verify_args(args: argparse.Namespace):
     if args.delim2 == args.delim1:
         print('delim1 and delim2 must be different')
         sys.exit(1)
+    if args.pipeline and args.watch:
+        print('--pipeline and --watch can not be used together')
+        sys.exit(1)
+    if args.embed_data and (args.without_data or args.watch):
+        print('--embed_data can not be used with --without_data or --watch')
+        sys.exit(1)
+    if args.project_kinds:
+        if args.project_kind:
+            print('--project_kind and --project_kinds can not be used together')
+            sys.exit(1)
+        args.project_kinds = [x.strip().upper() for x in args.project_kinds.split(',') if len(x.strip()) > 0]
+        if len(args.project_kinds) > 1:
+            for name in output_path_options:
+                path = getattr(args, name)
+                if name == 'out_data_path' and (args.without_data or args.out_data_format is None):
+                    continue
+                if path is not None and path.find('{kind}') < 0:
+                    print('--%s must contain {kind} when exporting multiple project kinds' % name)
+                    sys.exit(1)
+    if args.row_filter:
+        try:
+            tableutil.parse_row_filters(args.row_filter)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+    if args.infer_sample:
+        try:
+            tableutil.SamplePolicy.parse(args.infer_sample)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+    if args.out_data_format is not None and not args.without_data:
+        parse_data_outputs(args)
     if args.delim1 in valid_delimiters:
         helper.Delim1 = args.delim1
     if args.delim2 in valid_delimiters:
@@ -80,14 +288,44 @@ def main():
     parser.add_argument("--file_asset", action='append', help="文件名或者文件夹路径")
     parser.add_argument("--file_skip", action='append', help="需要跳过解析的文件名列表")
     parser.add_argument("--without_data", action="store_true", help="只生成类型定义")
+    parser.add_argument("--jobs", type=int, default=1, help="并行解析文件的进程数，0表示使用全部CPU核心")
+    parser.add_argument("--cache_dir", default='', help="解析结果的缓存目录，未修改的文件直接从缓存加载")
+    parser.add_argument("--xlsx_reader", default='openpyxl', choices=['openpyxl', 'stream'],
+                        help="读取.xlsx文件的方式，stream为直接流式解析xml，适合行数很多的表格")
+    parser.add_argument("--schema_rows", type=int, default=0,
+                        help="配合--without_data使用，每个sheet最多读取的行数(含表头)，0表示全部读取")
+    parser.add_argument("--infer_sample", default='',
+                        help="推导类型时的采样方式: all, head:N(前N行), stratified:N(均匀抽取N行)，默认数组和字典只检查前20行")
+    parser.add_argument("--infer_strict", action="store_true", help="推导类型时打印导致类型退化为字符串的行")
+    parser.add_argument("--narrow_int", action="store_true",
+                        help="按数据的取值范围把整数字段缩小为能容纳的最小类型，并检查导出的数据是否溢出")
+    parser.add_argument("--row_filter", action="append",
+                        help="读取时按列的值过滤数据行，如Env=dev,all，空白单元格总是保留，可以指定多次")
+    parser.add_argument("--trace", default='', help="输出各个阶段耗时的trace文件(Chrome/Perfetto格式)，如trace.json")
+    parser.add_argument("--mem_report", action="store_true",
+                        help="使用tracemalloc统计每个文件和每个阶段的内存峰值，输出占用最多的文件、表格和阶段")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="逐个文件解析并导出数据，导出后释放数据行，内存占用不随文件数量增长")
+    parser.add_argument("--watch", action="store_true", help="监视文件修改，只重新解析和导出修改过的文件")
+    parser.add_argument("--watch_interval", type=float, default=0.5, help="监视模式检查文件修改的间隔秒数")
     parser.add_argument("--project_kind", default='', help="指定包含此前缀的名称才纳入解析")
+    parser.add_argument("--project_kinds", default='',
+                        help="逗号分隔的多个项目类型，只解析一次并分别导出，输出路径用{kind}表示项目类型")
     parser.add_argument("--delim1", default="|", help="列表元素分隔符")
     parser.add_argument("--delim2", default=":", help="键值分隔符")
     parser.add_argument("--gen_csv_parse", action='store_true', help="生成csv读取代码")
+    parser.add_argument("--gen_binary_parse", action='store_true',
+                        help="生成以内存映射方式读取二进制数据文件的代码(C++和Go)")
     parser.add_argument("--cpp_out", help="指定生成C++代码的文件名")
     parser.add_argument("--go_out", help="指定生成Go代码的路径")
     parser.add_argument("--cs_out", help="指定生成C#代码的路径")
     parser.add_argument("--package", default="config", help="指定命名空间或者包名")
+    parser.add_argument("--embed_data", action="store_true", help="把数据作为静态常量嵌入到生成的代码中")
+    parser.add_argument("--embed_max_rows", type=int, default=1000, help="嵌入到代码中的表格最多的行数，超过的表格仍然通过数据文件加载")
+    parser.add_argument("--embed_max_bytes", type=int, default=256 * 1024,
+                        help="嵌入到代码中的表格最大的文本字节数，超过的表格仍然通过数据文件加载")
+    parser.add_argument("--reorder_fields", action="store_true",
+                        help="按对齐从大到小重新排列生成的结构字段以减少填充(C++和Go)，并打印重排前后的结构大小估算")
     parser.add_argument("--cpp_pch", help="指定C++包含的预编译头")
     parser.add_argument("--extra_cpp_includes", default="", help="额外包含的C++头文件")
     parser.add_argument("--go_fmt", action="store_true", help="生成Go代码后执行go fmt")
@@ -95,9 +333,10 @@ def main():
     # output options
     parser.add_argument("--source_file_encoding", default="utf8", help="生成代码的文件编码格式")
     parser.add_argument("--data_file_encoding", default="utf8", help="导出数据的文件编码格式")
-    parser.add_argument("--out_data_format", default='csv', help="导出数据的格式(csv,json)")
-    parser.add_argument("--out_data_path", default=".", help="导出数据文件的路径")
+    parser.add_argument("--out_data_format", default='csv', help="导出数据的格式(csv,json,binary)，多个格式用逗号分隔")
+    parser.add_argument("--out_data_path", default=".", help="导出数据文件的路径，多个格式可以分别指定，如csv=res,json=tools")
     parser.add_argument("--json_indent", action="store_true", help="导出的JSON使用缩进格式")
+    parser.add_argument("--json_lines", action="store_true", help="导出JSON Lines格式(.jsonl)，每行一个对象")
     parser.add_argument("--json_snake_case", action="store_true", help="导出的JSON使用snake_case")
 
     args = parser.parse_args()
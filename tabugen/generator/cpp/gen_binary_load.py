@@ -0,0 +1,343 @@
+# Copyright (C) 2024 qi7chen@github. All rights reserved.
+# Distributed under the terms and conditions of the Apache License.
+# See accompanying files LICENSE.
+
+from argparse import Namespace
+import tabugen.lang as lang
+import tabugen.typedef as types
+import tabugen.predef as predef
+from tabugen.typedef import Type
+from tabugen.structs import Struct
+from tabugen.writer.binary import BinaryDataWriter, BinaryColumn, schema_fingerprint
+
+
+# 内存映射二进制数据文件的运行时，格式见`tabugen/writer/binary.py`
+cpp_binary_runtime_template = """
+// memory-mapped table file exported by `--out_data_format=binary`.
+// the file is mapped read-only and shared by all processes, values are read in place.
+class BinaryTable;
+
+template <typename T>
+struct BinaryArray;
+
+template <typename K, typename V>
+struct BinaryMap;
+
+class BinaryTable
+{
+public:
+    enum { HeaderSize = 48, ColumnSize = 24, Version = 1, FlagKVMode = 1 };
+
+    BinaryTable() = default;
+    ~BinaryTable() { Close(); }
+    BinaryTable(const BinaryTable&) = delete;
+    BinaryTable& operator=(const BinaryTable&) = delete;
+
+    // returns empty string on success, otherwise the error message
+    string Open(const string& filename, uint64_t fingerprint)
+    {
+        Close();
+        string err = Map(filename);
+        if (err.empty()) {
+            err = Verify(fingerprint);
+        }
+        if (!err.empty()) {
+            Close();
+            return filename + ": " + err;
+        }
+        return err;
+    }
+
+    void Close()
+    {
+        if (data_ != nullptr) {
+#ifdef _WIN32
+            UnmapViewOfFile(data_);
+#else
+            munmap(const_cast<uint8_t*>(data_), size_);
+#endif
+        }
+        data_ = nullptr;
+        size_ = 0;
+    }
+
+    bool IsOpen() const { return data_ != nullptr; }
+    size_t RowCount() const { return ReadAt<uint32_t>(16); }
+    size_t ColumnCount() const { return ReadAt<uint32_t>(20); }
+    bool IsKVMode() const { return (ReadAt<uint16_t>(6) & FlagKVMode) != 0; }
+
+    // size of a value in column data and pools, strings are indexes of the string table
+    template <typename T>
+    static constexpr size_t ValueSize()
+    {
+        if constexpr (std::is_same_v<T, string_view>) {
+            return sizeof(uint32_t);
+        } else {
+            return sizeof(T);
+        }
+    }
+
+    template <typename T>
+    T ReadAt(size_t offset) const
+    {
+        if constexpr (std::is_same_v<T, string_view>) {
+            return StringAt(ReadAt<uint32_t>(offset));
+        } else if constexpr (std::is_same_v<T, bool>) {
+            return data_[offset] != 0;
+        } else {
+            T value;
+            memcpy(&value, data_ + offset, sizeof(T));
+            return value;
+        }
+    }
+
+    string_view StringAt(uint32_t index) const
+    {
+        size_t strings = ReadAt<uint32_t>(28);
+        size_t count = ReadAt<uint32_t>(32);
+        uint32_t start = ReadAt<uint32_t>(strings + index * 4);
+        uint32_t end = ReadAt<uint32_t>(strings + index * 4 + 4);
+        const char* base = reinterpret_cast<const char*>(data_ + strings + (count + 1) * 4);
+        return string_view(base + start, end - start);
+    }
+
+    // column descriptor fields: data, pool, pool2
+    size_t ColumnOffset(int column, int which) const
+    {
+        return ReadAt<uint32_t>(HeaderSize + column * ColumnSize + 8 + which * 4);
+    }
+
+    template <typename T>
+    T Get(int column, size_t row) const
+    {
+        return ReadAt<T>(ColumnOffset(column, 0) + row * ValueSize<T>());
+    }
+
+    template <typename T>
+    BinaryArray<T> GetArray(int column, size_t row) const
+    {
+        size_t span = ColumnOffset(column, 0) + row * 8;
+        size_t start = ReadAt<uint32_t>(span);
+        size_t count = ReadAt<uint32_t>(span + 4);
+        return BinaryArray<T>{this, ColumnOffset(column, 1) + start * ValueSize<T>(), count};
+    }
+
+    template <typename K, typename V>
+    BinaryMap<K, V> GetMap(int column, size_t row) const
+    {
+        size_t span = ColumnOffset(column, 0) + row * 8;
+        size_t start = ReadAt<uint32_t>(span);
+        size_t count = ReadAt<uint32_t>(span + 4);
+        return BinaryMap<K, V>{this, ColumnOffset(column, 1) + start * ValueSize<K>(),
+            ColumnOffset(column, 2) + start * ValueSize<V>(), count};
+    }
+
+private:
+    string Map(const string& filename)
+    {
+#ifdef _WIN32
+        HANDLE file = CreateFileA(filename.c_str(), GENERIC_READ, FILE_SHARE_READ, NULL, OPEN_EXISTING, FILE_ATTRIBUTE_NORMAL, NULL);
+        if (file == INVALID_HANDLE_VALUE) {
+            return "open file failed";
+        }
+        LARGE_INTEGER size;
+        if (!GetFileSizeEx(file, &size) || size.QuadPart < HeaderSize) {
+            CloseHandle(file);
+            return "invalid file size";
+        }
+        HANDLE mapping = CreateFileMappingA(file, NULL, PAGE_READONLY, 0, 0, NULL);
+        CloseHandle(file);
+        if (mapping == NULL) {
+            return "create file mapping failed";
+        }
+        void* addr = MapViewOfFile(mapping, FILE_MAP_READ, 0, 0, 0);
+        CloseHandle(mapping);
+        if (addr == NULL) {
+            return "map view of file failed";
+        }
+        data_ = static_cast<const uint8_t*>(addr);
+        size_ = size_t(size.QuadPart);
+#else
+        int fd = open(filename.c_str(), O_RDONLY);
+        if (fd < 0) {
+            return "open file failed";
+        }
+        struct stat st;
+        if (fstat(fd, &st) != 0 || st.st_size < HeaderSize) {
+            close(fd);
+            return "invalid file size";
+        }
+        void* addr = mmap(nullptr, size_t(st.st_size), PROT_READ, MAP_SHARED, fd, 0);
+        close(fd);
+        if (addr == MAP_FAILED) {
+            return "mmap failed";
+        }
+        data_ = static_cast<const uint8_t*>(addr);
+        size_ = size_t(st.st_size);
+#endif
+        return "";
+    }
+
+    string Verify(uint64_t fingerprint) const
+    {
+        if (memcmp(data_, "TABU", 4) != 0) {
+            return "not a tabugen binary file";
+        }
+        if (ReadAt<uint16_t>(4) != Version) {
+            return "unsupported binary version";
+        }
+        if (ReadAt<uint32_t>(40) != size_) {
+            return "file size mismatch";
+        }
+        if (ReadAt<uint64_t>(8) != fingerprint) {
+            return "schema fingerprint mismatch";
+        }
+        return "";
+    }
+
+    const uint8_t* data_ = nullptr;
+    size_t size_ = 0;
+};
+
+// array elements in the pool of a binary table column
+template <typename T>
+struct BinaryArray
+{
+    const BinaryTable* table = nullptr;
+    size_t offset = 0;
+    size_t count = 0;
+
+    size_t size() const { return count; }
+    bool empty() const { return count == 0; }
+    T operator[](size_t i) const { return table->ReadAt<T>(offset + i * BinaryTable::ValueSize<T>()); }
+};
+
+// map items in the pools of a binary table column
+template <typename K, typename V>
+struct BinaryMap
+{
+    const BinaryTable* table = nullptr;
+    size_t keyOffset = 0;
+    size_t valueOffset = 0;
+    size_t count = 0;
+
+    size_t size() const { return count; }
+    bool empty() const { return count == 0; }
+    K KeyAt(size_t i) const { return table->ReadAt<K>(keyOffset + i * BinaryTable::ValueSize<K>()); }
+    V ValueAt(size_t i) const { return table->ReadAt<V>(valueOffset + i * BinaryTable::ValueSize<V>()); }
+
+    // linear search, maps in config tables are usually small
+    bool Find(const K& key, V* value) const
+    {
+        for (size_t i = 0; i < count; i++) {
+            if (KeyAt(i) == key) {
+                *value = ValueAt(i);
+                return true;
+            }
+        }
+        return false;
+    }
+};
+
+"""
+
+
+# 生成C++按内存映射读取二进制数据文件的代码，每一行是直接访问映射内存的视图
+class CppBinaryLoadGenerator:
+    TAB_SPACE = '    '
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def include_headers() -> list[str]:
+        return [
+            '#include <cstring>',
+            '#include <type_traits>',
+            '#ifdef _WIN32',
+            '#include <windows.h>',
+            '#else',
+            '#include <fcntl.h>',
+            '#include <unistd.h>',
+            '#include <sys/mman.h>',
+            '#include <sys/stat.h>',
+            '#endif',
+        ]
+
+    @staticmethod
+    def gen_runtime() -> str:
+        return cpp_binary_runtime_template
+
+    # 列中值的类型，字符串为string_view
+    @staticmethod
+    def map_value_type(typ: Type) -> str:
+        if typ == Type.String:
+            return 'string_view'
+        return lang.map_cpp_type(types.get_name_of_type(typ))
+
+    def gen_getter(self, name: str, column: BinaryColumn, index: int) -> str:
+        if column.type == Type.Array:
+            typename = 'BinaryArray<%s>' % self.map_value_type(column.value_type)
+            expr = 'table->GetArray<%s>(%d, row)' % (self.map_value_type(column.value_type), index)
+        elif column.type == Type.Map:
+            kv_types = '%s, %s' % (self.map_value_type(column.key_type), self.map_value_type(column.value_type))
+            typename = 'BinaryMap<%s>' % kv_types
+            expr = 'table->GetMap<%s>(%d, row)' % (kv_types, index)
+        else:
+            typename = self.map_value_type(column.type)
+            expr = 'table->Get<%s>(%d, row)' % (typename, index)
+        return '%s%s %s() const { return %s; }\n' % (self.TAB_SPACE, typename, name, expr)
+
+    # 二维数组的每一行是连续的列，按行号访问
+    def gen_nested_getter(self, name: str, column: BinaryColumn, index: int, count: int) -> str:
+        elem_type = self.map_value_type(column.value_type)
+        content = '%s// i < %d\n' % (self.TAB_SPACE, count)
+        content += '%sBinaryArray<%s> %s(size_t i) const { return table->GetArray<%s>(%d + int(i), row); }\n' % (
+            self.TAB_SPACE, elem_type, name, elem_type, index)
+        return content
+
+    def gen_view_getters(self, struct: Struct, columns: list[BinaryColumn]) -> str:
+        content = ''
+        if struct.options[predef.PredefParseKVMode]:
+            index = {column.name: i for i, column in enumerate(columns)}
+            for field in struct.kv_fields:
+                i = index.get(field.name.strip())
+                if i is not None:
+                    content += self.gen_getter(field.name, columns[i], i)
+            return content
+        for i, field in enumerate(struct.fields):
+            content += self.gen_getter(field.name, columns[i], i)
+        index = len(struct.fields)
+        for array in struct.array_fields:
+            if array.is_nested():
+                count = len(array.element_rows)
+                content += self.gen_nested_getter(array.field_name, columns[index], index, count)
+                index += count
+            else:
+                content += self.gen_getter(array.field_name, columns[index], index)
+                index += 1
+        return content
+
+    def generate(self, struct: Struct, args: Namespace) -> str:
+        columns = BinaryDataWriter.struct_columns(struct, args)
+        name = struct.camel_case_name
+        content = '// %s row view over the memory-mapped binary table\n' % name
+        content += 'struct %sView \n{\n' % name
+        content += '    const BinaryTable* table = nullptr;\n'
+        content += '    size_t row = 0;\n\n'
+        content += self.gen_view_getters(struct, columns)
+        content += '};\n\n'
+
+        content += '// %s binary table file, rows are views of the mapped memory\n' % name
+        content += 'struct %sBinaryTable \n{\n' % name
+        content += '    static constexpr uint64_t Fingerprint = 0x%016xULL;\n\n' % schema_fingerprint(columns)
+        content += '    BinaryTable File;\n\n'
+        content += '    // returns empty string on success, otherwise the error message\n'
+        content += '    string Open(const string& filename) { return File.Open(filename, Fingerprint); }\n'
+        if struct.options[predef.PredefParseKVMode]:
+            content += '    %sView Get() const { return %sView{&File, 0}; }\n' % (name, name)
+        else:
+            content += '    size_t Size() const { return File.RowCount(); }\n'
+            content += '    %sView Row(size_t i) const { return %sView{&File, i}; }\n' % (name, name)
+        content += '};\n\n'
+        return content
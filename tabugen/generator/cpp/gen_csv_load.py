@@ -8,7 +8,8 @@ import tabugen.typedef as types
 import tabugen.predef as predef
 import tabugen.lang as lang
 import tabugen.version as version
-from tabugen.structs import Struct
+from tabugen.util.tableutil import get_unique_fields, is_columnar_layout
+from tabugen.structs import Struct, ArrayField
 
 
 # 生成C++加载CSV文件数据代码
@@ -43,55 +44,113 @@ class CppCsvLoadGenerator:
                 content += '%s%s%s = parseTo<%s>(%s);\n' % (space, prefix, field_name, cpp_type, value_text)
         return content
 
+    # 按预先解析的列索引读取单元格
     def gen_field_assign2(self, prefix: str, origin_typename: str, field_name: str,  tabs: int) -> str:
-        content = ''
+        value_text = 'table->GetCellAt(idx.%s, rowIndex)' % field_name
+        return self.gen_field_assign1(prefix, origin_typename, field_name, value_text, tabs)
+
+    # 生成列索引结构定义
+    def gen_column_index_define(self, struct: Struct) -> str:
+        content = '    struct ColumnIndex {\n'
+        for field in struct.fields:
+            content += '        int %s = -1;\n' % field.name
+        for array in struct.array_fields:
+            if array.is_nested():
+                content += '        vector<vector<int>> %s;\n' % array.field_name
+            else:
+                content += '        vector<int> %s;\n' % array.field_name
+        content += '    };\n'
+        return content
+
+    # 生成`ResolveColumns`方法，每个表只需要查找一次列索引
+    # 数组元素按解析时的列名查找，下标可以不连续，数据表中不存在的列跳过
+    def gen_resolve_method(self, struct: Struct) -> str:
+        content = 'void %s::ResolveColumns(const IDataFrame* table, ColumnIndex* idx) {\n' % struct.name
+        content += '    ASSERT(idx != nullptr);\n'
+        for field in struct.fields:
+            content += '    idx->%s = table->GetColumnIndex("%s");\n' % (field.name, field.name)
+        for array in struct.array_fields:
+            if array.is_nested():
+                content += self.gen_resolve_nested_array(array)
+                continue
+            names = ', '.join('"%s"' % elem.name for elem in array.element_fields)
+            content += '    for (const char* name : {%s}) {\n' % names
+            content += '        int col = table->GetColumnIndex(name);\n'
+            content += '        if (col >= 0) {\n'
+            content += '            idx->%s.push_back(col);\n' % array.field_name
+            content += '        }\n'
+            content += '    }\n'
+        content += '}\n\n'
+        return content
+
+    # 二维数组name[i][j]的列索引
+    @staticmethod
+    def gen_resolve_nested_array(array: ArrayField) -> str:
+        rows = ', '.join('{%s}' % ', '.join('"%s"' % elem.name for elem in row) for row in array.element_rows)
+        content = '    for (const auto& names : vector<vector<const char*>>{%s}) {\n' % rows
+        content += '        vector<int> cols;\n'
+        content += '        for (const char* name : names) {\n'
+        content += '            int col = table->GetColumnIndex(name);\n'
+        content += '            if (col >= 0) {\n'
+        content += '                cols.push_back(col);\n'
+        content += '            }\n'
+        content += '        }\n'
+        content += '        if (!cols.empty()) {\n'
+        content += '            idx->%s.push_back(std::move(cols));\n' % array.field_name
+        content += '        }\n'
+        content += '    }\n'
+        return content
+
+    # 读取数组的所有元素到target，二维数组按行读取
+    def gen_parse_array(self, array: ArrayField, target: str, tabs: int) -> str:
+        origin_typename = array.element_fields[0].origin_type_name
+        cpp_type = lang.map_cpp_type(origin_typename)
+        name = array.field_name
         space = self.TAB_SPACE * tabs
-        if types.is_array_type(origin_typename):
-            cpp_type = lang.map_cpp_type(types.array_element_type(origin_typename))
-            value_text = 'table->GetRowCell("%s", rowIndex)' % field_name
-            content += '%s%s%s = parseArray<%s>(%s, TabDelim1);\n' % (space, prefix, field_name, cpp_type, value_text)
-        elif types.is_map_type(origin_typename):
-            (key_type, val_type) = types.map_key_value_types(origin_typename)
-            cpp_type1 = lang.map_cpp_type(key_type)
-            cpp_type2 = lang.map_cpp_type(val_type)
-            value_text = 'table->GetRowCell("%s", rowIndex)' % field_name
-            content += '%s%s%s = parseMap<%s,%s>(%s, TabDelim1, TabDelim2);\n' % (space, prefix, field_name, cpp_type1, cpp_type2, value_text)
+        if origin_typename == 'string':
+            elem_text = 'table->GetCellAt(col, rowIndex)'
         else:
-            cpp_type = lang.map_cpp_type(origin_typename)
-            if origin_typename == 'string':
-                content += '%s%s%s = table->GetRowCell("%s", rowIndex);\n' % (space, prefix, field_name, field_name)
-            else:
-                content += '%s%s%s = parseTo<%s>(table->GetRowCell("%s", rowIndex));\n' % (space, prefix, field_name, cpp_type, field_name)
+            elem_text = 'parseTo<%s>(table->GetCellAt(col, rowIndex))' % cpp_type
+        if not array.is_nested():
+            content = '%s%s.reserve(idx.%s.size());\n' % (space, target, name)
+            content += '%sfor (int col : idx.%s) {\n' % (space, name)
+            content += '%s    auto elem = %s;\n' % (space, elem_text)
+            content += '%s    %s.push_back(elem);\n' % (space, target)
+            content += '%s}\n' % space
+            return content
+        content = '%s%s.resize(idx.%s.size());\n' % (space, target, name)
+        content += '%sfor (size_t i = 0; i < idx.%s.size(); i++) {\n' % (space, name)
+        content += '%s    auto& row = %s[i];\n' % (space, target)
+        content += '%s    row.reserve(idx.%s[i].size());\n' % (space, name)
+        content += '%s    for (int col : idx.%s[i]) {\n' % (space, name)
+        content += '%s        auto elem = %s;\n' % (space, elem_text)
+        content += '%s        row.push_back(elem);\n' % space
+        content += '%s    }\n' % space
+        content += '%s}\n' % space
         return content
 
     # 生成`ParseRow`方法
     def gen_parse_method(self, struct: Struct, args: Namespace) -> str:
-        content = ''
+        content = self.gen_resolve_method(struct)
 
-        content += 'int %s::ParseRow(const IDataFrame* table, int rowIndex, %s* ptr) {\n' % (struct.name, struct.name)
+        content += 'int %s::ParseRow(const IDataFrame* table, const ColumnIndex& idx, int rowIndex, %s* ptr) {\n' % (struct.name, struct.name)
         content += '    ASSERT(ptr != nullptr);\n'
         for field in struct.fields:
             origin_typename = field.origin_type_name
             content += self.gen_field_assign2('ptr->', origin_typename, field.name, 1)
 
-        space = self.TAB_SPACE * 1
         for array in struct.array_fields:
-            content += '%sfor (int col = 0; col < table->GetColumnCount(); col++) {\n' % space
-            content += '%s    const string& name = fmt::format("%s[{}]", col);\n' % (space, array.name)
-            content += '%s    if (!table->HasColumn(name)) {\n' % space
-            content += '%s        break;\n' % space
-            content += '%s    }\n' % space
-            origin_typename = array.element_fields[0].origin_type_name
-            cpp_type = lang.map_cpp_type(origin_typename)
-            if origin_typename == 'string':
-                content += '%s    auto elem = table->GetRowCell(name, rowIndex);\n' % space
-            else:
-                content += '%s    auto elem = parseTo<%s>(table->GetRowCell(name, rowIndex));\n' % (space, cpp_type)
-            content += '%s    ptr->%s.push_back(elem);\n' % (space, array.field_name)
-            content += '%s}\n' % space
+            content += self.gen_parse_array(array, 'ptr->' + array.field_name, 1)
 
         content += '    return 0;\n'
         content += '}\n\n'
+
+        # 兼容按行解析的旧接口
+        content += 'int %s::ParseRow(const IDataFrame* table, int rowIndex, %s* ptr) {\n' % (struct.name, struct.name)
+        content += '    ColumnIndex idx;\n'
+        content += '    ResolveColumns(table, &idx);\n'
+        content += '    return ParseRow(table, idx, rowIndex, ptr);\n'
+        content += '}\n\n'
         return content
 
     # 生成KV模式的`ParseFrom`方法
@@ -113,12 +172,58 @@ class CppCsvLoadGenerator:
         content += '}\n\n'
         return content
 
+    # 生成索引容器的`Load`方法，按行数预先分配
+    def gen_table_load_method(self, struct: Struct) -> str:
+        if len(get_unique_fields(struct)) == 0:
+            return ''
+        name = struct.camel_case_name
+        content = 'int %sTable::Load(const IDataFrame* table) {\n' % name
+        content += '    %s::ColumnIndex idx;\n' % name
+        content += '    %s::ResolveColumns(table, &idx);\n' % name
+        content += '    Rows.clear();\n'
+        content += '    Rows.resize(table->GetRowCount());\n'
+        content += '    for (int i = 0; i < (int)Rows.size(); i++) {\n'
+        content += '        %s::ParseRow(table, idx, i, &Rows[i]);\n' % name
+        content += '    }\n'
+        content += '    BuildIndex();\n'
+        content += '    return 0;\n'
+        content += '}\n\n'
+        return content
+
+    # 生成列式容器的`Load`方法，逐列解析单元格直接填充到每个字段的数组
+    def gen_columnar_load_method(self, struct: Struct) -> str:
+        if not is_columnar_layout(struct):
+            return ''
+        name = struct.camel_case_name
+        content = 'int %sColumnar::Load(const IDataFrame* table) {\n' % name
+        content += '    %s::ColumnIndex idx;\n' % name
+        content += '    %s::ResolveColumns(table, &idx);\n' % name
+        content += '    int rowCount = table->GetRowCount();\n'
+        content += '    Clear();\n'
+        for field in struct.fields:
+            value_text = 'table->GetCellAt(idx.%s, rowIndex)' % field.name
+            content += '    %s.resize(rowCount);\n' % field.name
+            content += '    for (int rowIndex = 0; rowIndex < rowCount; rowIndex++) {\n'
+            content += self.gen_field_assign1('', field.origin_type_name, field.name + '[rowIndex]', value_text, 2)
+            content += '    }\n'
+        for array in struct.array_fields:
+            content += '    %s.resize(rowCount);\n' % array.field_name
+            content += '    for (int rowIndex = 0; rowIndex < rowCount; rowIndex++) {\n'
+            content += self.gen_parse_array(array, array.field_name + '[rowIndex]', 2)
+            content += '    }\n'
+        content += '    return 0;\n'
+        content += '}\n\n'
+        return content
+
     # 生成源文件定义
     def gen_cpp_source(self, struct: Struct, args: Namespace) -> str:
         if struct.options[predef.PredefParseKVMode]:
             return self.gen_kv_parse_method(struct, args)
         else:
-            return self.gen_parse_method(struct, args)
+            content = self.gen_parse_method(struct, args)
+            content += self.gen_table_load_method(struct)
+            content += self.gen_columnar_load_method(struct)
+            return content
 
     # class静态函数声明
     def gen_method_declare(self, struct: Struct) -> str:
@@ -126,6 +231,9 @@ class CppCsvLoadGenerator:
         if struct.options[predef.PredefParseKVMode]:
             content += '    static int ParseFrom(const IDataFrame* table, %s* ptr);\n' % struct.name
             return content
+        content += self.gen_column_index_define(struct)
+        content += '    static void ResolveColumns(const IDataFrame* table, ColumnIndex* idx);\n'
+        content += '    static int ParseRow(const IDataFrame* table, const ColumnIndex& idx, int rowIndex, %s* ptr);\n' % struct.name
         content += '    static int ParseRow(const IDataFrame* table, int rowIndex, %s* ptr);\n' % struct.name
         return content
 
@@ -0,0 +1,57 @@
+# Copyright (C) 2024 qi7chen@github. All rights reserved.
+# Distributed under the terms and conditions of the Apache License.
+# See accompanying files LICENSE.
+
+from argparse import Namespace
+import tabugen.lang as lang
+import tabugen.predef as predef
+import tabugen.util.typedvalue as typedvalue
+from tabugen.structs import Struct
+
+
+# 把数据作为静态初始化的常量生成到C++头文件中，运行时不需要再读取和解析数据文件
+class CppEmbedDataGenerator:
+    TAB_SPACE = '    '
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def can_embed(struct: Struct, args: Namespace) -> bool:
+        return typedvalue.can_embed(struct, args)
+
+    # KV模式生成一个对象，按kv_fields的顺序聚合初始化
+    def gen_kv_data(self, struct: Struct, args: Namespace) -> str:
+        values = typedvalue.embed_values(struct, args)
+        name = struct.camel_case_name
+        content = 'inline const %s %sData = {\n' % (name, name)
+        for field in struct.kv_fields:
+            typename, value = values[field.name]
+            literal = lang.cpp_value_literal(value, typedvalue.normalize_type_name(typename))
+            content += '%s%s, // %s\n' % (self.TAB_SPACE, literal, field.name)
+        content += '};\n\n'
+        return content
+
+    # 每一行按结构中字段定义的顺序(members)聚合初始化
+    def gen_rows_data(self, struct: Struct, args: Namespace, members: list) -> str:
+        rows = typedvalue.embed_values(struct, args)
+        all_members = struct.fields + struct.array_fields
+        order = [next(i for i, m in enumerate(all_members) if m is member) for member in members]
+        typenames = [typedvalue.normalize_type_name(lang.member_type_name(m)) for m in all_members]
+        name = struct.camel_case_name
+        content = 'inline const vector<%s> %sRows = {\n' % (name, name)
+        for row in rows:
+            items = [lang.cpp_value_literal(row[i], typenames[i]) for i in order]
+            content += '%s{%s},\n' % (self.TAB_SPACE, ', '.join(items))
+        content += '};\n\n'
+        return content
+
+    def generate(self, struct: Struct, args: Namespace, members: list) -> str:
+        if not self.can_embed(struct, args):
+            return ''
+        content = '// %s data embedded from %s\n' % (struct.camel_case_name, struct.filepath)
+        if struct.options[predef.PredefParseKVMode]:
+            content += self.gen_kv_data(struct, args)
+        else:
+            content += self.gen_rows_data(struct, args, members)
+        return content
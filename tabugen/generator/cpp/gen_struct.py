@@ -10,9 +10,11 @@ import tabugen.predef as predef
 import tabugen.lang as lang
 import tabugen.version as version
 import tabugen.util.helper as helper
-from tabugen.util.tableutil import parse_kv_fields
+from tabugen.util.tableutil import parse_kv_fields, get_unique_fields, is_columnar_layout
 from tabugen.structs import Struct, StructField, ArrayField
 from tabugen.generator.cpp.gen_csv_load import CppCsvLoadGenerator
+from tabugen.generator.cpp.gen_embed_data import CppEmbedDataGenerator
+from tabugen.generator.cpp.gen_binary_load import CppBinaryLoadGenerator
 
 
 cpp_head_template = """
@@ -23,8 +25,11 @@ static const char* const TabDelim2 = "%s";
 struct IDataFrame
 {
     virtual int GetColumnCount() const = 0;
+    virtual int GetRowCount() const = 0;
     virtual bool HasColumn(const std::string& name) const = 0;
     virtual std::string GetRowCell(const std::string& cell, int rowIndex) const = 0;
+    virtual int GetColumnIndex(const std::string& name) const = 0;         // -1 if column not found
+    virtual std::string GetCellAt(int column, int rowIndex) const = 0;      // empty string if column is -1
     virtual std::string GetKeyField(const std::string& key) const = 0;
 };
 
@@ -41,10 +46,30 @@ class CppStructGenerator:
 
     def __init__(self):
         self.load_gen = None
+        self.embed_gen = None
+        self.binary_gen = None
+        self.reorder_fields = False
 
     def enable_gen_parse(self, name):
         if name == 'csv':
             self.load_gen = CppCsvLoadGenerator()
+        elif name == 'binary':
+            self.binary_gen = CppBinaryLoadGenerator()
+
+    # 把数据嵌入到生成的代码中
+    def enable_embed_data(self):
+        self.embed_gen = CppEmbedDataGenerator()
+
+    # 按对齐重新排列字段，减少填充
+    def enable_reorder_fields(self):
+        self.reorder_fields = True
+
+    # 结构中字段和数组字段的定义顺序
+    def ordered_members(self, struct: Struct) -> list:
+        members = struct.fields + struct.array_fields
+        if self.reorder_fields:
+            return lang.reorder_by_alignment(members, lang.cpp_type_layout)
+        return members
 
     # 生成字段定义
     def gen_field_define(self, field: StructField, max_type_len: int, max_name_len: int, tabs: int) -> str:
@@ -86,13 +111,18 @@ class CppStructGenerator:
         max_type_len = struct.max_field_lang_type_length()
         max_name_len = struct.max_field_lang_var_length()
 
+        members = self.ordered_members(struct)
+        if self.reorder_fields:
+            before = lang.estimate_members_size(struct.fields + struct.array_fields, lang.cpp_type_layout)
+            after = lang.estimate_members_size(members, lang.cpp_type_layout)
+            print('C++ struct %s sizeof %d -> %d bytes' % (struct.camel_case_name, before, after))
+
         content = ''
-        for col, field in enumerate(fields):
-            text = self.gen_field_define(field, max_type_len, max_name_len, 1)
-            content += text
-        for array in struct.array_fields:
-            text = self.gen_array_define(array, max_type_len, max_name_len, 1)
-            content += text
+        for member in members:
+            if isinstance(member, ArrayField):
+                content += self.gen_array_define(member, max_type_len, max_name_len, 1)
+            else:
+                content += self.gen_field_define(member, max_type_len, max_name_len, 1)
         return content
 
     # 生成class的结构定义
@@ -120,6 +150,159 @@ class CppStructGenerator:
             content += '\n'
             content += self.load_gen.gen_method_declare(struct)
         content += '};\n\n'
+        if self.embed_gen is not None:
+            content += self.embed_gen.generate(struct, args, self.ordered_members(struct))
+        content += self.gen_lookup_table(struct, args)
+        content += self.gen_columnar_table(struct, args)
+        if self.binary_gen is not None:
+            content += self.binary_gen.generate(struct, args)
+        return content
+
+    # 生成按唯一字段查找的索引容器
+    # 嵌入数据时`LoadEmbedded`直接索引嵌入的行，不复制数据
+    def gen_lookup_table(self, struct: Struct, args: Namespace) -> str:
+        fields = get_unique_fields(struct)
+        if len(fields) == 0:
+            return ''
+        name = struct.camel_case_name
+        embedded = self.embed_gen is not None and self.embed_gen.can_embed(struct, args)
+        rows = 'Items()' if embedded else 'Rows'
+        content = '// %s lookup indexes by unique fields\n' % name
+        content += 'struct %sTable \n{\n' % name
+        content += '    vector<%s> Rows;\n' % name
+        if embedded:
+            content += '    const vector<%s>* Embedded = nullptr;    // embedded rows indexed in place by LoadEmbedded\n' % name
+        for field in fields:
+            key_type = lang.map_cpp_type(field.origin_type_name)
+            content += '    unordered_map<%s, size_t> By%s;\n' % (key_type, field.name)
+        content += '\n'
+
+        if embedded:
+            content += '    // rows being indexed, the embedded rows or the loaded Rows\n'
+            content += '    const vector<%s>& Items() const { return Embedded != nullptr ? *Embedded : Rows; }\n\n' % name
+            content += '    void BuildIndex()\n'
+            content += '    {\n'
+            content += '        Embedded = nullptr;\n'
+            content += '        IndexRows();\n'
+            content += '    }\n\n'
+            content += '    void IndexRows()\n'
+            content += '    {\n'
+            content += '        const auto& rows = Items();\n'
+            content += self.gen_index_rows(fields, 'rows')
+            content += '    }\n'
+        else:
+            content += '    void BuildIndex()\n'
+            content += '    {\n'
+            content += self.gen_index_rows(fields, 'Rows')
+            content += '    }\n'
+
+        for field in fields:
+            key_type = lang.map_cpp_type(field.origin_type_name)
+            if key_type == 'string':
+                key_type = 'const string&'
+            content += '\n'
+            content += '    const %s* FindBy%s(%s key) const\n' % (name, field.name, key_type)
+            content += '    {\n'
+            content += '        auto iter = By%s.find(key);\n' % field.name
+            content += '        if (iter != By%s.end()) {\n' % field.name
+            content += '            return &%s[iter->second];\n' % rows
+            content += '        }\n'
+            content += '        return nullptr;\n'
+            content += '    }\n'
+
+        if self.load_gen is not None:
+            content += '\n'
+            content += '    int Load(const IDataFrame* table);\n'
+        if embedded:
+            content += '\n'
+            content += '    void LoadEmbedded()\n'
+            content += '    {\n'
+            content += '        Rows.clear();\n'
+            content += '        Embedded = &%sRows;\n' % name
+            content += '        IndexRows();\n'
+            content += '    }\n'
+        content += '};\n\n'
+        return content
+
+    # 为每个唯一字段建立行号索引
+    @staticmethod
+    def gen_index_rows(fields: list[StructField], rows: str) -> str:
+        content = ''
+        for field in fields:
+            content += '        By%s.clear();\n' % field.name
+            content += '        By%s.reserve(%s.size());\n' % (field.name, rows)
+        content += '        for (size_t i = 0; i < %s.size(); i++) {\n' % rows
+        for field in fields:
+            content += '            By%s.emplace(%s[i].%s, i);\n' % (field.name, rows, field.name)
+        content += '        }\n'
+        return content
+
+    # 生成按列存储的容器，每个字段是一个连续的vector，按列扫描时缓存友好
+    def gen_columnar_table(self, struct: Struct, args: Namespace) -> str:
+        if not is_columnar_layout(struct):
+            return ''
+        name = struct.camel_case_name
+        names = [field.name for field in struct.fields] + [array.field_name for array in struct.array_fields]
+        # vector<bool>按位存储，不是连续的bool数组，bool列使用uint8_t
+        bool_names = set()
+        content = '// %s columnar storage, one contiguous vector per field, bool columns are stored as uint8_t\n' % name
+        content += 'struct %sColumnar \n{\n' % name
+        for field in struct.fields:
+            typename = lang.map_cpp_type(field.origin_type_name)
+            if typename == 'bool':
+                typename = 'uint8_t'
+                bool_names.add(field.name)
+            content += '    vector<%s> %s;\n' % (typename, field.name)
+        for array in struct.array_fields:
+            content += '    vector<%s> %s;\n' % (lang.map_cpp_type(array.type_name), array.field_name)
+        content += '\n'
+
+        if len(names) > 0:
+            content += '    size_t Size() const { return %s.size(); }\n' % names[0]
+        else:
+            content += '    size_t Size() const { return 0; }\n'
+        content += '\n'
+        content += '    void Clear()\n'
+        content += '    {\n'
+        for member in names:
+            content += '        %s.clear();\n' % member
+        content += '    }\n\n'
+        content += '    void Reserve(size_t n)\n'
+        content += '    {\n'
+        for member in names:
+            content += '        %s.reserve(n);\n' % member
+        content += '    }\n\n'
+        content += '    void Append(const %s& row)\n' % name
+        content += '    {\n'
+        for member in names:
+            content += '        %s.push_back(row.%s);\n' % (member, member)
+        content += '    }\n\n'
+        content += '    // gather a row from the columns\n'
+        content += '    %s Row(size_t i) const\n' % name
+        content += '    {\n'
+        content += '        %s row;\n' % name
+        for member in names:
+            if member in bool_names:
+                content += '        row.%s = %s[i] != 0;\n' % (member, member)
+            else:
+                content += '        row.%s = %s[i];\n' % (member, member)
+        content += '        return row;\n'
+        content += '    }\n'
+
+        if self.load_gen is not None:
+            content += '\n'
+            content += '    int Load(const IDataFrame* table);\n'
+        if self.embed_gen is not None and self.embed_gen.can_embed(struct, args):
+            content += '\n'
+            content += '    void LoadEmbedded()\n'
+            content += '    {\n'
+            content += '        Clear();\n'
+            content += '        Reserve(%sRows.size());\n' % name
+            content += '        for (const auto& row : %sRows) {\n' % name
+            content += '            Append(row);\n'
+            content += '        }\n'
+            content += '    }\n'
+        content += '};\n\n'
         return content
 
     # 生成.h头文件内容
@@ -131,6 +314,8 @@ class CppStructGenerator:
             '#include <string_view>',
             '#include <unordered_map>',
         ]
+        if self.binary_gen is not None:
+            h_include_headers += self.binary_gen.include_headers()
 
         header_content = '// This file is auto-generated by Tabugen v%s, DO NOT EDIT!\n\n#pragma once\n\n' % version.VER_STRING
         header_content += '\n'.join(h_include_headers) + '\n\n'
@@ -146,6 +331,8 @@ class CppStructGenerator:
 
         if self.load_gen:
             header_content += cpp_head_template % (args.delim1, args.delim2)
+        if self.binary_gen is not None:
+            header_content += self.binary_gen.gen_runtime()
 
         for struct in descriptors:
             header_content += self.gen_header(struct, args)
@@ -7,7 +7,7 @@ import tabugen.typedef as types
 import tabugen.predef as predef
 import tabugen.lang as lang
 import tabugen.util.tableutil as tableutil
-from tabugen.structs import Struct
+from tabugen.structs import Struct, ArrayField
 
 
 # 生成C#加载CSV文件数据代码
@@ -61,6 +61,35 @@ class CSharpCsvLoadGenerator:
             content += '%s%s%s = %s(%s);\n' % (space, prefix, field_name, func_name, value_text)
         return content
 
+    # 读取一个数组元素，数据表中不存在的列跳过
+    def gen_parse_element(self, origin_typename: str, target: str, space: str) -> str:
+        content = '%sif (!table.HasColumn(name)) {\n' % space
+        content += '%s    continue;\n' % space
+        content += '%s}\n' % space
+        if origin_typename == 'string':
+            content += '%svar elem = table.GetRowCell(name, rowIndex);\n' % space
+        else:
+            func_name = lang.map_cs_parse_func(origin_typename)
+            content += '%svar elem = %s(table.GetRowCell(name, rowIndex));\n' % (space, func_name)
+        content += '%s%s.Add(elem);\n' % (space, target)
+        return content
+
+    # 读取二维数组name[i][j]的每一行，按解析时的列名读取
+    def gen_parse_nested_array(self, array: ArrayField) -> str:
+        space = self.TAB_SPACE * 2
+        origin_typename = array.element_fields[0].origin_type_name
+        rows = ', '.join('new string[] {%s}' % ', '.join('"%s"' % elem.name for elem in row) for row in array.element_rows)
+        content = '%sforeach (var names in new string[][] {%s}) {\n' % (space, rows)
+        content += '%s    var row = new %s();\n' % (space, lang.map_cs_type(origin_typename + '[]'))
+        content += '%s    foreach (var name in names) {\n' % space
+        content += self.gen_parse_element(origin_typename, 'row', space + self.TAB_SPACE * 2)
+        content += '%s    }\n' % space
+        content += '%s    if (row.Count > 0) {\n' % space
+        content += '%s        this.%s.Add(row);\n' % (space, array.field_name)
+        content += '%s    }\n' % space
+        content += '%s}\n' % space
+        return content
+
     # 生成`ParseFrom`方法
     def gen_parse_method(self, struct: Struct, args: Namespace) -> str:
         space = self.TAB_SPACE
@@ -74,20 +103,13 @@ class CSharpCsvLoadGenerator:
 
         space = self.TAB_SPACE * 2
         for array in struct.array_fields:
-            content += '%sfor (int col = 0; col < table.ColumnCount; col++) {\n' % space
-            content += '%s    var name = string.Format("%s[{}]", col);\n' % (space, array.name)
-            content += '%s    if (!table.HasColumn(name)) {\n' % space
-            content += '%s        break;\n' % space
-            content += '%s    }\n' % space
+            if array.is_nested():
+                content += self.gen_parse_nested_array(array)
+                continue
+            names = ', '.join('"%s"' % elem.name for elem in array.element_fields)
+            content += '%sforeach (var name in new string[] {%s}) {\n' % (space, names)
             origin_typename = array.element_fields[0].origin_type_name
-            cs_type = lang.map_cs_type(origin_typename)
-            if origin_typename == 'string':
-                content += '%s    var elem = table.GetRowCell(name, rowIndex);\n' % space
-            else:
-                func_name = lang.map_cs_parse_func(origin_typename)
-                value_text = 'table.GetRowCell("%s", rowIndex)' % array.field_name
-                content += '%s    var elem = %s(%s);\n' % (space, func_name, value_text)
-            content += '%s    this.%s.Add(elem);\n' % (space, array.field_name)
+            content += self.gen_parse_element(origin_typename, 'this.' + array.field_name, space + self.TAB_SPACE)
             content += '%s}\n' % space
 
         content += '%s}\n\n' % self.TAB_SPACE
@@ -0,0 +1,60 @@
+# Copyright (C) 2024 qi7chen@github. All rights reserved.
+# Distributed under the terms and conditions of the Apache License.
+# See accompanying files LICENSE.
+
+from argparse import Namespace
+import tabugen.lang as lang
+import tabugen.predef as predef
+import tabugen.util.typedvalue as typedvalue
+from tabugen.structs import Struct
+
+
+# 把数据作为static readonly字段生成到C#代码中，运行时不需要再读取和解析数据文件
+class CSharpEmbedDataGenerator:
+    TAB_SPACE = '    '
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def can_embed(struct: Struct, args: Namespace) -> bool:
+        return typedvalue.can_embed(struct, args)
+
+    # KV模式生成一个对象
+    def gen_kv_data(self, struct: Struct, args: Namespace) -> str:
+        values = typedvalue.embed_values(struct, args)
+        name = struct.camel_case_name
+        content = '%spublic static readonly %s Embedded = new %s\n' % (self.TAB_SPACE, name, name)
+        content += '%s{\n' % self.TAB_SPACE
+        for field in struct.kv_fields:
+            typename, value = values[field.name]
+            literal = lang.cs_value_literal(value, typedvalue.normalize_type_name(typename))
+            content += '%s%s = %s,\n' % (self.TAB_SPACE * 2, field.name, literal)
+        content += '%s};\n' % self.TAB_SPACE
+        return content
+
+    # 每一行使用对象初始化器
+    def gen_rows_data(self, struct: Struct, args: Namespace) -> str:
+        rows = typedvalue.embed_values(struct, args)
+        names = [field.name for field in struct.fields]
+        names += [array.field_name for array in struct.array_fields]
+        typenames = [typedvalue.normalize_type_name(field.origin_type_name) for field in struct.fields]
+        typenames += [typedvalue.normalize_type_name(array.type_name) for array in struct.array_fields]
+        name = struct.camel_case_name
+        content = '%spublic static readonly %s[] EmbeddedRows = new %s[]\n' % (self.TAB_SPACE, name, name)
+        content += '%s{\n' % self.TAB_SPACE
+        for row in rows:
+            items = ['%s = %s' % (names[i], lang.cs_value_literal(value, typenames[i])) for i, value in enumerate(row)]
+            content += '%snew %s { %s },\n' % (self.TAB_SPACE * 2, name, ', '.join(items))
+        content += '%s};\n' % self.TAB_SPACE
+        return content
+
+    def generate(self, struct: Struct, args: Namespace) -> str:
+        if not self.can_embed(struct, args):
+            return ''
+        content = '%s// data embedded from %s\n' % (self.TAB_SPACE, struct.filepath)
+        if struct.options[predef.PredefParseKVMode]:
+            content += self.gen_kv_data(struct, args)
+        else:
+            content += self.gen_rows_data(struct, args)
+        return content
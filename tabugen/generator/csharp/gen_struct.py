@@ -9,9 +9,10 @@ import tabugen.predef as predef
 import tabugen.lang as lang
 import tabugen.version as version
 import tabugen.util.helper as helper
-from tabugen.util.tableutil import parse_kv_fields
+from tabugen.util.tableutil import parse_kv_fields, get_unique_fields, is_columnar_layout
 from tabugen.structs import Struct, StructField, ArrayField
 from tabugen.generator.csharp.gen_csv_load import CSharpCsvLoadGenerator
+from tabugen.generator.csharp.gen_embed_data import CSharpEmbedDataGenerator
 
 
 cs_template = """
@@ -37,11 +38,20 @@ class CSharpStructGenerator:
 
     def __init__(self):
         self.load_gen = None
+        self.embed_gen = None
 
     def enable_gen_parse(self, name):
         if name == "csv":
             self.load_gen = CSharpCsvLoadGenerator()
 
+    # 把数据嵌入到生成的代码中
+    def enable_embed_data(self):
+        self.embed_gen = CSharpEmbedDataGenerator()
+
+    # C#的struct包含string和List等引用类型时由运行时自动布局，不需要重新排列
+    def enable_reorder_fields(self):
+        pass
+
     # 生成字段类型定义
     def gen_field_define(self, field: StructField, max_type_len: int, max_name_len: int, tabs: int,
                          json_snake_case: bool) -> str:
@@ -123,12 +133,145 @@ class CSharpStructGenerator:
             content += '\n'
             content += self.load_gen.generate(struct, args)
 
+        if self.embed_gen is not None:
+            content += '\n'
+            content += self.embed_gen.generate(struct, args)
+
+        content += '}\n\n'
+        return content
+
+    # 生成按唯一字段查找的索引容器
+    def gen_lookup_table(self, struct: Struct, args: Namespace) -> str:
+        fields = get_unique_fields(struct)
+        if len(fields) == 0:
+            return ''
+        name = struct.camel_case_name
+        content = '// %s lookup indexes by unique fields\n' % name
+        content += 'public class %sTable\n{\n' % name
+        content += '    public List<%s> Rows = new List<%s>();\n' % (name, name)
+        for field in fields:
+            key_type = lang.map_cs_type(field.origin_type_name)
+            content += '    public Dictionary<%s, int> By%s = new Dictionary<%s, int>();\n' % (key_type, field.name, key_type)
+        content += '\n'
+
+        content += '    public void BuildIndex()\n'
+        content += '    {\n'
+        for field in fields:
+            key_type = lang.map_cs_type(field.origin_type_name)
+            content += '        By%s = new Dictionary<%s, int>(Rows.Count);\n' % (field.name, key_type)
+        content += '        for (int i = 0; i < Rows.Count; i++)\n'
+        content += '        {\n'
+        for field in fields:
+            content += '            By%s.TryAdd(Rows[i].%s, i);\n' % (field.name, field.name)
+        content += '        }\n'
+        content += '    }\n'
+
+        for field in fields:
+            key_type = lang.map_cs_type(field.origin_type_name)
+            content += '\n'
+            content += '    public bool TryGetBy%s(%s key, out %s value)\n' % (field.name, key_type, name)
+            content += '    {\n'
+            content += '        if (By%s.TryGetValue(key, out var index))\n' % field.name
+            content += '        {\n'
+            content += '            value = Rows[index];\n'
+            content += '            return true;\n'
+            content += '        }\n'
+            content += '        value = default;\n'
+            content += '        return false;\n'
+            content += '    }\n'
+
+        if self.load_gen is not None:
+            content += '\n'
+            content += '    public void Load(IDataFrame table)\n'
+            content += '    {\n'
+            content += '        Rows = new List<%s>(table.RowCount);\n' % name
+            content += '        for (int i = 0; i < table.RowCount; i++)\n'
+            content += '        {\n'
+            content += '            var item = new %s();\n' % name
+            content += '            item.ParseRow(table, i);\n'
+            content += '            Rows.Add(item);\n'
+            content += '        }\n'
+            content += '        BuildIndex();\n'
+            content += '    }\n'
+        if self.embed_gen is not None and self.embed_gen.can_embed(struct, args):
+            content += '\n'
+            content += '    public void LoadEmbedded()\n'
+            content += '    {\n'
+            content += '        Rows = new List<%s>(%s.EmbeddedRows);\n' % (name, name)
+            content += '        BuildIndex();\n'
+            content += '    }\n'
+        content += '}\n\n'
+        return content
+
+    # 生成按列存储的容器，每个字段是一个List
+    def gen_columnar_table(self, struct: Struct, args: Namespace) -> str:
+        if not is_columnar_layout(struct):
+            return ''
+        name = struct.camel_case_name
+        members = [(field.name, lang.map_cs_type(field.origin_type_name)) for field in struct.fields]
+        members += [(array.field_name, lang.map_cs_type(array.type_name)) for array in struct.array_fields]
+        content = '// %s columnar storage, one list per field\n' % name
+        content += 'public class %sColumnar\n{\n' % name
+        for member, typename in members:
+            content += '    public List<%s> %s = new List<%s>();\n' % (typename, member, typename)
+        content += '\n'
+
+        if len(members) > 0:
+            content += '    public int Count => %s.Count;\n\n' % members[0][0]
+        else:
+            content += '    public int Count => 0;\n\n'
+
+        content += '    public void Clear(int capacity)\n'
+        content += '    {\n'
+        for member, typename in members:
+            content += '        %s = new List<%s>(capacity);\n' % (member, typename)
+        content += '    }\n\n'
+
+        content += '    public void Append(in %s row)\n' % name
+        content += '    {\n'
+        for member, typename in members:
+            content += '        %s.Add(row.%s);\n' % (member, member)
+        content += '    }\n\n'
+
+        content += '    // gather a row from the columns\n'
+        content += '    public %s Row(int i)\n' % name
+        content += '    {\n'
+        content += '        var row = new %s();\n' % name
+        for member, typename in members:
+            content += '        row.%s = %s[i];\n' % (member, member)
+        content += '        return row;\n'
+        content += '    }\n'
+
+        if self.load_gen is not None:
+            content += '\n'
+            content += '    public void Load(IDataFrame table)\n'
+            content += '    {\n'
+            content += '        Clear(table.RowCount);\n'
+            content += '        for (int i = 0; i < table.RowCount; i++)\n'
+            content += '        {\n'
+            content += '            var item = new %s();\n' % name
+            content += '            item.ParseRow(table, i);\n'
+            content += '            Append(item);\n'
+            content += '        }\n'
+            content += '    }\n'
+        if self.embed_gen is not None and self.embed_gen.can_embed(struct, args):
+            content += '\n'
+            content += '    public void LoadEmbedded()\n'
+            content += '    {\n'
+            content += '        Clear(%s.EmbeddedRows.Length);\n' % name
+            content += '        foreach (var row in %s.EmbeddedRows)\n' % name
+            content += '        {\n'
+            content += '            Append(row);\n'
+            content += '        }\n'
+            content += '    }\n'
         content += '}\n\n'
         return content
 
     def generate(self, struct: Struct, args: Namespace):
         content = ''
         content += self.gen_struct(struct, args)
+        content += self.gen_lookup_table(struct, args)
+        content += self.gen_columnar_table(struct, args)
         return content
 
     def run(self, descriptors: list[Struct], filepath: str, args: Namespace):
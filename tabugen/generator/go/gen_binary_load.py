@@ -0,0 +1,392 @@
+"""
+Copyright (C) 2024 qi7chen@github. All rights reserved.
+Distributed under the terms and conditions of the Apache License.
+See accompanying files LICENSE.
+"""
+
+from argparse import Namespace
+import tabugen.lang as lang
+import tabugen.typedef as types
+import tabugen.predef as predef
+import tabugen.version as version
+from tabugen.typedef import Type
+from tabugen.structs import Struct
+from tabugen.writer.binary import BinaryDataWriter, BinaryColumn, schema_fingerprint
+
+
+# 内存映射二进制数据文件的运行时，格式见`tabugen/writer/binary.py`
+go_binary_runtime_template = """const (
+	binaryHeaderSize = 48
+	binaryColumnSize = 24
+	binaryVersion    = 1
+	binaryFlagKVMode = 1
+)
+
+// BinaryTable 以只读方式内存映射的二进制数据文件(--out_data_format=binary导出)
+// 映射的内存由所有进程共享，数值原地读取，字符串直接引用映射的内存，Close之后不能再使用
+type BinaryTable struct {
+	data []byte
+}
+
+// OpenBinaryTable 映射数据文件，并检查文件和生成代码的结构指纹是否一致
+func OpenBinaryTable(filename string, fingerprint uint64) (*BinaryTable, error) {
+	f, err := os.Open(filename)
+	if err != nil {
+		return nil, err
+	}
+	defer f.Close()
+	st, err := f.Stat()
+	if err != nil {
+		return nil, err
+	}
+	if st.Size() < binaryHeaderSize {
+		return nil, fmt.Errorf("%s: invalid file size %d", filename, st.Size())
+	}
+	data, err := mapFile(f, int(st.Size()))
+	if err != nil {
+		return nil, fmt.Errorf("%s: %w", filename, err)
+	}
+	var t = &BinaryTable{data: data}
+	if err = t.verify(fingerprint); err != nil {
+		t.Close()
+		return nil, fmt.Errorf("%s: %w", filename, err)
+	}
+	return t, nil
+}
+
+func (t *BinaryTable) verify(fingerprint uint64) error {
+	if string(t.data[:4]) != "TABU" {
+		return fmt.Errorf("not a tabugen binary file")
+	}
+	if t.readUint16(4) != binaryVersion {
+		return fmt.Errorf("unsupported binary version %d", t.readUint16(4))
+	}
+	if int(t.readUint32(40)) != len(t.data) {
+		return fmt.Errorf("file size mismatch")
+	}
+	if t.readUint64(8) != fingerprint {
+		return fmt.Errorf("schema fingerprint mismatch")
+	}
+	return nil
+}
+
+// Close 解除映射
+func (t *BinaryTable) Close() error {
+	if t.data == nil {
+		return nil
+	}
+	var err = unmapFile(t.data)
+	t.data = nil
+	return err
+}
+
+func (t *BinaryTable) RowCount() int {
+	return int(t.readUint32(16))
+}
+
+func (t *BinaryTable) IsKVMode() bool {
+	return t.readUint16(6)&binaryFlagKVMode != 0
+}
+
+func (t *BinaryTable) readBool(off int) bool {
+	return t.data[off] != 0
+}
+
+func (t *BinaryTable) readInt8(off int) int8 {
+	return int8(t.data[off])
+}
+
+func (t *BinaryTable) readUint8(off int) uint8 {
+	return t.data[off]
+}
+
+func (t *BinaryTable) readInt16(off int) int16 {
+	return int16(binary.LittleEndian.Uint16(t.data[off:]))
+}
+
+func (t *BinaryTable) readUint16(off int) uint16 {
+	return binary.LittleEndian.Uint16(t.data[off:])
+}
+
+func (t *BinaryTable) readInt32(off int) int32 {
+	return int32(binary.LittleEndian.Uint32(t.data[off:]))
+}
+
+func (t *BinaryTable) readUint32(off int) uint32 {
+	return binary.LittleEndian.Uint32(t.data[off:])
+}
+
+func (t *BinaryTable) readInt64(off int) int64 {
+	return int64(binary.LittleEndian.Uint64(t.data[off:]))
+}
+
+func (t *BinaryTable) readUint64(off int) uint64 {
+	return binary.LittleEndian.Uint64(t.data[off:])
+}
+
+func (t *BinaryTable) readFloat32(off int) float32 {
+	return math.Float32frombits(binary.LittleEndian.Uint32(t.data[off:]))
+}
+
+func (t *BinaryTable) readFloat64(off int) float64 {
+	return math.Float64frombits(binary.LittleEndian.Uint64(t.data[off:]))
+}
+
+// readString 字符串表中的字符串，不复制内存
+func (t *BinaryTable) readString(off int) string {
+	var index = int(t.readUint32(off))
+	var table = int(t.readUint32(28))
+	var count = int(t.readUint32(32))
+	var start = int(t.readUint32(table + index*4))
+	var end = int(t.readUint32(table + index*4 + 4))
+	if start == end {
+		return ""
+	}
+	var base = table + (count+1)*4
+	return unsafe.String(&t.data[base+start], end-start)
+}
+
+// columnOffset 列描述中的数据偏移，which为0, 1, 2分别是列数据和两个元素池
+func (t *BinaryTable) columnOffset(column, which int) int {
+	return int(t.readUint32(binaryHeaderSize + column*binaryColumnSize + 8 + which*4))
+}
+
+// cell 定长值所在的偏移
+func (t *BinaryTable) cell(column, row, size int) int {
+	return t.columnOffset(column, 0) + row*size
+}
+
+// BinaryArray 数据文件中的数组，元素原地读取
+type BinaryArray[T any] struct {
+	t      *BinaryTable
+	offset int
+	count  int
+	size   int
+	read   func(*BinaryTable, int) T
+}
+
+func newBinaryArray[T any](t *BinaryTable, column, row, size int, read func(*BinaryTable, int) T) BinaryArray[T] {
+	var span = t.cell(column, row, 8)
+	var start = int(t.readUint32(span))
+	var count = int(t.readUint32(span + 4))
+	return BinaryArray[T]{t: t, offset: t.columnOffset(column, 1) + start*size, count: count, size: size, read: read}
+}
+
+func (a BinaryArray[T]) Len() int {
+	return a.count
+}
+
+func (a BinaryArray[T]) At(i int) T {
+	return a.read(a.t, a.offset+i*a.size)
+}
+
+// BinaryMap 数据文件中的字典，key和value原地读取
+type BinaryMap[K comparable, V any] struct {
+	keys   BinaryArray[K]
+	values BinaryArray[V]
+}
+
+func newBinaryMap[K comparable, V any](t *BinaryTable, column, row int, ksize int, kread func(*BinaryTable, int) K,
+	vsize int, vread func(*BinaryTable, int) V) BinaryMap[K, V] {
+	var keys = newBinaryArray(t, column, row, ksize, kread)
+	var values = BinaryArray[V]{t: t, count: keys.count, size: vsize, read: vread}
+	values.offset = t.columnOffset(column, 2) + (keys.offset-t.columnOffset(column, 1))/ksize*vsize
+	return BinaryMap[K, V]{keys: keys, values: values}
+}
+
+func (m BinaryMap[K, V]) Len() int {
+	return m.keys.count
+}
+
+func (m BinaryMap[K, V]) Key(i int) K {
+	return m.keys.At(i)
+}
+
+func (m BinaryMap[K, V]) Value(i int) V {
+	return m.values.At(i)
+}
+
+// Get 顺序查找，配置表中的字典一般很小
+func (m BinaryMap[K, V]) Get(key K) (V, bool) {
+	for i := 0; i < m.keys.count; i++ {
+		if m.keys.At(i) == key {
+			return m.values.At(i), true
+		}
+	}
+	var zero V
+	return zero, false
+}
+
+"""
+
+go_mmap_unix_template = """//go:build unix
+
+package %s
+
+import (
+	"os"
+	"syscall"
+)
+
+func mapFile(f *os.File, size int) ([]byte, error) {
+	return syscall.Mmap(int(f.Fd()), 0, size, syscall.PROT_READ, syscall.MAP_SHARED)
+}
+
+func unmapFile(data []byte) error {
+	return syscall.Munmap(data)
+}
+"""
+
+go_mmap_windows_template = """//go:build windows
+
+package %s
+
+import (
+	"os"
+	"syscall"
+	"unsafe"
+)
+
+func mapFile(f *os.File, size int) ([]byte, error) {
+	h, err := syscall.CreateFileMapping(syscall.Handle(f.Fd()), nil, syscall.PAGE_READONLY, 0, 0, nil)
+	if err != nil {
+		return nil, err
+	}
+	defer syscall.CloseHandle(h)
+	addr, err := syscall.MapViewOfFile(h, syscall.FILE_MAP_READ, 0, 0, uintptr(size))
+	if err != nil {
+		return nil, err
+	}
+	return unsafe.Slice((*byte)(unsafe.Pointer(addr)), size), nil
+}
+
+func unmapFile(data []byte) error {
+	return syscall.UnmapViewOfFile(uintptr(unsafe.Pointer(&data[0])))
+}
+"""
+
+
+# 生成Go按内存映射读取二进制数据文件的代码，每一行是直接访问映射内存的视图
+class GoBinaryLoadGenerator:
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def imports() -> list[str]:
+        return ['encoding/binary', 'math', 'os', 'unsafe']
+
+    @staticmethod
+    def gen_runtime() -> str:
+        return go_binary_runtime_template
+
+    # 按平台区分的内存映射实现，文件名后缀 -> 内容
+    @staticmethod
+    def gen_mmap_sources(args: Namespace) -> dict[str, str]:
+        head = '// This file is auto-generated by Tabugen v%s, DO NOT EDIT!\n\n' % version.VER_STRING
+        return {
+            '_mmap_unix.go': head + go_mmap_unix_template % args.package,
+            '_mmap_windows.go': head + go_mmap_windows_template % args.package,
+        }
+
+    @staticmethod
+    def value_type(typ: Type) -> str:
+        return lang.map_go_type(types.get_name_of_type(typ))
+
+    # 读取函数和值的字节数
+    def value_reader(self, typ: Type) -> tuple[str, int]:
+        size = 4
+        if typ in (Type.Bool, Type.Int8, Type.UInt8):
+            size = 1
+        elif typ in (Type.Int16, Type.UInt16):
+            size = 2
+        elif typ in (Type.Int64, Type.UInt64, Type.Float64):
+            size = 8
+        return '(*BinaryTable).read%s' % self.value_type(typ).title(), size
+
+    def gen_getter(self, struct_name: str, name: str, column: BinaryColumn, index: int) -> str:
+        if column.type == Type.Array:
+            typename = 'BinaryArray[%s]' % self.value_type(column.value_type)
+            reader, size = self.value_reader(column.value_type)
+            expr = 'newBinaryArray(v.t, %d, v.row, %d, %s)' % (index, size, reader)
+        elif column.type == Type.Map:
+            typename = 'BinaryMap[%s, %s]' % (self.value_type(column.key_type), self.value_type(column.value_type))
+            kreader, ksize = self.value_reader(column.key_type)
+            vreader, vsize = self.value_reader(column.value_type)
+            expr = 'newBinaryMap(v.t, %d, v.row, %d, %s, %d, %s)' % (index, ksize, kreader, vsize, vreader)
+        else:
+            typename = self.value_type(column.type)
+            _, size = self.value_reader(column.type)
+            expr = 'v.t.read%s(v.t.cell(%d, v.row, %d))' % (typename.title(), index, size)
+        content = 'func (v %sView) %s() %s {\n' % (struct_name, name, typename)
+        content += '\treturn %s\n' % expr
+        content += '}\n\n'
+        return content
+
+    # 二维数组的每一行是连续的列，按行号访问
+    def gen_nested_getter(self, struct_name: str, name: str, column: BinaryColumn, index: int, count: int) -> str:
+        reader, size = self.value_reader(column.value_type)
+        content = '// %s i < %d\n' % (name, count)
+        content += 'func (v %sView) %s(i int) BinaryArray[%s] {\n' % (struct_name, name, self.value_type(column.value_type))
+        content += '\treturn newBinaryArray(v.t, %d+i, v.row, %d, %s)\n' % (index, size, reader)
+        content += '}\n\n'
+        return content
+
+    def gen_view_getters(self, struct: Struct, columns: list[BinaryColumn]) -> str:
+        name = struct.camel_case_name
+        content = ''
+        if struct.options[predef.PredefParseKVMode]:
+            index = {column.name: i for i, column in enumerate(columns)}
+            for field in struct.kv_fields:
+                i = index.get(field.name.strip())
+                if i is not None:
+                    content += self.gen_getter(name, field.camel_case_name, columns[i], i)
+            return content
+        for i, field in enumerate(struct.fields):
+            content += self.gen_getter(name, field.camel_case_name, columns[i], i)
+        index = len(struct.fields)
+        for array in struct.array_fields:
+            if array.is_nested():
+                count = len(array.element_rows)
+                content += self.gen_nested_getter(name, array.field_name, columns[index], index, count)
+                index += count
+            else:
+                content += self.gen_getter(name, array.field_name, columns[index], index)
+                index += 1
+        return content
+
+    def generate(self, struct: Struct, args: Namespace) -> str:
+        columns = BinaryDataWriter.struct_columns(struct, args)
+        name = struct.camel_case_name
+        content = '// %sView %s的一行，直接读取映射的内存\n' % (name, name)
+        content += 'type %sView struct {\n' % name
+        content += '\tt   *BinaryTable\n'
+        content += '\trow int\n'
+        content += '}\n\n'
+        content += self.gen_view_getters(struct, columns)
+
+        content += '// %sBinaryFingerprint %s数据文件的结构指纹\n' % (name, name)
+        content += 'const %sBinaryFingerprint = 0x%016x\n\n' % (name, schema_fingerprint(columns))
+        content += '// %sBinaryTable %s的二进制数据文件\n' % (name, name)
+        content += 'type %sBinaryTable struct {\n' % name
+        content += '\t*BinaryTable\n'
+        content += '}\n\n'
+        content += 'func Open%sBinaryTable(filename string) (*%sBinaryTable, error) {\n' % (name, name)
+        content += '\tt, err := OpenBinaryTable(filename, %sBinaryFingerprint)\n' % name
+        content += '\tif err != nil {\n'
+        content += '\t\treturn nil, err\n'
+        content += '\t}\n'
+        content += '\treturn &%sBinaryTable{t}, nil\n' % name
+        content += '}\n\n'
+        if struct.options[predef.PredefParseKVMode]:
+            content += 'func (t *%sBinaryTable) Get() %sView {\n' % (name, name)
+            content += '\treturn %sView{t: t.BinaryTable}\n' % name
+            content += '}\n\n'
+        else:
+            content += 'func (t *%sBinaryTable) Len() int {\n' % name
+            content += '\treturn t.RowCount()\n'
+            content += '}\n\n'
+            content += 'func (t *%sBinaryTable) Row(i int) %sView {\n' % (name, name)
+            content += '\treturn %sView{t: t.BinaryTable, row: i}\n' % name
+            content += '}\n\n'
+        return content
@@ -8,7 +8,7 @@ from argparse import Namespace
 import tabugen.lang as lang
 import tabugen.predef as predef
 import tabugen.typedef as types
-from tabugen.structs import Struct
+from tabugen.structs import Struct, ArrayField
 
 
 # 生成Go加载CSV文件数据代码
@@ -55,26 +55,129 @@ class GoCsvLoadGenerator:
         content += '}\n\n'
         return content
 
-    # 生成`ParseFrom`方法
+    # 生成列位置结构，每个表只需要查找一次
+    # 数组元素按解析时的列名查找，下标可以不连续，数据表中不存在的列跳过
+    def gen_columns_define(self, struct: Struct) -> str:
+        name = struct.camel_case_name + 'Columns'
+        content = '// %s %s的列位置\n' % (name, struct.camel_case_name)
+        content += 'type %s struct {\n' % name
+        for field in struct.fields:
+            content += '\t%s int\n' % field.name
+        for array in struct.array_fields:
+            if array.is_nested():
+                content += '\t%s [][]int\n' % array.field_name
+            else:
+                content += '\t%s []int\n' % array.field_name
+        content += '}\n\n'
+
+        content += 'func (c *%s) Resolve(table *GDTable) {\n' % name
+        for field in struct.fields:
+            content += '\tc.%s = table.ColumnIndex("%s")\n' % (field.name, field.name)
+        for array in struct.array_fields:
+            if array.is_nested():
+                content += self.gen_resolve_nested_array(array)
+                continue
+            names = ', '.join('"%s"' % elem.name for elem in array.element_fields)
+            content += '\tfor _, name := range []string{%s} {\n' % names
+            content += '\t\tif col := table.ColumnIndex(name); col >= 0 {\n'
+            content += '\t\t\tc.%s = append(c.%s, col)\n' % (array.field_name, array.field_name)
+            content += '\t\t}\n'
+            content += '\t}\n'
+        content += '}\n\n'
+        return content
+
+    # 二维数组name[i][j]的列位置
+    @staticmethod
+    def gen_resolve_nested_array(array: ArrayField) -> str:
+        rows = ', '.join('{%s}' % ', '.join('"%s"' % elem.name for elem in row) for row in array.element_rows)
+        content = '\tfor _, names := range [][]string{%s} {\n' % rows
+        content += '\t\tvar cols []int\n'
+        content += '\t\tfor _, name := range names {\n'
+        content += '\t\t\tif col := table.ColumnIndex(name); col >= 0 {\n'
+        content += '\t\t\t\tcols = append(cols, col)\n'
+        content += '\t\t\t}\n'
+        content += '\t\t}\n'
+        content += '\t\tif len(cols) > 0 {\n'
+        content += '\t\t\tc.%s = append(c.%s, cols)\n' % (array.field_name, array.field_name)
+        content += '\t\t}\n'
+        content += '\t}\n'
+        return content
+
+    # 读取数组的所有元素到target，二维数组按行读取
+    def gen_parse_array(self, array: ArrayField, target: str, tabs: int) -> str:
+        origin_typename = array.element_fields[0].origin_type_name
+        name = array.field_name
+        space = '\t' * tabs
+        content = '%sif n := len(cols.%s); n > 0 {\n' % (space, name)
+        if not array.is_nested():
+            content += '%s\t%s = make(%s, 0, n)\n' % (space, target, lang.map_go_type(array.type_name))
+            content += '%s\tfor _, col := range cols.%s {\n' % (space, name)
+            content += self.gen_field_assign('', origin_typename, 'var elem', 'table.GetCellAt(col, row)', tabs + 2)
+            content += '%s\t\t%s = append(%s, elem)\n' % (space, target, target)
+            content += '%s\t}\n' % space
+            content += '%s}\n' % space
+            return content
+        content += '%s\t%s = make(%s, n)\n' % (space, target, lang.map_go_type(array.type_name))
+        content += '%s\tfor i, rowCols := range cols.%s {\n' % (space, name)
+        content += '%s\t\t%s[i] = make(%s, 0, len(rowCols))\n' % (space, target, lang.map_go_type(origin_typename + '[]'))
+        content += '%s\t\tfor _, col := range rowCols {\n' % space
+        content += self.gen_field_assign('', origin_typename, 'var elem', 'table.GetCellAt(col, row)', tabs + 3)
+        content += '%s\t\t\t%s[i] = append(%s[i], elem)\n' % (space, target, target)
+        content += '%s\t\t}\n' % space
+        content += '%s\t}\n' % space
+        content += '%s}\n' % space
+        return content
+
+    # 生成`ParseRow`方法
     def gen_parse_method(self, struct: Struct) -> str:
-        content = ''
-        content += 'func (p *%s) ParseRow(table *GDTable, row int) {\n' % struct.camel_case_name
+        name = struct.camel_case_name
+        content = self.gen_columns_define(struct)
+        content += 'func (p *%s) ParseRowAt(table *GDTable, cols *%sColumns, row int) {\n' % (name, name)
         for field in struct.fields:
             origin_typename = field.origin_type_name
-            valuetext = 'table.GetCell("%s", row)' % field.name
+            valuetext = 'table.GetCellAt(cols.%s, row)' % field.name
             content += self.gen_field_assign('p.', origin_typename, field.name, valuetext, 1)
 
         for array in struct.array_fields:
-            content += '\tfor col := 0; col < table.ColSize(); col++ {\n'
-            content += '\t\tvar name = fmt.Sprintf("%s[%%d]", col)\n' % array.name
-            content += '\t\tif !table.HasColumn(name) {\n'
-            content += '\t\t\tbreak\n'
-            content += '\t\t}\n'
-            origin_typename = array.element_fields[0].origin_type_name
-            content += self.gen_field_assign('', origin_typename, 'var elem', 'table.GetCell(name, row)', 2)
-            content += '\t\tp.%s = append(p.%s, elem)\n' % (array.field_name, array.field_name)
-            content += '\t}\n'
+            content += self.gen_parse_array(array, 'p.' + array.field_name, 1)
+        content += '}\n\n'
+
+        content += 'func (p *%s) ParseRow(table *GDTable, row int) {\n' % name
+        content += '\tvar cols %sColumns\n' % name
+        content += '\tcols.Resolve(table)\n'
+        content += '\tp.ParseRowAt(table, &cols, row)\n'
+        content += '}\n\n'
 
+        content += '// ParseAll%s 解析所有数据行\n' % name
+        content += 'func ParseAll%s(table *GDTable) []%s {\n' % (name, name)
+        content += '\tvar cols %sColumns\n' % name
+        content += '\tcols.Resolve(table)\n'
+        content += '\tvar list = make([]%s, table.RowSize())\n' % name
+        content += '\tfor i := range list {\n'
+        content += '\t\tlist[i].ParseRowAt(table, &cols, i)\n'
+        content += '\t}\n'
+        content += '\treturn list\n'
+        content += '}\n\n'
+        return content
+
+    # 生成列式容器的`Load`方法，逐列解析单元格直接填充到每个字段的切片
+    def gen_columnar_load_method(self, struct: Struct) -> str:
+        name = struct.camel_case_name
+        content = 'func (c *%sColumnar) Load(table *GDTable) {\n' % name
+        content += '\tvar cols %sColumns\n' % name
+        content += '\tcols.Resolve(table)\n'
+        content += '\tvar rowCount = table.RowSize()\n'
+        for field in struct.fields:
+            valuetext = 'table.GetCellAt(cols.%s, row)' % field.name
+            content += '\tc.%s = make([]%s, rowCount)\n' % (field.name, lang.map_go_type(field.origin_type_name))
+            content += '\tfor row := 0; row < rowCount; row++ {\n'
+            content += self.gen_field_assign('c.', field.origin_type_name, field.name + '[row]', valuetext, 2)
+            content += '\t}\n'
+        for array in struct.array_fields:
+            content += '\tc.%s = make([]%s, rowCount)\n' % (array.field_name, lang.map_go_type(array.type_name))
+            content += '\tfor row := 0; row < rowCount; row++ {\n'
+            content += self.gen_parse_array(array, 'c.%s[row]' % array.field_name, 2)
+            content += '\t}\n'
         content += '}\n\n'
         return content
 
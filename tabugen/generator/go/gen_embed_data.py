@@ -0,0 +1,61 @@
+"""
+Copyright (C) 2024 qi7chen@github. All rights reserved.
+Distributed under the terms and conditions of the Apache License.
+See accompanying files LICENSE.
+"""
+
+from argparse import Namespace
+import tabugen.lang as lang
+import tabugen.predef as predef
+import tabugen.util.typedvalue as typedvalue
+from tabugen.structs import Struct
+
+
+# 把数据作为包级别的复合字面量生成到Go代码中，运行时不需要再读取和解析数据文件
+class GoEmbedDataGenerator:
+
+    def __init__(self):
+        self.TAB_SPACE = '\t'
+
+    @staticmethod
+    def can_embed(struct: Struct, args: Namespace) -> bool:
+        return typedvalue.can_embed(struct, args)
+
+    # KV模式生成一个对象
+    def gen_kv_data(self, struct: Struct, args: Namespace) -> str:
+        values = typedvalue.embed_values(struct, args)
+        name = struct.camel_case_name
+        content = 'var %sData = %s{\n' % (name, name)
+        for field in struct.kv_fields:
+            typename, value = values[field.name]
+            literal = lang.go_value_literal(value, typedvalue.normalize_type_name(typename))
+            content += '\t%s: %s,\n' % (field.camel_case_name, literal)
+        content += '}\n\n'
+        return content
+
+    # 每一行使用字段名初始化
+    def gen_rows_data(self, struct: Struct, args: Namespace) -> str:
+        rows = typedvalue.embed_values(struct, args)
+        names = [field.camel_case_name for field in struct.fields]
+        names += [array.field_name for array in struct.array_fields]
+        typenames = [typedvalue.normalize_type_name(field.origin_type_name) for field in struct.fields]
+        typenames += [typedvalue.normalize_type_name(array.type_name) for array in struct.array_fields]
+        name = struct.camel_case_name
+        content = 'var %sRows = []%s{\n' % (name, name)
+        for row in rows:
+            items = ['%s: %s' % (names[i], lang.go_value_literal(value, typenames[i])) for i, value in enumerate(row)]
+            content += '\t{%s},\n' % ', '.join(items)
+        content += '}\n\n'
+        return content
+
+    def generate(self, struct: Struct, args: Namespace) -> str:
+        if not self.can_embed(struct, args):
+            return ''
+        name = struct.camel_case_name
+        if struct.options[predef.PredefParseKVMode]:
+            content = '// %sData %s的数据，从%s嵌入\n' % (name, name, struct.filepath)
+            content += self.gen_kv_data(struct, args)
+        else:
+            content = '// %sRows %s的数据，从%s嵌入\n' % (name, name, struct.filepath)
+            content += self.gen_rows_data(struct, args)
+        return content
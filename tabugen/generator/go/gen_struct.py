@@ -10,9 +10,11 @@ import tabugen.lang as lang
 import tabugen.predef as predef
 import tabugen.util.helper as helper
 import tabugen.version as version
-from tabugen.util.tableutil import legacy_kv_type, parse_kv_fields
+from tabugen.util.tableutil import legacy_kv_type, parse_kv_fields, get_unique_fields, is_columnar_layout
 from tabugen.structs import Struct, StructField, ArrayField
 from tabugen.generator.go.gen_csv_load import GoCsvLoadGenerator
+from tabugen.generator.go.gen_embed_data import GoEmbedDataGenerator
+from tabugen.generator.go.gen_binary_load import GoBinaryLoadGenerator
 
 
 # Go代码生成器
@@ -25,11 +27,24 @@ class GoStructGenerator:
 
     def __init__(self):
         self.parse_gen = None
+        self.embed_gen = None
+        self.binary_gen = None
+        self.reorder_fields = False
         self.json_snake_case = False
 
     def enable_gen_parse(self, name):
         if name == 'csv':
             self.parse_gen = GoCsvLoadGenerator()
+        elif name == 'binary':
+            self.binary_gen = GoBinaryLoadGenerator()
+
+    # 把数据嵌入到生成的代码中
+    def enable_embed_data(self):
+        self.embed_gen = GoEmbedDataGenerator()
+
+    # 按对齐重新排列字段，减少填充
+    def enable_reorder_fields(self):
+        self.reorder_fields = True
 
     # 生成字段定义
     def gen_field_define(self, field: StructField, max_type_len: int, max_name_len: int, tabs: int,
@@ -91,13 +106,19 @@ class GoStructGenerator:
 
         max_type_len = struct.max_field_lang_type_length()
         max_name_len = struct.max_field_lang_var_length()
+        members = fields + struct.array_fields
+        if self.reorder_fields:
+            members = lang.reorder_by_alignment(members, lang.go_type_layout)
+            before = lang.estimate_members_size(fields + struct.array_fields, lang.go_type_layout)
+            after = lang.estimate_members_size(members, lang.go_type_layout)
+            print('Go struct %s sizeof %d -> %d bytes' % (struct.camel_case_name, before, after))
+
         content = ''
-        for col, field in enumerate(fields):
-            text = self.gen_field_define(field, max_type_len, max_name_len, 1, args.json_snake_case)
-            content += text
-        for array in struct.array_fields:
-            text = self.gen_array_define(array, max_type_len, max_name_len, 1, args.json_snake_case)
-            content += text
+        for member in members:
+            if isinstance(member, ArrayField):
+                content += self.gen_array_define(member, max_type_len, max_name_len, 1, args.json_snake_case)
+            else:
+                content += self.gen_field_define(member, max_type_len, max_name_len, 1, args.json_snake_case)
         return content
 
     # 生成struct
@@ -126,18 +147,125 @@ class GoStructGenerator:
         content += '\n'
         if self.parse_gen is not None:
             content += self.parse_gen.generate(struct, args)
+        if self.embed_gen is not None:
+            content += self.embed_gen.generate(struct, args)
+        content += self.gen_lookup_table(struct, args)
+        content += self.gen_columnar_table(struct, args)
+        if self.binary_gen is not None:
+            content += self.binary_gen.generate(struct, args)
+        return content
+
+    # 生成按唯一字段查找的索引容器
+    def gen_lookup_table(self, struct: Struct, args: Namespace) -> str:
+        fields = get_unique_fields(struct)
+        if len(fields) == 0:
+            return ''
+        name = struct.camel_case_name
+        content = '// %sTable %s按唯一字段的查找索引\n' % (name, name)
+        content += 'type %sTable struct {\n' % name
+        content += '\tRows []%s\n' % name
+        for field in fields:
+            key_type = lang.map_go_type(field.origin_type_name)
+            content += '\tBy%s map[%s]*%s\n' % (field.camel_case_name, key_type, name)
+        content += '}\n\n'
+
+        content += 'func (t *%sTable) BuildIndex() {\n' % name
+        for field in fields:
+            key_type = lang.map_go_type(field.origin_type_name)
+            content += '\tt.By%s = make(map[%s]*%s, len(t.Rows))\n' % (field.camel_case_name, key_type, name)
+        content += '\tfor i := range t.Rows {\n'
+        content += '\t\tvar row = &t.Rows[i]\n'
+        for field in fields:
+            content += '\t\tif _, found := t.By%s[row.%s]; !found {\n' % (field.camel_case_name, field.camel_case_name)
+            content += '\t\t\tt.By%s[row.%s] = row\n' % (field.camel_case_name, field.camel_case_name)
+            content += '\t\t}\n'
+        content += '\t}\n'
+        content += '}\n\n'
+
+        for field in fields:
+            key_type = lang.map_go_type(field.origin_type_name)
+            content += 'func (t *%sTable) FindBy%s(key %s) *%s {\n' % (name, field.camel_case_name, key_type, name)
+            content += '\treturn t.By%s[key]\n' % field.camel_case_name
+            content += '}\n\n'
+
+        if self.parse_gen is not None:
+            content += 'func (t *%sTable) Load(table *GDTable) {\n' % name
+            content += '\tt.Rows = ParseAll%s(table)\n' % name
+            content += '\tt.BuildIndex()\n'
+            content += '}\n\n'
+
+        if self.embed_gen is not None and self.embed_gen.can_embed(struct, args):
+            content += 'func (t *%sTable) LoadEmbedded() {\n' % name
+            content += '\tt.Rows = %sRows\n' % name
+            content += '\tt.BuildIndex()\n'
+            content += '}\n\n'
+        return content
+
+    # 生成按列存储的容器，每个字段是一个连续的切片，按列扫描时缓存友好
+    def gen_columnar_table(self, struct: Struct, args: Namespace) -> str:
+        if not is_columnar_layout(struct):
+            return ''
+        name = struct.camel_case_name
+        members = [(field.name, lang.map_go_type(field.origin_type_name)) for field in struct.fields]
+        members += [(array.field_name, lang.map_go_type(array.type_name)) for array in struct.array_fields]
+        content = '// %sColumnar %s按列存储，每个字段是一个连续的切片\n' % (name, name)
+        content += 'type %sColumnar struct {\n' % name
+        for member, typename in members:
+            content += '\t%s []%s\n' % (member, typename)
+        content += '}\n\n'
+
+        content += 'func (c *%sColumnar) Len() int {\n' % name
+        if len(members) > 0:
+            content += '\treturn len(c.%s)\n' % members[0][0]
+        else:
+            content += '\treturn 0\n'
+        content += '}\n\n'
+
+        content += 'func (c *%sColumnar) Reset(capacity int) {\n' % name
+        for member, typename in members:
+            content += '\tc.%s = make([]%s, 0, capacity)\n' % (member, typename)
+        content += '}\n\n'
+
+        content += 'func (c *%sColumnar) Append(row *%s) {\n' % (name, name)
+        for member, typename in members:
+            content += '\tc.%s = append(c.%s, row.%s)\n' % (member, member, member)
+        content += '}\n\n'
+
+        content += '// Row 从每一列取出第i行\n'
+        content += 'func (c *%sColumnar) Row(i int) %s {\n' % (name, name)
+        content += '\treturn %s{\n' % name
+        for member, typename in members:
+            content += '\t\t%s: c.%s[i],\n' % (member, member)
+        content += '\t}\n'
+        content += '}\n\n'
+
+        if self.parse_gen is not None:
+            content += self.parse_gen.gen_columnar_load_method(struct)
+
+        if self.embed_gen is not None and self.embed_gen.can_embed(struct, args):
+            content += 'func (c *%sColumnar) LoadEmbedded() {\n' % name
+            content += '\tc.Reset(len(%sRows))\n' % name
+            content += '\tfor i := range %sRows {\n' % name
+            content += '\t\tc.Append(&%sRows[i])\n' % name
+            content += '\t}\n'
+            content += '}\n\n'
         return content
 
     def run(self, descriptors: list[Struct], filepath: str, args: Namespace):
         content = '// This file is auto-generated by Tabugen v%s, DO NOT EDIT!\n\npackage %s\n\n'
         content = content % (version.VER_STRING, args.package)
+        imports = ['fmt', 'strings']
+        if self.binary_gen is not None:
+            imports = sorted(imports + self.binary_gen.imports())
         content += 'import (\n'
-        content += '\t"fmt"\n'
-        content += '\t"strings"\n'
+        for name in imports:
+            content += '\t"%s"\n' % name
         content += ')\n\n'
 
         content += 'var _ = fmt.Println\n'
         content += 'var _ = strings.TrimSpace\n\n'
+        if self.binary_gen is not None:
+            content += self.binary_gen.gen_runtime()
 
         if args.json_snake_case:
             self.json_snake_case = True
@@ -151,6 +279,11 @@ class GoStructGenerator:
 
         helper.save_content_if_not_same(filename, content, 'utf-8')
         print('wrote Go source to %s' % filename)
+        if self.binary_gen is not None:
+            for suffix, text in self.binary_gen.gen_mmap_sources(args).items():
+                mmap_filename = filename[:-3] + suffix
+                helper.save_content_if_not_same(mmap_filename, text, 'utf-8')
+                print('wrote Go source to %s' % mmap_filename)
 
         if args.go_fmt:
             cmd = 'go fmt ' + filename
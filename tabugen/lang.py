@@ -3,6 +3,7 @@
 # See accompanying files LICENSE.
 
 from __future__ import annotations
+import json
 import tabugen.typedef as types
 import tabugen.util.tableutil as tableutil
 from tabugen.structs import StructField, ArrayField
@@ -29,6 +30,8 @@ def map_cpp_type(typ: str) -> str:
         'double': 'double',
         'string': 'string',
     }
+    if typ.endswith('[][]'):  # 二维数组
+        return 'vector<%s>' % map_cpp_type(typ[:-2])
     abs_type = types.is_composite_type(typ)
     if abs_type == '':
         return type_mapping[typ]
@@ -99,6 +102,8 @@ def map_go_type(typ: str) -> str:
         'double': 'float64',
         'string': 'string',
     }
+    if typ.endswith('[][]'):  # 二维数组
+        return '[]%s' % map_go_type(typ[:-2])
     abs_type = types.is_composite_type(typ)
     if abs_type == '':
         return type_mapping[typ]
@@ -160,6 +165,8 @@ def map_cs_type(typ: str) -> str:
         'double': 'double',
         'string': 'string',
     }
+    if typ.endswith('[][]'):  # 二维数组
+        return 'List<%s>' % map_cs_type(typ[:-2])
     abs_type = types.is_composite_type(typ)
     if abs_type == '':
         return type_mapping[typ]
@@ -181,8 +188,8 @@ def map_cs_type(typ: str) -> str:
 def map_cs_parse_func(typ: str) -> str:
     mapping = {
         'bool': 'Conv.ParseBool',
-        'int8': 'Conv.ParseByte',
-        'uint8': 'Conv.ParseUByte',
+        'int8': 'Conv.ParseSbyte',
+        'uint8': 'Conv.ParseByte',
         'int16': 'Conv.ParseShort',
         'uint16': 'Conv.ParseUShort',
         'int': 'Conv.ParseInt',
@@ -216,6 +223,157 @@ def cs_type_var_with_default_value(field: StructField | ArrayField, typename: st
         return '%s = new %s();' % (field.name, field.lang_type_name)
 
 
+# 嵌入数据的字面量，value是typedvalue转换后的值
+def float_literal(value: float) -> str:
+    text = repr(float(value))
+    if text in ['inf', '-inf', 'nan']:
+        raise ValueError('float literal %s is not finite' % text)
+    return text
+
+
+# C++字符串字面量，控制字符使用8进制转义
+def cpp_string_literal(text: str) -> str:
+    escapes = {'\\': '\\\\', '"': '\\"', '\n': '\\n', '\r': '\\r', '\t': '\\t'}
+    out = []
+    for ch in text:
+        if ch in escapes:
+            out.append(escapes[ch])
+        elif ord(ch) < 0x20 or ord(ch) == 0x7f:
+            out.append('\\%03o' % ord(ch))
+        else:
+            out.append(ch)
+    return '"%s"' % ''.join(out)
+
+
+def cpp_value_literal(value, typ: str) -> str:
+    if typ.endswith('[]'):
+        return '{%s}' % ', '.join(cpp_value_literal(v, typ[:-2]) for v in value)
+    if types.is_map_type(typ):
+        k, v = types.map_key_value_types(typ)
+        items = ['{%s, %s}' % (cpp_value_literal(key, k), cpp_value_literal(val, v)) for key, val in value.items()]
+        return '{%s}' % ', '.join(items)
+    typ = types.alias.get(typ, typ)
+    if typ == 'bool':
+        return 'true' if value else 'false'
+    if types.is_integer_type(typ):
+        if value > 0x7FFFFFFFFFFFFFFF:
+            return '%dULL' % value
+        if value == -0x8000000000000000:
+            return '(-9223372036854775807LL - 1)'  # 直接写INT64_MIN的字面量会被当作无符号数
+        if value > 0x7FFFFFFF or value < -0x7FFFFFFF:
+            return '%dLL' % value
+        return str(value)
+    if typ == 'float32':
+        return float_literal(value) + 'f'
+    if typ == 'float64':
+        return float_literal(value)
+    return cpp_string_literal(value)
+
+
+# Go和C#的转义规则兼容JSON字符串
+def go_value_literal(value, typ: str) -> str:
+    if typ.endswith('[]') or types.is_map_type(typ):
+        if len(value) == 0:
+            return 'nil'
+        if typ.endswith('[]'):
+            items = [go_value_literal(v, typ[:-2]) for v in value]
+        else:
+            k, v = types.map_key_value_types(typ)
+            items = ['%s: %s' % (go_value_literal(key, k), go_value_literal(val, v)) for key, val in value.items()]
+        return '%s{%s}' % (map_go_type(typ), ', '.join(items))
+    typ = types.alias.get(typ, typ)
+    if typ == 'bool':
+        return 'true' if value else 'false'
+    if types.is_integer_type(typ):
+        return str(value)
+    if types.is_floating_type(typ):
+        return float_literal(value)
+    return json.dumps(value, ensure_ascii=False)
+
+
+def cs_value_literal(value, typ: str) -> str:
+    if typ.endswith('[]') or types.is_map_type(typ):
+        if len(value) == 0:
+            return 'new %s()' % map_cs_type(typ)
+        if typ.endswith('[]'):
+            items = [cs_value_literal(v, typ[:-2]) for v in value]
+        else:
+            k, v = types.map_key_value_types(typ)
+            items = ['{ %s, %s }' % (cs_value_literal(key, k), cs_value_literal(val, v)) for key, val in value.items()]
+        return 'new %s { %s }' % (map_cs_type(typ), ', '.join(items))
+    typ = types.alias.get(typ, typ)
+    if typ == 'bool':
+        return 'true' if value else 'false'
+    if types.is_integer_type(typ):
+        return str(value)
+    if typ == 'float32':
+        return float_literal(value) + 'f'
+    if typ == 'float64':
+        return float_literal(value)
+    return json.dumps(value, ensure_ascii=False)
+
+
+# 基础类型的字节数，C++和Go相同
+primitive_type_sizes = {
+    'bool': 1, 'int8': 1, 'uint8': 1, 'int16': 2, 'uint16': 2, 'int32': 4, 'uint32': 4,
+    'int64': 8, 'uint64': 8, 'float32': 4, 'float64': 8,
+}
+
+
+# C++字段的(大小, 对齐)，按64位的libstdc++估算
+def cpp_type_layout(typ: str) -> tuple[int, int]:
+    typ = types.alias.get(typ.strip(), typ.strip())
+    abs_type = types.is_composite_type(typ)
+    if abs_type == 'array' or typ.endswith('[]'):
+        return 24, 8    # vector
+    if abs_type == 'map':
+        return 56, 8    # unordered_map
+    size = primitive_type_sizes.get(typ)
+    if size is None:
+        return 32, 8    # string
+    return size, size
+
+
+# Go字段的(大小, 对齐)，64位平台
+def go_type_layout(typ: str) -> tuple[int, int]:
+    typ = types.alias.get(typ.strip(), typ.strip())
+    abs_type = types.is_composite_type(typ)
+    if abs_type == 'array' or typ.endswith('[]'):
+        return 24, 8    # slice
+    if abs_type == 'map':
+        return 8, 8
+    size = primitive_type_sizes.get(typ)
+    if size is None:
+        return 16, 8    # string
+    return size, size
+
+
+# 按字段顺序估算结构的大小，包含对齐填充
+def estimate_struct_size(layouts: list[tuple[int, int]]) -> int:
+    offset = 0
+    max_align = 1
+    for size, align in layouts:
+        offset = (offset + align - 1) // align * align + size
+        max_align = max(max_align, align)
+    return (offset + max_align - 1) // max_align * max_align
+
+
+def member_type_name(member: StructField | ArrayField) -> str:
+    if isinstance(member, ArrayField):
+        return member.type_name
+    return member.origin_type_name
+
+
+# 按字段和数组字段的顺序估算结构的大小
+def estimate_members_size(members: list, layout_of) -> int:
+    return estimate_struct_size([layout_of(member_type_name(m)) for m in members])
+
+
+# 按对齐从大到小重新排列字段，对齐相同时保持原来的顺序
+def reorder_by_alignment(members: list, layout_of) -> list:
+    return sorted(members, key=lambda m: -layout_of(member_type_name(m))[1])
+
+
 # java装箱类型
 def java_box_type(typ: str) -> str:
     table = {
@@ -0,0 +1,105 @@
+# Copyright (C) 2018-present qi7chen@github. All rights reserved.
+# Distributed under the terms and conditions of the Apache License.
+# See accompanying files LICENSE.
+
+import os
+import pickle
+import hashlib
+import tempfile
+import unittest
+import tabugen.version as version
+import tabugen.util.helper as helper
+from tabugen.structs import Struct
+
+
+# 按文件内容哈希缓存解析结果，未修改的文件直接从缓存加载
+class ParseCache:
+    FORMAT_VERSION = 1
+
+    def __init__(self, cache_dir: str, options: dict):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.options = dict(options)    # 影响解析结果的参数
+        self.options['tabugen'] = version.VER_STRING
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def entry_path(self, filename: str) -> str:
+        key = hashlib.sha1(os.path.abspath(filename).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key + '.pickle')
+
+    def read_entry(self, filename: str) -> dict | None:
+        path = self.entry_path(filename)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except Exception:
+            return None
+        if entry.get('format') != self.FORMAT_VERSION or entry.get('options') != self.options:
+            return None
+        return entry
+
+    # 读取缓存，文件大小和修改时间一致时不再计算哈希
+    def load(self, filename: str) -> Struct | None:
+        entry = self.read_entry(filename)
+        if entry is None:
+            return None
+        st = os.stat(filename)
+        if entry['size'] == st.st_size and entry['mtime'] == st.st_mtime_ns:
+            return entry['struct']
+        if entry['size'] != st.st_size or entry['digest'] != helper.file_digest(filename):
+            return None
+        # 内容未变化但修改时间变了，刷新一下缓存的文件状态
+        struct = entry['struct']
+        self.save(filename, struct, entry['digest'])
+        return struct
+
+    def save(self, filename: str, struct: Struct, digest: str = ''):
+        st = os.stat(filename)
+        if not digest:
+            digest = helper.file_digest(filename)
+        entry = {
+            'format': self.FORMAT_VERSION,
+            'options': self.options,
+            'size': st.st_size,
+            'mtime': st.st_mtime_ns,
+            'digest': digest,
+            'struct': struct,
+        }
+        path = self.entry_path(filename)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+
+class TestParseCache(unittest.TestCase):
+
+    def test_load_and_invalidate(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'Item.csv')
+            with open(filename, 'w') as f:
+                f.write('ID,Name\n1,a\n')
+            cache = ParseCache(os.path.join(tmpdir, 'cache'), {'legacy': False})
+            self.assertIsNone(cache.load(filename))
+
+            struct = Struct(name='Item', data_rows=[['1', 'a']])
+            cache.save(filename, struct)
+            self.assertEqual(cache.load(filename), struct)
+
+            # 修改时间变化但内容相同
+            st = os.stat(filename)
+            os.utime(filename, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000000))
+            self.assertEqual(cache.load(filename), struct)
+
+            # 解析参数不同
+            other = ParseCache(os.path.join(tmpdir, 'cache'), {'legacy': True})
+            self.assertIsNone(other.load(filename))
+
+            with open(filename, 'w') as f:
+                f.write('ID,Name\n2,b\n')
+            self.assertIsNone(cache.load(filename))
+
+
+if __name__ == '__main__':
+    unittest.main()
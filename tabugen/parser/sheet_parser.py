@@ -4,12 +4,17 @@
 
 import os
 import time
+import traceback
+import collections
+import concurrent.futures
 import tabugen.predef as predef
 import tabugen.typedef as types
 import tabugen.structs as structs
 import tabugen.util.helper as helper
 import tabugen.util.tableutil as tableutil
+import tabugen.util.trace as trace
 import tabugen.parser.toolkit as toolkit
+from tabugen.parser.cache import ParseCache
 
 
 # 使用excel解析结构描述
@@ -21,6 +26,15 @@ class SpreadSheetParser:
         self.filenames = []     # 文件名列表
         self.project_kind = ''  # 项目类型
         self.legacy = False     # 是否兼容旧模式
+        self.jobs = 1           # 并行解析的进程数
+        self.errors = []        # 解析失败的文件及错误信息
+        self.cache = None       # 解析结果缓存
+        self.xlsx_reader = 'openpyxl'   # .xlsx文件的读取方式
+        self.schema_rows = 0    # 不导出数据时每个sheet最多读取的行数，0表示全部读取
+        self.infer_policy = None    # 推导类型的采样方式，None表示默认方式
+        self.infer_strict = False   # 是否打印导致类型推导退化的行
+        self.row_filters = {}   # 读取时按列的值过滤数据行
+        self.narrow_int = False     # 是否按数据缩小整数字段的类型
 
     @staticmethod
     def name():
@@ -30,24 +44,53 @@ class SpreadSheetParser:
     def init(self, args):
         self.legacy = args.legacy
         self.project_kind = args.project_kind
+        self.jobs = args.jobs
+        self.xlsx_reader = args.xlsx_reader
+        self.schema_rows = args.schema_rows
+        if args.infer_sample:
+            self.infer_policy = tableutil.SamplePolicy.parse(args.infer_sample)
+        self.infer_strict = args.infer_strict
+        self.row_filters = tableutil.parse_row_filters(args.row_filter)
+        self.narrow_int = args.narrow_int
+        if self.jobs <= 0:
+            self.jobs = os.cpu_count() or 1
         if args.without_data:
             self.with_data = False
         if args.file_skip:
             self.skip_names = [x.strip() for x in args.file_skip]
         for filepath in args.file_asset:
             self.enum_filenames(filepath)
+        if args.cache_dir:
+            self.cache = ParseCache(args.cache_dir, self.cache_options())
+
+    # 会影响解析结果的参数，参数变化后缓存失效
+    def cache_options(self) -> dict:
+        return {
+            'legacy': self.legacy,
+            'project_kind': self.project_kind,
+            'with_data': self.with_data,
+            'delim1': helper.Delim1,
+            'delim2': helper.Delim2,
+            'xlsx_reader': self.xlsx_reader,
+            'schema_rows': 0 if self.with_data else self.schema_rows,
+            'infer_policy': self.infer_policy,
+            'row_filters': self.row_filters,
+            'narrow_int': self.narrow_int,
+        }
 
     # 跳过忽略的文件名
-    def enum_filenames(self, file_dir: str):
+    def enum_filenames(self, file_dir: str, verbose=True):
         filenames = []
         if not os.path.exists(file_dir):
-            print('file path [%s] not exist' % file_dir)
+            if verbose:
+                print('file path [%s] not exist' % file_dir)
             return
 
         # filename is a directory
         if os.path.isdir(file_dir):
             file_dir = os.path.abspath(file_dir)
-            print('parse files in directory:', file_dir)
+            if verbose:
+                print('parse files in directory:', file_dir)
             filenames = toolkit.enum_spreadsheet_files(file_dir)
         elif os.path.isfile(file_dir):
             filename = os.path.abspath(file_dir)
@@ -56,10 +99,11 @@ class SpreadSheetParser:
             return
 
         if len(self.skip_names) == 0:
-            self.filenames = filenames
+            self.filenames += filenames
             return
 
-        print('skipped file names:', self.skip_names)
+        if verbose:
+            print('skipped file names:', self.skip_names)
         for filename in filenames:
             ignored = False
             for skip_name in self.skip_names:
@@ -70,38 +114,89 @@ class SpreadSheetParser:
             if not ignored:
                 self.filenames.append(filename)
 
+    # 重新搜索文件列表，用于监视模式发现新增和删除的文件
+    def rescan_filenames(self, file_assets: list[str]) -> list[str]:
+        self.filenames = []
+        for filepath in file_assets:
+            self.enum_filenames(filepath, verbose=False)
+        return self.filenames
+
     # 用于指定导出字段时做筛选
     def is_match_project_kind(self, kind_name: str) -> bool:
-        if self.project_kind == '' or kind_name == '':
-            return True
-        if kind_name == self.project_kind:
-            return True
-        if self.legacy and kind_name == 'A':  # A表示所有
+        return tableutil.match_project_kind(kind_name, self.project_kind, self.legacy)
+
+    # 不匹配项目类型的列在读取时丢弃
+    def keep_column(self, name: str) -> bool:
+        name = name.split('\n')[0]
+        if name.startswith('#'):
             return True
-        return False
+        kind_name, _, _ = tableutil.split_field_name(name)
+        return self.is_match_project_kind(kind_name)
+
+    # 读取sheet时的列和行过滤
+    def make_table_filter(self) -> toolkit.TableFilter:
+        keep_column = self.keep_column if self.project_kind != '' else None
+        return toolkit.TableFilter(keep_column, self.row_filters)
 
     # 推到字段类型
-    @staticmethod
-    def deduce_type_name(has_type_row: bool, type_name: str,  col: int, table):
+    def deduce_type_name(self, has_type_row: bool, type_name: str, col: int, table, field_name: str = ''):
         # 有类型定义列
         if type_name == '' and has_type_row:
             type_name = table[predef.PredefFieldTypeDefRow][col]
+        declared = type_name.strip()
 
+        info = None
         if type_name == '':  # 从内容列中推导出类型
-            type_name = tableutil.infer_field_type(table, predef.PredefFieldTypeDefRow, col)
+            with trace.span('infer type', 'parse', field=field_name):
+                info = tableutil.infer_column_type(table, predef.PredefFieldTypeDefRow, col, self.infer_policy)
+            type_name = info.type_name
 
         if type_name in types.alias:
             type_name = types.alias[type_name]
 
         if type_name == 'map':
-            type_name = tableutil.infer_field_map_type(table, predef.PredefFieldTypeDefRow, col)
+            with trace.span('infer type', 'parse', field=field_name):
+                info = tableutil.infer_map_type(table, predef.PredefFieldTypeDefRow, col, self.infer_policy)
+            type_name = info.type_name
         if type_name == 'array':
-            type_name = tableutil.infer_field_array_type(table, predef.PredefFieldTypeDefRow, col)
+            with trace.span('infer type', 'parse', field=field_name):
+                info = tableutil.infer_array_type(table, predef.PredefFieldTypeDefRow, col, self.infer_policy)
+            type_name = info.type_name
 
-        if types.is_valid_type_name(type_name):
-            return type_name
-        else:
+        if self.infer_strict and info is not None and info.break_row >= 0:
+            print('field %s inferred as %s, broken at row %d by value "%s"' % (
+                field_name, type_name, info.break_row + 1, info.break_text))
+
+        if not types.is_valid_type_name(type_name):
             return 'string'
+        if self.narrow_int:
+            return self.narrow_int_type_name(declared, type_name, col, table, has_type_row, field_name)
+        return type_name
+
+    # 按数据的取值范围缩小整数类型，没有声明类型和声明为int的字段可以缩小，声明了其它整数类型时作为下限
+    def narrow_int_type_name(self, declared: str, type_name: str, col: int, table, has_type_row: bool,
+                             field_name: str) -> str:
+        if not self.with_data and self.schema_rows > 0:
+            return type_name    # 只读取了部分数据行
+        delim = ''
+        elem_type = type_name
+        if type_name.endswith('[]') and not type_name.endswith('[][]'):
+            delim = helper.Delim1
+            elem_type = type_name[:-2]
+            declared = declared[:-2] if declared.endswith('[]') else ''
+        if tableutil.int_type_range(elem_type) is None:
+            return type_name
+        value_range = tableutil.scan_int_range(table, 2 if has_type_row else 1, col, delim)
+        if value_range is None:
+            return type_name
+        lower_bound = '' if declared in ['', 'int', 'arr', 'array'] else elem_type
+        narrowed = tableutil.narrow_int_type(value_range[0], value_range[1], lower_bound)
+        if narrowed == '':
+            return type_name
+        if lower_bound and narrowed != tableutil.narrow_int_type(0, 0, lower_bound):
+            print('field %s declared as %s is widened to %s, value range [%d, %d]' % (
+                field_name, declared, narrowed, value_range[0], value_range[1]))
+        return narrowed + '[]' if delim else narrowed
 
     def parse_struct(self, has_type_row, meta, table, struct: structs.Struct):
         class_name = meta[predef.PredefClassName]
@@ -128,7 +223,7 @@ class SpreadSheetParser:
                 if not self.is_match_project_kind(kind_name):
                     continue
 
-                type_name = self.deduce_type_name(has_type_row, type_name, col, table)
+                type_name = self.deduce_type_name(has_type_row, type_name, col, table, field_name)
                 assert type_name != ''
                 field_type = types.get_type_by_name(type_name)
 
@@ -139,6 +234,7 @@ class SpreadSheetParser:
             field.column = col
             field.origin_name = name
             field.name = field_name
+            field.kind = kind_name
             field.comment = comment
             field.camel_case_name = helper.camel_case(field_name)
             field.origin_type_name = type_name
@@ -162,36 +258,111 @@ class SpreadSheetParser:
                 has_type_row = True
                 data_start_row += 1
         self.parse_struct(has_type_row, meta, table, struct)
-        if self.with_data:
+        # KV模式的每一行都是一个字段定义，生成代码也需要
+        if self.with_data or meta.get(predef.PredefParseKVMode, False):
             data = table[data_start_row:]
             if len(data) > 0:
                 data = helper.pad_data_rows(table[data_start_row], data)
             struct.data_rows = data
         return struct
 
-    # 解析所有文件
+    # 解析所有文件，结果按输入文件顺序返回
     def parse_all(self):
-        descriptors = []
-        for filename in self.filenames:
-            # print(helper.current_time(), "start parse", filename)
-            struct = self.parse_one_file(filename)
+        with trace.span('parse all', 'parse', files=len(self.filenames)):
+            return list(self.iter_parse())
+
+    # 按输入文件顺序逐个返回解析结果，解析失败的文件记录在errors中
+    def iter_parse(self):
+        self.errors = []
+        if self.jobs > 1 and len(self.filenames) > 1:
+            results = self.iter_parse_parallel()
+        else:
+            results = (self.try_parse_one_file(filename) for filename in self.filenames)
+
+        for filename, struct, err in results:
             if struct is None:
                 print('parse file %s failed' % filename)
+                if err:
+                    print(err)
+                    self.errors.append((filename, err))
             else:
                 struct.file = filename
-                descriptors.append(struct)
-        return descriptors
+                yield struct
+
+    # 使用进程池并行解析，最多提前提交jobs*2个文件，已解析但未取走的结果不会无限堆积
+    def iter_parse_parallel(self):
+        jobs = min(self.jobs, len(self.filenames))
+        print('parse %d files with %d processes' % (len(self.filenames), jobs))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=init_parse_worker,
+                                                    initargs=(helper.Delim1, helper.Delim2, trace.enabled,
+                                                              trace.mem_enabled)) as executor:
+            filenames = iter(self.filenames)
+            pending = collections.deque()
+            for filename in filenames:
+                pending.append(executor.submit(self.worker_parse_one_file, filename))
+                if len(pending) >= jobs * 2:
+                    break
+            while len(pending) > 0:
+                result, events = pending.popleft().result()
+                filename = next(filenames, None)
+                if filename is not None:
+                    pending.append(executor.submit(self.worker_parse_one_file, filename))
+                trace.merge(events)
+                yield result
+
+    # 在子进程中解析，trace事件随解析结果一起传回
+    def worker_parse_one_file(self, filename):
+        result = self.try_parse_one_file(filename)
+        return result, trace.collect()
+
+    # 解析单个文件，出错时返回错误信息而不是抛出异常
+    def try_parse_one_file(self, filename):
+        try:
+            with trace.span('parse file', 'parse', file=filename):
+                return filename, self.load_or_parse_file(filename), ''
+        except Exception as e:
+            return filename, None, '%s\n%s' % (e, traceback.format_exc())
+
+    # 优先从缓存中加载解析结果
+    def load_or_parse_file(self, filename):
+        if self.cache is None:
+            return self.parse_one_file(filename)
+        with trace.span('load cache', 'parse', file=filename):
+            struct = self.cache.load(filename)
+        if struct is not None:
+            print('load cached workbook', filename)
+            return struct
+        struct = self.parse_one_file(filename)
+        with trace.span('save cache', 'parse', file=filename):
+            self.cache.save(filename, struct)
+        return struct
+
+    # 读取表格，只生成代码时可以只读取表头和少量用于推导类型的数据行
+    # 读取时只保留匹配项目类型的列和满足过滤条件的行
+    def read_table(self, filename: str, meta: dict) -> list[list[str]]:
+        if self.with_data or self.schema_rows <= 0:
+            return toolkit.read_workbook_table(filename, meta, self.xlsx_reader, 0, self.make_table_filter())
+        table = toolkit.read_workbook_table(filename, meta, self.xlsx_reader, self.schema_rows,
+                                            self.make_table_filter())
+        if meta.get(predef.PredefParseKVMode, False) and len(table) >= self.schema_rows:
+            table = toolkit.read_workbook_table(filename, meta, self.xlsx_reader, 0, self.make_table_filter())
+        return table
 
     # 解析单个文件
     def parse_one_file(self, filename):
         start_at = time.time()
         base_filename = os.path.basename(filename)
         meta = {}
-        table = toolkit.read_workbook_table(filename, meta)
-        table = tableutil.trim_empty_columns(table)
-        struct = self.parse_table_struct(meta, table)
+        table = self.read_table(filename, meta)
+        with trace.span('trim', 'parse', file=filename):
+            table = tableutil.trim_empty_columns(table)
+        with trace.span('parse struct', 'parse', file=filename):
+            struct = self.parse_table_struct(meta, table)
         struct.filepath = base_filename
-        struct.parse_array_fields()
+        with trace.span('group arrays', 'parse', file=filename):
+            struct.parse_array_fields()
+            if self.narrow_int:
+                tableutil.unify_array_int_types(struct)
         elapsed = time.time() - start_at
         struct.name = meta[predef.PredefClassName]
         struct.camel_case_name = helper.camel_case(struct.name)
@@ -199,3 +370,9 @@ class SpreadSheetParser:
         struct.options = meta
         return struct
 
+
+# 子进程需要同步主进程的分隔符和trace设置
+def init_parse_worker(delim1: str, delim2: str, trace_enabled: bool = False, mem_enabled: bool = False):
+    helper.Delim1 = delim1
+    helper.Delim2 = delim2
+    trace.init_worker(trace_enabled, mem_enabled)
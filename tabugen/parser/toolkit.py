@@ -5,12 +5,16 @@
 import csv
 import os
 import codecs
+import tempfile
+import unittest
 import xlrd
 import openpyxl
 from xlrd.sheet import Sheet
 from openpyxl.worksheet.worksheet import Worksheet
 import tabugen.predef as predef
 import tabugen.util.tableutil as tableutil
+import tabugen.util.trace as trace
+from tabugen.parser.xlsx_reader import XlsxStreamReader
 
 
 def is_ignored_filename(filename: str) -> bool:
@@ -36,35 +40,138 @@ def enum_spreadsheet_files(rootdir: str) -> list[str]:
     return filenames
 
 
-# 读取第一个sheet为数据和meta sheet
-def read_workbook_table(filename: str, meta: dict) -> list[list[str]]:
+# 读取时的列投影和行过滤，根据字段名行决定保留哪些列，丢弃的单元格不会被转换
+# keep_column(字段名)返回是否保留该列，row_filters为字段名 -> 允许的值，空白单元格总是保留
+class TableFilter:
+    def __init__(self, keep_column=None, row_filters: dict = None):
+        self.keep_column = keep_column
+        self.row_filters = row_filters or {}
+        self.columns = None     # 保留的列，None表示全部保留
+        self.checks = []        # (投影后的列, 允许的值)
+
+    # 根据字段名行计算投影，返回投影后的字段名行
+    def set_header(self, header: list[str]) -> list[str]:
+        start, end = 0, len(header)
+        while start < end and len(header[start]) == 0:
+            start += 1
+        while end > start and len(header[end - 1]) == 0:
+            end -= 1
+        columns = list(range(start, end))
+        if self.keep_column is not None:
+            columns = [col for col in columns if self.keep_column(header[col])]
+        if len(columns) != len(header):
+            self.columns = columns
+            header = [header[col] for col in columns]
+        for col, text in enumerate(header):
+            name = text.split('\n')[0]
+            if name.startswith('#'):
+                continue
+            _, _, name = tableutil.split_field_name(name)
+            if name in self.row_filters:
+                self.checks.append((col, self.row_filters[name]))
+        return header
+
+    def project(self, cells):
+        if self.columns is None:
+            return cells
+        n = len(cells)
+        return [cells[col] if col < n else None for col in self.columns]
+
+    # 投影后的原始单元格是否满足过滤条件
+    def accept(self, cells, cell_text) -> bool:
+        for col, values in self.checks:
+            if col >= len(cells) or cells[col] is None:
+                continue
+            text = cell_text(cells[col])
+            if len(text) > 0 and try_conv_float_int(text) not in values:
+                return False
+        return True
+
+
+# 读取第一个sheet为数据，名为meta的sheet为选项
+# xlsx_reader指定.xlsx文件的读取方式，openpyxl或者stream(直接流式解析xml)
+# max_rows大于0时最多读取这么多非空行(包含字段名行)，用于只需要表头的场景
+# table_filter不为空时在读取过程中做列投影和行过滤，meta sheet不受影响
+def read_workbook_table(filename: str, meta: dict, xlsx_reader: str = 'openpyxl', max_rows: int = 0,
+                        table_filter: TableFilter = None) -> list[list[str]]:
     print('start load workbook', filename)
-    if filename.endswith('.xlsx'):
-        workbook = openpyxl.load_workbook(filename, data_only=True, read_only=True)
+    if filename.endswith('.xlsx') and xlsx_reader == 'stream':
+        with trace.span('open workbook', 'read', file=filename):
+            reader = XlsxStreamReader(filename)
+        with reader:
+            sheet_names = reader.sheet_names
+            if len(sheet_names) == 0:
+                return []
+            with trace.span('read sheet', 'read', file=filename):
+                table = __stream_read_sheet_to_table(reader.iter_rows(0), max_rows, table_filter)
+            meta_idx = find_meta_sheet(sheet_names)
+            if meta_idx > 0:
+                with trace.span('read meta sheet', 'read', file=filename):
+                    parse_meta_table(__stream_read_sheet_to_table(reader.iter_rows(meta_idx)), meta)
+        parse_sheet_table(filename, sheet_names[0], table, meta)
+        return table
+    elif filename.endswith('.xlsx'):
+        with trace.span('open workbook', 'read', file=filename):
+            workbook = openpyxl.load_workbook(filename, data_only=True, read_only=True)
         sheet_names = workbook.sheetnames
         if len(sheet_names) == 0:
             workbook.close()
             return []
         first_sheet = workbook[sheet_names[0]]
-        table = __xlsx_read_sheet_to_table(first_sheet)
+        with trace.span('read sheet', 'read', file=filename):
+            table = __xlsx_read_sheet_to_table(first_sheet, max_rows, table_filter)
+        meta_idx = find_meta_sheet(sheet_names)
+        if meta_idx > 0:
+            with trace.span('read meta sheet', 'read', file=filename):
+                parse_meta_table(__xlsx_read_sheet_to_table(workbook[sheet_names[meta_idx]]), meta)
+        workbook.close()
         parse_sheet_table(filename, sheet_names[0], table, meta)
         return table
     elif filename.endswith('.xls'):
-        workbook = xlrd.open_workbook(filename)
+        with trace.span('open workbook', 'read', file=filename):
+            workbook = xlrd.open_workbook(filename, on_demand=True)
         sheet_names = workbook.sheet_names()
         if len(sheet_names) == 0:
             return []
         first_sheet = workbook.sheet_by_name(sheet_names[0])
-        table = __xls_read_sheet_to_table(first_sheet)
+        with trace.span('read sheet', 'read', file=filename):
+            table = __xls_read_sheet_to_table(first_sheet, max_rows, table_filter)
+        meta_idx = find_meta_sheet(sheet_names)
+        if meta_idx > 0:
+            with trace.span('read meta sheet', 'read', file=filename):
+                parse_meta_table(__xls_read_sheet_to_table(workbook.sheet_by_index(meta_idx)), meta)
+        workbook.release_resources()
         parse_sheet_table(filename, sheet_names[0], table, meta)
         return table
     elif filename.endswith('.csv'):
         meta[predef.PredefClassName] = os.path.splitext(os.path.basename(filename))[0]
-        return __read_csv_to_table(filename)
+        with trace.span('read sheet', 'read', file=filename):
+            return __read_csv_to_table(filename, max_rows, table_filter)
     else:
         return []
 
 
+# 名为meta的sheet，不存在返回-1
+def find_meta_sheet(sheet_names: list[str]) -> int:
+    for i, name in enumerate(sheet_names):
+        if name.strip().lower() == 'meta':
+            return i
+    return -1
+
+
+# meta sheet每行是一个选项，第一列为名称，第二列为值
+def parse_meta_table(table: list[list[str]], meta: dict):
+    for row in table:
+        if len(row) < 2 or len(row[0]) == 0:
+            continue
+        key = row[0].strip()
+        value = row[1].strip()
+        if key == predef.OptionUniqueColumns:
+            meta[key] = [name.strip() for name in value.split(',') if len(name.strip()) > 0]
+        else:
+            meta[key] = value
+
+
 def parse_sheet_table(filename: str, sheet_name: str, table: list[list[str]], meta: dict):
     meta[predef.PredefParseKVMode] = False
     if sheet_name.startswith('@'):
@@ -94,49 +201,121 @@ def try_conv_float_int(text: str) -> str:
     return text
 
 
-def __read_csv_to_table(filename: str) -> list[list[str]]:
+# 逐行读取，rows的每一行是原始单元格，cell_text把单元格转换为去掉首尾空白的文本
+# 第一个非空行是字段名行，之后的行先投影和过滤再转换，类型定义行不参与过滤
+def __read_rows_to_table(rows, cell_text, max_rows: int = 0, table_filter: TableFilter = None) -> list[list[str]]:
     table = []
-    with codecs.open(filename, 'r', 'utf-8') as f:
-        for csv_row in csv.reader(f, skipinitialspace=True):
-            row = [try_conv_float_int(text) for text in csv_row]
-            row_len = sum(len(s) for s in row)
-            if row_len > 0:
-                table.append(row)
-    return table
-
-
-# 使用openpyxl读取excel文件（.xlsx格式）
-def __xlsx_read_sheet_to_table(sheet: Worksheet) -> list[list[str]]:
-    table = []
-    for i, sheet_row in enumerate(sheet.rows):
+    for cells in rows:
+        if table_filter is not None and len(table) > 0:
+            cells = table_filter.project(cells)
+            if len(table) > 1 and not table_filter.accept(cells, cell_text):
+                continue
         row = []
         row_len = 0
-        for j, cell in enumerate(sheet_row):
+        for cell in cells:
             text = ''
-            if cell.value:
-                text = str(cell.value).strip()
+            if cell is not None:
+                text = cell_text(cell)
                 if len(text) > 0:
                     row_len += len(text)
                     text = try_conv_float_int(text)
             row.append(text)
-        if row_len > 0:
-            table.append(row)  # 剔除全空白行
+        if row_len == 0:
+            continue  # 剔除全空白行
+        if table_filter is not None:
+            if len(table) == 0:
+                row = table_filter.set_header(row)
+            elif len(table) == 1 and not tableutil.is_type_row(row) and not table_filter.accept(row, str):
+                continue
+        table.append(row)
+        if len(table) == max_rows:
+            break
     return table
 
 
+def __csv_cell_text(text: str) -> str:
+    return text
+
+
+def __xlsx_cell_text(cell) -> str:
+    if cell.value:
+        return str(cell.value).strip()
+    return ''
+
+
+def __stream_cell_text(text: str) -> str:
+    return text.strip()
+
+
+def __xls_cell_text(cell) -> str:
+    return str(cell.value).strip()
+
+
+def __read_csv_to_table(filename: str, max_rows: int = 0, table_filter: TableFilter = None) -> list[list[str]]:
+    with codecs.open(filename, 'r', 'utf-8') as f:
+        rows = csv.reader(f, skipinitialspace=True)
+        return __read_rows_to_table(rows, __csv_cell_text, max_rows, table_filter)
+
+
+# 使用openpyxl读取excel文件（.xlsx格式）
+def __xlsx_read_sheet_to_table(sheet: Worksheet, max_rows: int = 0, table_filter: TableFilter = None) -> list[list[str]]:
+    return __read_rows_to_table(sheet.rows, __xlsx_cell_text, max_rows, table_filter)
+
+
+# 使用XlsxStreamReader读取的行
+def __stream_read_sheet_to_table(rows, max_rows: int = 0, table_filter: TableFilter = None) -> list[list[str]]:
+    return __read_rows_to_table(rows, __stream_cell_text, max_rows, table_filter)
+
+
 # 使用xlrd读取excel文件(.xls后缀格式）
-def __xls_read_sheet_to_table(sheet: Sheet) -> list[list[str]]:
-    table = []
-    for i in range(sheet.nrows):
-        cell_row = sheet.row(i)
-        row = []
-        row_len = 0
-        for cell in cell_row:
-            text = str(cell.value).strip()
-            if len(text) > 0:
-                row_len += len(text)
-                text = try_conv_float_int(text)
-            row.append(text)
-        if row_len > 0:
-            table.append(row)
-    return table
+def __xls_read_sheet_to_table(sheet: Sheet, max_rows: int = 0, table_filter: TableFilter = None) -> list[list[str]]:
+    rows = (sheet.row(i) for i in range(sheet.nrows))
+    return __read_rows_to_table(rows, __xls_cell_text, max_rows, table_filter)
+
+
+class TestMetaSheet(unittest.TestCase):
+
+    def test_read_meta_sheet(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'Item.xlsx')
+            workbook = openpyxl.Workbook()
+            sheet = workbook.active
+            sheet.title = 'Item'
+            sheet.append(['ID', 'Name'])
+            sheet.append(['1', 'a'])
+            meta_sheet = workbook.create_sheet('meta')
+            meta_sheet.append(['ClassComment', '道具'])
+            meta_sheet.append(['UniqueFields', 'ID, Name'])
+            workbook.save(filename)
+
+            for xlsx_reader in ['openpyxl', 'stream']:
+                meta = {}
+                table = read_workbook_table(filename, meta, xlsx_reader)
+                self.assertEqual(table, [['ID', 'Name'], ['1', 'a']])
+                self.assertEqual(meta[predef.PredefClassName], 'Item')
+                self.assertEqual(meta[predef.PredefClassComment], '道具')
+                self.assertEqual(meta[predef.OptionUniqueColumns], ['ID', 'Name'])
+
+    def test_table_filter(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'Item.xlsx')
+            workbook = openpyxl.Workbook()
+            sheet = workbook.active
+            sheet.title = 'Item'
+            sheet.append(['', 'ID', 'C_int_Icon', 'S_int_Drop', 'Env', '#Note'])
+            sheet.append(['', 'int', 'int', 'int', 'string', 'string'])
+            sheet.append(['', '1', '2', '3', 'dev', 'a'])
+            sheet.append(['', '2', '2', '3', '', 'b'])
+            sheet.append(['', '3', '2', '3', 'prod', 'c'])
+            workbook.save(filename)
+
+            keep_column = lambda name: not name.startswith('C_')
+            for xlsx_reader in ['openpyxl', 'stream']:
+                table_filter = TableFilter(keep_column, {'Env': {'prod'}})
+                table = read_workbook_table(filename, {}, xlsx_reader, 0, table_filter)
+                self.assertEqual(table, [['ID', 'S_int_Drop', 'Env', '#Note'], ['int', 'int', 'string', 'string'],
+                                         ['2', '3', '', 'b'], ['3', '3', 'prod', 'c']])
+
+
+if __name__ == '__main__':
+    unittest.main()
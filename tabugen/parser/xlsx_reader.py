@@ -0,0 +1,249 @@
+# Copyright (C) 2018-present qi7chen@github. All rights reserved.
+# Distributed under the terms and conditions of the Apache License.
+# See accompanying files LICENSE.
+
+import os
+import posixpath
+import unittest
+import zipfile
+import xml.etree.ElementTree as ET
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.cell import coordinate_to_tuple, range_boundaries
+from openpyxl.utils.datetime import from_excel, from_ISO8601, WINDOWS_EPOCH, MAC_EPOCH
+
+
+SHEET_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+DOC_REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+ROW_TAG = '{%s}row' % SHEET_MAIN_NS
+CELL_TAG = '{%s}c' % SHEET_MAIN_NS
+VALUE_TAG = '{%s}v' % SHEET_MAIN_NS
+INLINE_STRING_TAG = '{%s}is' % SHEET_MAIN_NS
+TEXT_TAG = '{%s}t' % SHEET_MAIN_NS
+RICH_RUN_TAG = '{%s}r' % SHEET_MAIN_NS
+STRING_ITEM_TAG = '{%s}si' % SHEET_MAIN_NS
+DIMENSION_TAG = '{%s}dimension' % SHEET_MAIN_NS
+DATA_TAG = '{%s}sheetData' % SHEET_MAIN_NS
+
+
+# 直接解析xlsx压缩包里的xml，按行流式读取单元格文本，不创建openpyxl的Cell对象
+# 读取结果与openpyxl的read_only + data_only模式保持一致
+class XlsxStreamReader:
+
+    def __init__(self, filename: str):
+        self.archive = zipfile.ZipFile(filename)
+        self.sheet_names = []       # 按工作簿顺序的sheet名称
+        self.sheet_paths = []       # sheet对应的xml路径
+        self.shared_strings = []
+        self.date_styles = set()    # 日期格式的style索引
+        self.timedelta_styles = set()
+        self.epoch = WINDOWS_EPOCH
+        self.load_workbook()
+
+    def close(self):
+        self.archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def read_rels(self, path: str) -> dict[str, tuple[str, str]]:
+        rels = {}
+        if path not in self.archive.namelist():
+            return rels
+        root = ET.fromstring(self.archive.read(path))
+        base = posixpath.dirname(posixpath.dirname(path))
+        for node in root.iter('{%s}Relationship' % REL_NS):
+            target = node.get('Target', '')
+            if target.startswith('/'):
+                target = target[1:]
+            else:
+                target = posixpath.normpath(posixpath.join(base, target))
+            rels[node.get('Id')] = (node.get('Type', ''), target)
+        return rels
+
+    def load_workbook(self):
+        workbook_path = 'xl/workbook.xml'
+        for rel_type, target in self.read_rels('_rels/.rels').values():
+            if rel_type.endswith('/officeDocument'):
+                workbook_path = target
+                break
+        folder, name = posixpath.split(workbook_path)
+        rels = self.read_rels(posixpath.join(folder, '_rels', name + '.rels'))
+
+        root = ET.fromstring(self.archive.read(workbook_path))
+        props = root.find('{%s}workbookPr' % SHEET_MAIN_NS)
+        if props is not None and props.get('date1904') in ('1', 'true'):
+            self.epoch = MAC_EPOCH
+        sheets = root.find('{%s}sheets' % SHEET_MAIN_NS)
+        if sheets is not None:
+            for node in sheets:
+                rel = rels.get(node.get('{%s}id' % DOC_REL_NS))
+                if rel is None:
+                    continue
+                self.sheet_names.append(node.get('name'))
+                self.sheet_paths.append(rel[1])
+
+        for rel_type, target in rels.values():
+            if rel_type.endswith('/sharedStrings'):
+                self.load_shared_strings(target)
+            elif rel_type.endswith('/styles'):
+                self.load_styles(target)
+
+    def load_shared_strings(self, path: str):
+        with self.archive.open(path) as f:
+            for _, node in ET.iterparse(f):
+                if node.tag == STRING_ITEM_TAG:
+                    text = inline_text(node).replace('x005F_', '')
+                    self.shared_strings.append(text)
+                    node.clear()
+
+    # 记录日期时间格式的单元格样式，这些数值需要转换为日期
+    def load_styles(self, path: str):
+        root = ET.fromstring(self.archive.read(path))
+        custom_formats = {}
+        num_fmts = root.find('{%s}numFmts' % SHEET_MAIN_NS)
+        if num_fmts is not None:
+            for node in num_fmts:
+                custom_formats[int(node.get('numFmtId'))] = node.get('formatCode')
+        cell_xfs = root.find('{%s}cellXfs' % SHEET_MAIN_NS)
+        if cell_xfs is None:
+            return
+        for idx, node in enumerate(cell_xfs):
+            fmt_id = int(node.get('numFmtId', 0))
+            fmt = custom_formats.get(fmt_id, BUILTIN_FORMATS.get(fmt_id))
+            if is_date_format(fmt):
+                self.date_styles.add(idx)
+            if is_timedelta_format(fmt):
+                self.timedelta_styles.add(idx)
+
+    # sheet声明的范围(min_col, min_row, max_col, max_row)
+    def read_dimension(self, path: str):
+        with self.archive.open(path) as f:
+            for _, node in ET.iterparse(f):
+                if node.tag == DIMENSION_TAG:
+                    return range_boundaries(node.get('ref'))
+                elif node.tag == DATA_TAG:
+                    break
+        return None
+
+    # 逐行读取sheet，每行是单元格文本的列表，空单元格为空字符串
+    def iter_rows(self, index: int = 0):
+        path = self.sheet_paths[index]
+        max_col = max_row = None
+        dimension = self.read_dimension(path)
+        if dimension is not None:
+            max_col, max_row = dimension[2], dimension[3]
+
+        row_counter = 0
+        sheet_data = None
+        with self.archive.open(path) as f:
+            for event, node in ET.iterparse(f, events=('start', 'end')):
+                if event == 'start':
+                    if node.tag == DATA_TAG:
+                        sheet_data = node
+                    continue
+                if node.tag != ROW_TAG:
+                    continue
+                r = node.get('r')
+                row_counter = int(float(r)) if r else row_counter + 1
+                if max_row is not None and row_counter > max_row:
+                    break
+                row = self.parse_row(node, max_col)
+                sheet_data.clear()  # 释放已经读取的行
+                yield row
+
+    def parse_row(self, node, max_col) -> list[str]:
+        cells = []
+        col_counter = 0
+        for cell in node:
+            if cell.tag != CELL_TAG:
+                continue
+            coordinate = cell.get('r')
+            if coordinate:
+                col_counter = coordinate_to_tuple(coordinate)[1]
+            else:
+                col_counter += 1
+            cells.append((col_counter, self.parse_cell(cell)))
+
+        if not cells and not max_col:
+            return []
+        width = max_col or cells[-1][0]
+        row = [''] * width
+        for col, text in cells:
+            if col <= width:
+                row[col - 1] = text
+        return row
+
+    # 单元格的文本，与openpyxl里的`str(cell.value)`一致，假值为空字符串
+    def parse_cell(self, cell) -> str:
+        data_type = cell.get('t', 'n')
+        if data_type == 'inlineStr':
+            child = cell.find(INLINE_STRING_TAG)
+            if child is None:
+                return ''
+            return inline_text(child)
+
+        value = cell.findtext(VALUE_TAG)
+        if not value:
+            return ''
+        if data_type == 'n':
+            style_id = int(cell.get('s', 0))
+            number = cast_number(value)
+            if style_id in self.date_styles:
+                try:
+                    number = from_excel(number, self.epoch, timedelta=style_id in self.timedelta_styles)
+                except (OverflowError, ValueError):
+                    return '#VALUE!'
+            return str(number) if number else ''
+        elif data_type == 's':
+            return self.shared_strings[int(value)]
+        elif data_type == 'b':
+            return 'True' if int(value) else ''
+        elif data_type == 'd':
+            return str(from_ISO8601(value))
+        return value
+
+
+def cast_number(text: str):
+    if '.' in text or 'E' in text or 'e' in text:
+        return float(text)
+    return int(text)
+
+
+# <si>或者<is>节点的纯文本，忽略拼音标注
+def inline_text(node) -> str:
+    snippets = []
+    plain = node.find(TEXT_TAG)
+    if plain is not None and plain.text:
+        snippets.append(plain.text)
+    for run in node.findall(RICH_RUN_TAG):
+        text = run.findtext(TEXT_TAG)
+        if text:
+            snippets.append(text)
+    return ''.join(snippets)
+
+
+class TestXlsxStreamReader(unittest.TestCase):
+
+    def test_same_as_openpyxl(self):
+        import tabugen.parser.toolkit as toolkit
+        datasheet_dir = os.path.join(os.path.dirname(__file__), '../../examples/datasheet')
+        if not os.path.isdir(datasheet_dir):
+            self.skipTest('examples not found')
+        for name in sorted(os.listdir(datasheet_dir)):
+            if not name.endswith('.xlsx'):
+                continue
+            filename = os.path.join(datasheet_dir, name)
+            meta1, meta2 = {}, {}
+            table1 = toolkit.read_workbook_table(filename, meta1, 'openpyxl')
+            table2 = toolkit.read_workbook_table(filename, meta2, 'stream')
+            self.assertEqual(table1, table2, name)
+            self.assertEqual(meta1, meta2, name)
+
+
+if __name__ == '__main__':
+    unittest.main()
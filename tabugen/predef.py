@@ -22,4 +22,7 @@ PredefInnerTypeClass = "InnerTypeClass"
 PredefInnerFieldName = "InnerFieldName"
 
 OptionUniqueColumns = "UniqueFields"    # 值唯一的列名称
+OptionLayout = "Layout"                 # 生成代码的数据布局
+
+LayoutColumnar = "columnar"             # 按列存储，每个字段一个连续数组
 
@@ -4,6 +4,7 @@
 
 from tabugen.writer.csv import CsvDataWriter
 from tabugen.writer.json import JsonDataWriter
+from tabugen.writer.binary import BinaryDataWriter
 from tabugen.generator.cpp.gen_struct import CppStructGenerator
 from tabugen.generator.csharp.gen_struct import CSharpStructGenerator
 from tabugen.generator.go.gen_struct import GoStructGenerator
@@ -25,6 +26,7 @@ code_generator_registry = {
 data_writer_registry = {
     CsvDataWriter.name(): CsvDataWriter(),
     JsonDataWriter.name(): JsonDataWriter(),
+    BinaryDataWriter.name(): BinaryDataWriter(),
 }
 
 
@@ -4,6 +4,7 @@
 
 import json
 import copy
+import unittest
 import inflect
 from dataclasses import dataclass, field
 import tabugen.predef as predef
@@ -26,6 +27,7 @@ class StructField:
     column: int = 0             # 所处列
     comment: str = ''           # 注释
     name_defval: str = ''
+    kind: str = ''              # 项目类型，如C_INT_Level的C
 
 
 @dataclass
@@ -37,6 +39,11 @@ class ArrayField:
     type_name: str = ''
     lang_type_name: str = ''
     element_fields: list[StructField] = field(default_factory=list)
+    element_rows: list[list[StructField]] = field(default_factory=list)  # 二维数组每一行的元素
+
+    # 是否二维数组，如reward[0][1]
+    def is_nested(self) -> bool:
+        return len(self.element_rows) > 0
 
 
 
@@ -119,61 +126,92 @@ class Struct:
                 return True
         return False
 
-    # 解析数组类型字段
+    # 解析数组类型字段，name[0], name[1]...合并为一个数组，name[0][0], name[0][1]...合并为二维数组
+    # 一次遍历完成分组，列可以不连续也可以乱序，元素按下标排序
     def parse_array_fields(self):
-        start = 0
-        while start + 1 < len(self.fields):
-            end = self.parse_one_array(start)
-            if end - start > 0:
-                start = end
-            else:
-                break
-
-        names = set()
-        for array in self.array_fields:
-            for field in array.element_fields:
-                names.add(field.name)
-        self.remove_fields(names)
-
-    # 解析数组定义
-    def parse_one_array(self, start: int) -> int:
+        groups = {}     # 数组名 -> {(下标,...): 字段}
         fields = []
-        elem_prefix = ''
-        end = start
-        for i in range(start, len(self.fields)):
-            field = self.fields[i]
-            if field.name.endswith('[0]'):
-                elem_prefix = field.name[:-3]
-                if not self.has_array_field(elem_prefix):
-                    fields.append(copy.deepcopy(field))
-                    end = i
-                    break
-
-        if end == start:
-            return end
-
-        start = end + 1
-        max_round = len(self.fields) - start
-        for n in range(1, max_round):
-            target_name = elem_prefix + f'[{n}]'
-            for i in range(start, len(self.fields)):
-                field = self.fields[i]
-                if field.name == target_name:
-                    fields.append(copy.deepcopy(field))
-                    start = i
-                    break
+        for field in self.fields:
+            prefix, index = helper.parse_array_name_index(field.name)
+            if prefix == '' or index < 0 or self.has_array_field(prefix):
+                fields.append(field)
+                continue
+            key = (index,)
+            outer, outer_index = helper.parse_array_name_index(prefix)
+            if outer != '' and outer_index >= 0:
+                prefix = outer
+                key = (outer_index, index)
+            group = groups.setdefault(prefix, {})
+            if len(group) > 0:
+                assert len(next(iter(group))) == len(key), f'{self.name} array {prefix} has mixed dimensions'
+            group[key] = field
+        self.fields = fields
+        for prefix, group in groups.items():
+            self.array_fields.append(self.make_array_field(prefix, group))
 
+    # 根据分组的元素生成数组定义
+    def make_array_field(self, prefix: str, group: dict) -> ArrayField:
+        keys = sorted(group)
         array = ArrayField()
-        array.name = elem_prefix
-        array.field_name = plural_engine.plural(elem_prefix)  # 单数转复数
-        array.camel_case_name = helper.camel_case(elem_prefix)
-        array.type_name = fields[0].type_name + '[]'
-        array.comment = fields[0].comment
-        for field in fields:
-            array.element_fields.append(field)
-        self.array_fields.append(array)
+        array.name = prefix
+        array.field_name = plural_engine.plural(prefix)  # 单数转复数
+        array.camel_case_name = helper.camel_case(prefix)
+        array.element_fields = [group[key] for key in keys]
+        elem = array.element_fields[0]
+        array.type_name = elem.type_name + '[]'
+        array.comment = elem.comment
+        if len(keys[0]) == 1:
+            indexes = [key[0] for key in keys]
+            if indexes[-1] + 1 != len(indexes):
+                print('%s array %s has missing elements, indexes: %s' % (self.name, prefix, indexes))
+            return array
+
+        array.type_name += '[]'
+        rows = {}
+        for key in keys:
+            rows.setdefault(key[0], []).append(group[key])
+        array.element_rows = [rows[i] for i in sorted(rows)]
+        sizes = set(len(row) for row in array.element_rows)
+        if len(sizes) > 1 or len(keys) != (keys[-1][0] + 1) * (max(key[1] for key in keys) + 1):
+            print('%s array %s is not a fixed-size array, indexes: %s' % (self.name, prefix, keys))
+        return array
 
-        return end
+    # 按项目类型筛选字段，返回新的结构，数据行和原结构共享
+    def project_kind_view(self, project_kind: str, legacy: bool) -> 'Struct':
+        def is_match(field: StructField) -> bool:
+            return tableutil.match_project_kind(field.kind, project_kind, legacy)
+
+        raw_fields = [copy.copy(field) for field in self.raw_fields if is_match(field)]
+        array_fields = []
+        for array in self.array_fields:
+            copies = {id(field): copy.copy(field) for field in array.element_fields if is_match(field)}
+            if len(copies) > 0:
+                array = copy.copy(array)
+                array.element_fields = [copies[id(field)] for field in array.element_fields if id(field) in copies]
+                rows = [[copies[id(field)] for field in row if id(field) in copies] for row in array.element_rows]
+                array.element_rows = [row for row in rows if len(row) > 0]
+                array_fields.append(array)
+        return Struct(
+            filepath=self.filepath,
+            name=self.name,
+            camel_case_name=self.camel_case_name,
+            comment=self.comment,
+            parse_time=self.parse_time,
+            options=dict(self.options),
+            data_rows=self.data_rows,
+            field_names=[field.name for field in raw_fields],
+            field_columns=[field.column for field in raw_fields],
+            raw_fields=raw_fields,
+            fields=[copy.copy(field) for field in self.fields if is_match(field)],
+            array_fields=array_fields,
+        )
+
+    # 释放数据行，只保留生成代码需要的结构定义，KV模式的字段定义来自数据行，需要保留
+    def release_data(self):
+        if not self.options.get(predef.PredefParseKVMode, False):
+            self.data_rows = []
+        if hasattr(self, 'typed_table'):
+            del self.typed_table
 
     def get_kv_key_col(self):
         return self.get_column_index(predef.PredefKVKeyName)
@@ -210,3 +248,26 @@ class Struct:
             if n > max_type_len:
                 max_type_len = n
         return max_name_len, max_type_len
+
+
+class TestStruct(unittest.TestCase):
+
+    def test_parse_array_fields(self):
+        struct = Struct(name='Reward')
+        names = ['ID', 'Item[1]', 'Item[0]', 'Cnt[0]', 'Reward[1][0]', 'Name', 'Reward[0][0]', 'Reward[0][1]',
+                 'Reward[1][1]', 'Cnt[2]', 'Item[2]']
+        for col, name in enumerate(names):
+            struct.fields.append(StructField(name=name, type_name='int32', column=col))
+        struct.parse_array_fields()
+        self.assertEqual([field.name for field in struct.fields], ['ID', 'Name'])
+        arrays = {array.name: array for array in struct.array_fields}
+        self.assertEqual([field.column for field in arrays['Item'].element_fields], [2, 1, 10])
+        self.assertEqual([field.column for field in arrays['Cnt'].element_fields], [3, 9])
+        self.assertFalse(arrays['Cnt'].is_nested())
+        reward = arrays['Reward']
+        self.assertEqual(reward.type_name, 'int32[][]')
+        self.assertEqual([[field.column for field in row] for row in reward.element_rows], [[6, 7], [4, 8]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,12 +5,14 @@
 import codecs
 import datetime
 import filecmp
+import hashlib
 import os
 import re
 import random
 import shutil
 import string
 import tempfile
+import threading
 import typing
 import unittest
 
@@ -20,6 +22,17 @@ Delim1 = ','
 Delim2 = ':'
 
 
+# 多个格式并行写入时共用的输出锁
+print_lock = threading.Lock()
+
+
+# 整行输出，并行写入时各个线程的输出不会交错
+def log(*args):
+    line = ' '.join(str(arg) for arg in args)
+    with print_lock:
+        print(line, flush=True)
+
+
 def current_time() -> str:
     return datetime.datetime.now().isoformat()
 
@@ -170,6 +183,70 @@ def save_content_if_not_same(filename: str, content: str, enc: str) -> bool:
         return True
 
 
+# 文件内容的哈希值
+def file_digest(filename: str) -> str:
+    h = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        while True:
+            chunk = f.read(1 << 20)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# 写入时同步计算内容哈希
+class HashingWriter:
+    def __init__(self, f, enc: str):
+        self.file = f
+        self.encoder = codecs.getincrementalencoder(enc)()
+        self.hash = hashlib.sha1()
+
+    def write(self, text: str):
+        data = self.encoder.encode(text)
+        self.file.write(data)
+        self.hash.update(data)
+
+    def finish(self) -> str:
+        data = self.encoder.encode('', final=True)
+        self.file.write(data)
+        self.hash.update(data)
+        return self.hash.hexdigest()
+
+
+# 流式写入内容，通过哈希比较内容不相同时再替换文件
+# write_content(stream)通过stream.write(text)写入内容
+def save_stream_if_not_same(filename: str, write_content: typing.Callable, enc: str) -> bool:
+    tmp_filename = 'tabugen_%s' % random_word(10)
+    tmp_filename = os.path.join(tempfile.gettempdir(), tmp_filename)
+    with open(tmp_filename, 'wb') as f:
+        writer = HashingWriter(f, enc)
+        write_content(writer)
+        digest = writer.finish()
+
+    if os.path.isfile(filename) and os.path.getsize(filename) == os.path.getsize(tmp_filename) \
+            and file_digest(filename) == digest:
+        os.remove(tmp_filename)
+        return False
+    else:
+        shutil.move(tmp_filename, filename)
+        return True
+
+
+# 二进制内容不相同时再写入文件
+def save_bytes_if_not_same(filename: str, content: bytes) -> bool:
+    if os.path.isfile(filename) and os.path.getsize(filename) == len(content):
+        with open(filename, 'rb') as f:
+            if f.read() == content:
+                return False
+    tmp_filename = 'tabugen_%s' % random_word(10)
+    tmp_filename = os.path.join(tempfile.gettempdir(), tmp_filename)
+    with open(tmp_filename, 'wb') as f:
+        f.write(content)
+    shutil.move(tmp_filename, filename)
+    return True
+
+
 # 对齐数据行
 def pad_data_rows(fields: list[object], table: list[list[str]]):
     # pad empty row
@@ -246,6 +323,21 @@ class TestUtils(unittest.TestCase):
             self.assertEqual(out1, tt[1])
             self.assertEqual(out2, tt[2])
 
+    def test_save_stream_if_not_same(self):
+        filename = os.path.join(tempfile.gettempdir(), 'tabugen_test_%s.txt' % random_word(8))
+
+        def write_content(stream):
+            for text in ['a', '测试', 'b']:
+                stream.write(text)
+        try:
+            self.assertTrue(save_stream_if_not_same(filename, write_content, 'utf-8'))
+            self.assertFalse(save_stream_if_not_same(filename, write_content, 'utf-8'))
+            with open(filename, 'r', encoding='utf-8') as f:
+                self.assertEqual(f.read(), 'a测试b')
+            self.assertTrue(save_stream_if_not_same(filename, lambda stream: stream.write('c'), 'utf-8'))
+        finally:
+            os.remove(filename)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -2,13 +2,16 @@
 # Distributed under the terms and conditions of the Apache License.
 # See accompanying files LICENSE.
 
+from __future__ import annotations
+import re
 import sys
 import unittest
 from argparse import Namespace
+from dataclasses import dataclass
 import tabugen.predef as predef
 import tabugen.typedef as types
 import tabugen.util.helper as helper
-from tabugen.structs import Struct, StructField
+import tabugen.structs as structs
 
 max_int64 = 9223372036854775807
 min_int64 = -9223372036854775808
@@ -33,6 +36,29 @@ def split_field_name(name: str) -> tuple[str, str, str]:
         return kind, type_name.lower(), name[first + 1:]
 
 
+# 字段的项目类型是否匹配，未指定项目类型时都匹配
+def match_project_kind(kind_name: str, project_kind: str, legacy: bool) -> bool:
+    if project_kind == '' or kind_name == '':
+        return True
+    if kind_name == project_kind:
+        return True
+    if legacy and kind_name == 'A':  # A表示所有
+        return True
+    return False
+
+
+# 行过滤条件，Env=dev,all => {Env: {dev, all}}，多个条件需要同时满足
+def parse_row_filters(items: list[str]) -> dict[str, set[str]]:
+    filters = {}
+    for item in items or []:
+        name, sep, values = item.partition('=')
+        name = name.strip()
+        if sep == '' or name == '':
+            raise ValueError('invalid row filter: %s' % item)
+        filters[name] = set(v.strip() for v in values.split(',') if len(v.strip()) > 0)
+    return filters
+
+
 def row_find_field_name(row: list[str], name: str) -> int:
     for i, text in enumerate(row):
         kind, typename, field_name = split_field_name(text)
@@ -102,40 +128,260 @@ def parse_map_elem_type(text: str) -> tuple[str, str]:
     return key_type, value_type
 
 
-# 根据内容解析字段类型
-def infer_field_type(table: list[list[str]], start_row: int, col: int):
-    parsed = ''
-    for n in range(start_row, len(table)):
-        type_name = parse_cell_type(table[n][col])
-        if parsed == '':
-            parsed = type_name
-        if parsed != type_name:
+# 推导类型时的采样方式
+# all: 全部行，head:N: 前N行，stratified:N: 在所有行中均匀抽取N行(包含首尾)
+@dataclass
+class SamplePolicy:
+    mode: str = 'all'
+    count: int = 0
+
+    @staticmethod
+    def parse(text: str) -> SamplePolicy:
+        text = text.strip()
+        if text == '' or text == 'all':
+            return SamplePolicy()
+        mode, _, count = text.partition(':')
+        if mode not in ('head', 'stratified') or not count.isdigit() or int(count) <= 0:
+            raise ValueError('invalid sample policy %s' % text)
+        return SamplePolicy(mode, int(count))
+
+    # 需要检查的行号
+    def rows(self, start: int, end: int):
+        total = end - start
+        if self.mode == 'all' or total <= self.count:
+            return range(start, end)
+        if self.mode == 'head':
+            return range(start, start + self.count)
+        if self.count == 1:
+            return [start]
+        step = (total - 1) / (self.count - 1)
+        return sorted(set(start + int(round(i * step)) for i in range(self.count)))
+
+
+# 数组和字典类型默认只检查前20行
+default_composite_policy = SamplePolicy('head', 20)
+
+
+# 一列的类型推导结果
+@dataclass
+class ColumnTypeInfo:
+    type_name: str = ''
+    sampled: int = 0        # 检查的行数
+    int_min: int = 0        # 整数类型的取值范围
+    int_max: int = 0
+    break_row: int = -1     # 导致类型退化的行，-1表示没有
+    break_text: str = ''
+
+
+int_cell_pattern = re.compile(r'[+-]?[0-9]+\Z')
+float_cell_pattern = re.compile(r'[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?\Z')
+# 不可能出现在数字里的ASCII字符(int/float还接受下划线、空白、inf和nan)
+non_numeric_pattern = re.compile(r'[^0-9+\-._eEinftyaINFTYA \t\n\r\f\v]')
+
+
+# 单元格的类型，常见格式用预编译的正则判断，和parse_cell_type结果一致
+def classify_cell(text: str) -> str:
+    if int_cell_pattern.match(text):
+        return 'int'
+    if float_cell_pattern.match(text):
+        return 'float'
+    if text.isascii():
+        if len(text) == 0 or non_numeric_pattern.search(text):
             return 'string'
-    return parsed
-
-
-def infer_field_array_type(table: list[list[str]], start_row: int, col: int):
+    elif not any(ch.isdecimal() for ch in text):
+        return 'string'
+    return parse_cell_type(text)
+
+
+def table_cell(table: list[list[str]], row: int, col: int) -> str:
+    cells = table[row]
+    return cells[col] if col < len(cells) else ''
+
+
+# 一次遍历推导一列的类型，相同内容的单元格只判断一次，类型不一致时为string
+def infer_column_type(table: list[list[str]], start_row: int, col: int, policy: SamplePolicy = None) -> ColumnTypeInfo:
+    if policy is None:
+        policy = SamplePolicy()
+    info = ColumnTypeInfo()
+    kinds = {}
+    int_min, int_max = None, None
+    for n in policy.rows(start_row, len(table)):
+        text = table_cell(table, n, col)
+        kind = kinds.get(text)
+        if kind is None:
+            kind = classify_cell(text)
+            kinds[text] = kind
+            if kind == 'int':
+                value = int(text)
+                if int_min is None:
+                    int_min = int_max = value
+                else:
+                    int_min = min(int_min, value)
+                    int_max = max(int_max, value)
+        info.sampled += 1
+        if info.type_name == '':
+            info.type_name = kind
+            if kind == 'string':  # 已经是字符串类型，不会再变化
+                break
+        elif info.type_name != kind:
+            info.type_name = 'string'
+            info.break_row = n
+            info.break_text = text
+            return info
+    if info.type_name == 'int':
+        info.int_min, info.int_max = int_min, int_max
+    return info
+
+
+# 推导数组类型
+def infer_array_type(table: list[list[str]], start_row: int, col: int, policy: SamplePolicy = None) -> ColumnTypeInfo:
+    if policy is None:
+        policy = default_composite_policy
+    info = ColumnTypeInfo()
     elem_type = ''
-    for n in range(start_row, min(len(table), 20)):
-        type_name = parse_array_elem_type(table[n][col])
+    kinds = {}
+    for n in policy.rows(start_row, len(table)):
+        text = table_cell(table, n, col)
+        type_name = kinds.get(text)
+        if type_name is None:
+            type_name = parse_array_elem_type(text)
+            kinds[text] = type_name
+        info.sampled += 1
         if elem_type == '':
             elem_type = type_name
         if elem_type != type_name:
-            return 'string[]'
-    return elem_type + '[]'
+            info.type_name = 'string[]'
+            info.break_row = n
+            info.break_text = text
+            return info
+    info.type_name = elem_type + '[]'
+    return info
+
+
+# 推导字典类型
+def infer_map_type(table: list[list[str]], start_row: int, col: int, policy: SamplePolicy = None) -> ColumnTypeInfo:
+    if policy is None:
+        policy = default_composite_policy
+    info = ColumnTypeInfo()
+    elem_types = None
+    kinds = {}
+    for n in policy.rows(start_row, len(table)):
+        text = table_cell(table, n, col)
+        types_pair = kinds.get(text)
+        if types_pair is None:
+            types_pair = parse_map_elem_type(text)
+            kinds[text] = types_pair
+        info.sampled += 1
+        if elem_types is None:
+            elem_types = types_pair
+        if elem_types != types_pair:
+            info.type_name = '<string,string>'
+            info.break_row = n
+            info.break_text = text
+            return info
+    if elem_types is None:
+        elem_types = ('', '')
+    info.type_name = '<%s,%s>' % elem_types
+    return info
+
+
+# 整数类型的取值范围，按宽度从小到大排列，宽度相同时有符号类型在前
+int_type_ranges = {
+    'int8': (-2 ** 7, 2 ** 7 - 1),
+    'uint8': (0, 2 ** 8 - 1),
+    'int16': (-2 ** 15, 2 ** 15 - 1),
+    'uint16': (0, 2 ** 16 - 1),
+    'int32': (-2 ** 31, 2 ** 31 - 1),
+    'uint32': (0, 2 ** 32 - 1),
+    'int64': (-2 ** 63, 2 ** 63 - 1),
+    'uint64': (0, 2 ** 64 - 1),
+}
+
+
+def int_type_range(typename: str) -> tuple[int, int] | None:
+    typename = typename.strip()
+    return int_type_ranges.get(types.alias.get(typename, typename))
+
+
+# 能容纳[int_min, int_max]的最小整数类型，声明的类型作为下限，结果的取值范围包含下限类型的取值范围
+# 超出64位整数范围时返回空字符串
+def narrow_int_type(int_min: int, int_max: int, lower_bound: str = '') -> str:
+    bound = int_type_range(lower_bound)
+    if bound is not None:
+        int_min, int_max = min(int_min, bound[0]), max(int_max, bound[1])
+    for name, (low, high) in int_type_ranges.items():
+        if low <= int_min and int_max <= high:
+            return name
+    return ''
+
+
+# 和导出数据时的转换规则一致，空白为0，小数四舍五入，不是数字时返回None
+def parse_int_cell(text: str) -> int | None:
+    text = text.strip()
+    if len(text) == 0:
+        return 0
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return int(round(float(text)))
+    except (ValueError, OverflowError):
+        return None
+
+
+# 一列中所有整数的取值范围(包含0)，delim不为空时每个单元格是数组，有不是整数的值时返回None
+def scan_int_range(table: list[list[str]], start_row: int, col: int, delim: str = '') -> tuple[int, int] | None:
+    int_min, int_max = 0, 0
+    seen = set()
+    for n in range(start_row, len(table)):
+        text = table_cell(table, n, col)
+        if text in seen:
+            continue
+        seen.add(text)
+        items = [text]
+        if delim:
+            if len(text.strip()) == 0:
+                continue
+            items = text.split(delim)
+        for item in items:
+            value = parse_int_cell(item)
+            if value is None:
+                return None
+            if value < int_min:
+                int_min = value
+            elif value > int_max:
+                int_max = value
+    return int_min, int_max
+
+
+# 数组的元素使用同一个整数类型，取能容纳所有元素类型的最小类型
+def unify_array_int_types(struct: structs.Struct):
+    for array in struct.array_fields:
+        bounds = [int_type_range(field.origin_type_name) for field in array.element_fields]
+        if len(bounds) == 0 or None in bounds:
+            continue
+        typename = narrow_int_type(min(b[0] for b in bounds), max(b[1] for b in bounds))
+        for field in array.element_fields:
+            field.origin_type_name = typename
+            field.type = types.get_type_by_name(typename)
+            field.type_name = types.get_name_of_type(field.type)
+        array.type_name = typename + '[]'
+        if array.is_nested():
+            array.type_name += '[]'
+
+
+# 根据内容解析字段类型
+def infer_field_type(table: list[list[str]], start_row: int, col: int):
+    return infer_column_type(table, start_row, col).type_name
+
+
+def infer_field_array_type(table: list[list[str]], start_row: int, col: int):
+    return infer_array_type(table, start_row, col).type_name
 
 
 def infer_field_map_type(rows: list[list[str]], start_row: int, col: int):
-    elem_ktype = ''
-    elem_vtype = ''
-    for n in range(start_row, min(len(rows), 20)):
-        t1, t2 = parse_map_elem_type(rows[n][col])
-        if elem_ktype == '' and elem_vtype == '':
-            elem_ktype = t1
-            elem_vtype = t2
-        if t1 != elem_ktype or t2 != elem_vtype:
-            return '<string,string>'
-    return '<%s,%s>' % (elem_ktype, elem_vtype)
+    return infer_map_type(rows, start_row, col).type_name
 
 
 # 删除table的某一列
@@ -258,8 +504,8 @@ def is_all_row_field_value_unique(rows: list[list[str]], col: int) -> (bool, int
 
 
 # 检查唯一主键
-def validate_unique_column(struct: Struct, rows: list[list[str]]) -> list[list[str]]:
-    if predef.PredefParseKVMode in struct.options:
+def validate_unique_column(struct: structs.Struct, rows: list[list[str]]) -> list[list[str]]:
+    if struct.options.get(predef.PredefParseKVMode, False):
         return rows
 
     if predef.OptionUniqueColumns not in struct.options:
@@ -269,59 +515,41 @@ def validate_unique_column(struct: Struct, rows: list[list[str]]) -> list[list[s
     if len(names) == 0:
         return rows
 
-    for col, field in enumerate(struct.fields):
+    for field in struct.fields:
         if field.name in names:
-            (is_unique, row_line, exist_line) = is_all_row_field_value_unique(rows, col)
+            (is_unique, row_line, exist_line) = is_all_row_field_value_unique(rows, field.column)
             if not is_unique:
                 print('duplicate field %s value found, row %d and row %d' % (field.name, exist_line, row_line))
                 sys.exit(1)
     return rows
 
 
-# 处理一下数据
-# 1，配置的数值类型如果为空，默认填充0
-# 2，如果配置的类型是整数，但实际有浮点，需要转换成整数
-def convert_table_data(struct: Struct, rows: list[list[str]]) -> list[list[str]]:
-    for col, field in enumerate(struct.raw_fields):
-        typename = field.type_name
-        if types.is_integer_type(typename):
-            for i, row in enumerate(rows):
-                val = row[col]
-                if len(val) == 0:
-                    row[col] = '0'  # 填充0
-                elif val.find('.') >= 0:
-                    num = int(round(float(val)))  # 这里是四舍五入
-                    print('%s field %s round integer %s -> %s' % (struct.name, field.name, val,  num))
-                    rows[i][col] = str(num)
-        elif types.is_floating_type(typename):
-            for i, row in enumerate(rows):
-                if len(row[col]) == 0:
-                    rows[i][col] = '0'  # 填充0
-        elif types.is_bool_type(typename):
-            for i, row in enumerate(rows):
-                b = helper.str2bool(row[col])
-                rows[i][col] = '1' if b else '0'
-    return rows
+# 声明为值唯一的字段，用于生成查找索引
+def get_unique_fields(struct: structs.Struct) -> list[structs.StructField]:
+    if struct.options.get(predef.PredefParseKVMode, False):
+        return []
+    fields = []
+    for name in struct.options.get(predef.OptionUniqueColumns, []):
+        field = struct.get_field_by_name(name)
+        if field is None:
+            print('%s unique field %s not found' % (struct.name, name))
+        elif types.is_composite_type(field.origin_type_name):
+            print('%s unique field %s cannot be %s' % (struct.name, name, field.origin_type_name))
+        else:
+            fields.append(field)
+    return fields
 
 
-def convert_data(typename: str, val: str) -> str:
-    if types.is_integer_type(typename):
-        if len(val) == 0:
-            val = '0'
-        elif val.find('.') >= 0:
-            num = int(round(float(val)))  # 这里是四舍五入
-            print('round integer', val, '-->', num)
-            val = str(num)
-    elif types.is_floating_type(typename):
-        if len(val) == 0:
-            val = '0.0'
-    elif types.is_bool_type(typename):
-        b = helper.str2bool(val)
-        if b:
-            val = '1'
-        else:
-            val = '0'
-    return val
+# meta sheet里指定`Layout`为`columnar`的表格，额外生成按列存储的容器，KV模式不适用
+def is_columnar_layout(struct: structs.Struct) -> bool:
+    if struct.options.get(predef.PredefParseKVMode, False):
+        return False
+    layout = struct.options.get(predef.OptionLayout, '').strip().lower()
+    if layout == predef.LayoutColumnar:
+        return True
+    if len(layout) > 0:
+        print('%s unknown layout %s' % (struct.name, layout))
+    return False
 
 
 def remove_field_suffix(name: str) -> str:
@@ -400,7 +628,7 @@ def is_kv_table(table: list[list[str]], legacy=True) -> bool:
     return True
 
 
-def parse_kv_fields(struct: Struct, legacy, mapper1, mapper2) -> list[StructField]:
+def parse_kv_fields(struct: structs.Struct, legacy, mapper1, mapper2) -> list[structs.StructField]:
     key_idx = struct.get_column_index(predef.PredefKVKeyName)
     assert key_idx >= 0
     type_idx = struct.get_column_index(predef.PredefKVTypeName)
@@ -415,7 +643,7 @@ def parse_kv_fields(struct: Struct, legacy, mapper1, mapper2) -> list[StructFiel
         if varname == '' or typename == '':
             continue
 
-        field = StructField()
+        field = structs.StructField()
         field.origin_type_name = typename
         field.origin_name = varname
         if legacy and typename.isdigit():
@@ -439,6 +667,54 @@ def parse_kv_fields(struct: Struct, legacy, mapper1, mapper2) -> list[StructFiel
     return fields
 
 
+class TestTypeInfer(unittest.TestCase):
+
+    def test_classify_cell(self):
+        samples = ['', '0', '-12', '+3', '007', '1.5', '.5', '5.', '-1e5', '1E+3', 'abc', 'Food', '1_000', ' 12',
+                   'inf', '-Infinity', 'nan', 'e5', '1.2.3', '0x10', '测试', '关卡1', '١٢', 'True']
+        for text in samples:
+            self.assertEqual(classify_cell(text), parse_cell_type(text), text)
+
+    def test_infer_column_type(self):
+        table = [['ID', 'Rate', 'Name'], ['1', '0.5', 'a'], ['-3', '1.5', 'b'], ['20', 'x', 'c'], ['5', '2', 'd']]
+        info = infer_column_type(table, 1, 0)
+        self.assertEqual((info.type_name, info.int_min, info.int_max, info.sampled), ('int', -3, 20, 4))
+        info = infer_column_type(table, 1, 1)
+        self.assertEqual((info.type_name, info.break_row, info.break_text), ('string', 3, 'x'))
+        self.assertEqual(infer_column_type(table, 1, 1, SamplePolicy('head', 2)).type_name, 'float')
+        self.assertEqual(infer_column_type(table, 1, 2).type_name, 'string')
+
+    def test_narrow_int_type(self):
+        self.assertEqual(narrow_int_type(-3, 20), 'int8')
+        self.assertEqual(narrow_int_type(0, 200), 'uint8')
+        self.assertEqual(narrow_int_type(-1, 200), 'int16')
+        self.assertEqual(narrow_int_type(0, 2 ** 40), 'int64')
+        self.assertEqual(narrow_int_type(0, 2 ** 64), '')
+        self.assertEqual(narrow_int_type(0, 10, 'int16'), 'int16')
+        self.assertEqual(narrow_int_type(-1, 10, 'uint8'), 'int16')
+        self.assertEqual(narrow_int_type(0, 10, 'int'), 'int32')
+        table = [['ID', 'Items'], ['1', helper.Delim1.join(['3', '-400'])], ['2.6', ''], ['300', '1']]
+        self.assertEqual(scan_int_range(table, 1, 0), (0, 300))
+        self.assertEqual(scan_int_range(table, 1, 1, helper.Delim1), (-400, 3))
+        self.assertIsNone(scan_int_range([['ID'], ['x']], 1, 0))
+
+    def test_is_columnar_layout(self):
+        struct = structs.Struct(name='Monster', options={predef.PredefParseKVMode: False})
+        self.assertFalse(is_columnar_layout(struct))
+        struct.options[predef.OptionLayout] = ' Columnar'
+        self.assertTrue(is_columnar_layout(struct))
+        struct.options[predef.PredefParseKVMode] = True
+        self.assertFalse(is_columnar_layout(struct))
+
+    def test_sample_policy(self):
+        self.assertEqual(list(SamplePolicy.parse('all').rows(1, 5)), [1, 2, 3, 4])
+        self.assertEqual(list(SamplePolicy.parse('head:2').rows(1, 5)), [1, 2])
+        self.assertEqual(list(SamplePolicy.parse('stratified:3').rows(1, 101)), [1, 51, 100])
+        self.assertEqual(list(default_composite_policy.rows(1, 100)), list(range(1, 21)))
+        with self.assertRaises(ValueError):
+            SamplePolicy.parse('head:x')
+
+
 class TestTypes(unittest.TestCase):
     def test_is_type_row(self):
         self.assertTrue(is_type_row(['int', 'string', 'long']))
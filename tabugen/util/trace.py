@@ -0,0 +1,260 @@
+# Copyright (C) 2024 qi7chen@github. All rights reserved.
+# Distributed under the terms and conditions of the Apache License.
+# See accompanying files LICENSE.
+
+import os
+import sys
+import json
+import time
+import tracemalloc
+import tempfile
+import threading
+import contextlib
+import unittest
+
+
+# Chrome/Perfetto的trace事件(chrome://tracing 或 ui.perfetto.dev 打开)
+# 每个阶段记录一个完整事件(ph=X)，带进程和线程id，子进程的事件随解析结果传回主进程
+# --mem_report使用同样的阶段划分，通过tracemalloc记录每个阶段的峰值和保留的内存
+
+enabled = False
+events = []
+thread_names = {}   # (pid, tid) -> 线程名
+lock = threading.Lock()
+
+mem_enabled = False
+mem_records = []    # 每个阶段的内存记录(阶段, 分类, 文件或结构, 峰值, 保留, 进程id)
+mem_tables = []     # 每个表格data_rows的估算大小
+mem_frames = threading.local()
+
+
+def enable():
+    global enabled
+    enabled = True
+    events.clear()
+    thread_names.clear()
+
+
+# 开始用tracemalloc记录内存，会明显降低运行速度
+def enable_memory():
+    global mem_enabled
+    mem_enabled = True
+    mem_records.clear()
+    mem_tables.clear()
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+# 子进程的状态可能是fork时从主进程复制的，需要重置
+def init_worker(is_enabled: bool, is_mem_enabled: bool = False):
+    global enabled, mem_enabled
+    enabled = is_enabled
+    mem_enabled = False
+    events.clear()
+    thread_names.clear()
+    if is_mem_enabled:
+        enable_memory()
+
+
+def now_us() -> float:
+    return time.time_ns() / 1000
+
+
+def add_event(name: str, cat: str, start_us: float, dur_us: float, args: dict):
+    pid = os.getpid()
+    tid = threading.get_native_id()
+    event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': start_us, 'dur': dur_us, 'pid': pid, 'tid': tid}
+    if len(args) > 0:
+        event['args'] = args
+    with lock:
+        events.append(event)
+        if (pid, tid) not in thread_names:
+            thread_names[(pid, tid)] = threading.current_thread().name
+
+
+# 阶段开始时重置tracemalloc的峰值，嵌套的阶段结束后把峰值传递给外层
+# frame为[开始时的内存, 子阶段的最大峰值]
+def begin_memory() -> list:
+    stack = getattr(mem_frames, 'stack', None)
+    if stack is None:
+        stack = mem_frames.stack = []
+    current, peak = tracemalloc.get_traced_memory()
+    if len(stack) > 0:
+        stack[-1][1] = max(stack[-1][1], peak)
+    tracemalloc.reset_peak()
+    frame = [current, 0]
+    stack.append(frame)
+    return frame
+
+
+def end_memory(name: str, cat: str, args: dict, frame: list):
+    stack = mem_frames.stack
+    stack.pop()
+    current, peak = tracemalloc.get_traced_memory()
+    peak = max(peak, frame[1])
+    if len(stack) > 0:
+        stack[-1][1] = max(stack[-1][1], peak)
+    target = ''
+    if len(args) > 0:
+        target = str(next(iter(args.values())))
+    with lock:
+        mem_records.append((name, cat, target, peak - frame[0], current - frame[0], os.getpid()))
+
+
+# with trace.span('read sheet', 'parse', file=filename):
+@contextlib.contextmanager
+def span(name: str, cat: str = '', **args):
+    if not enabled and not mem_enabled:
+        yield
+        return
+    start = now_us()
+    frame = begin_memory() if mem_enabled else None
+    try:
+        yield
+    finally:
+        if enabled:
+            add_event(name, cat, start, now_us() - start, args)
+        if frame is not None:
+            end_memory(name, cat, args, frame)
+
+
+# 取出当前进程记录的事件，用于从子进程传回
+def collect() -> tuple[list, dict, list]:
+    with lock:
+        result = (list(events), dict(thread_names), list(mem_records))
+        events.clear()
+        thread_names.clear()
+        mem_records.clear()
+    return result
+
+
+def merge(collected: tuple[list, dict, list]):
+    worker_events, worker_threads, worker_records = collected
+    with lock:
+        events.extend(worker_events)
+        thread_names.update(worker_threads)
+        mem_records.extend(worker_records)
+
+
+def metadata_events() -> list:
+    main_pid = os.getpid()
+    result = []
+    for pid in sorted(set(pid for pid, _ in thread_names)):
+        name = 'tabugen' if pid == main_pid else 'parse worker'
+        result.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': name}})
+    for (pid, tid), name in sorted(thread_names.items()):
+        result.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}})
+    return result
+
+
+def save(filename: str):
+    with lock:
+        doc = {'traceEvents': metadata_events() + sorted(events, key=lambda e: e['ts']), 'displayTimeUnit': 'ms'}
+    with open(filename, 'w') as f:
+        json.dump(doc, f)
+    print('wrote %d trace events to %s' % (len(doc['traceEvents']), filename))
+
+
+# 估算数据行占用的字节数，包含列表和每个单元格字符串
+def estimate_rows_bytes(rows: list[list[str]]) -> int:
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row)
+        for cell in row:
+            size += sys.getsizeof(cell)
+    return size
+
+
+# 记录每个表格的data_rows大小，需要在解析完成后调用
+def record_tables(descriptors: list):
+    for struct in descriptors:
+        rows = struct.data_rows
+        columns = len(rows[0]) if len(rows) > 0 else 0
+        mem_tables.append((getattr(struct, 'file', struct.name), len(rows), columns, estimate_rows_bytes(rows)))
+
+
+def format_bytes(n: int) -> str:
+    for unit in ['B', 'KB', 'MB']:
+        if abs(n) < 1024:
+            return '%d%s' % (n, unit) if unit == 'B' else '%.1f%s' % (n, unit)
+        n /= 1024
+    return '%.1fGB' % n
+
+
+# 输出内存占用最多的文件、表格和阶段
+def print_memory_report(top: int = 10):
+    current, peak = tracemalloc.get_traced_memory()
+    print('memory report (tracemalloc): current %s' % format_bytes(current))
+
+    files = [r for r in mem_records if r[0] == 'parse file']
+    files.sort(key=lambda r: r[3], reverse=True)
+    print('top %d files by parse peak:' % min(top, len(files)))
+    print('    %10s %10s  %s' % ('peak', 'retained', 'file'))
+    for name, cat, target, stage_peak, retained, pid in files[:top]:
+        print('    %10s %10s  %s' % (format_bytes(stage_peak), format_bytes(retained), target))
+
+    tables = sorted(mem_tables, key=lambda t: t[3], reverse=True)
+    print('top %d tables by data_rows size:' % min(top, len(tables)))
+    print('    %10s %8s %6s  %s' % ('data_rows', 'rows', 'cols', 'file'))
+    for filename, rows, columns, size in tables[:top]:
+        print('    %10s %8d %6d  %s' % (format_bytes(size), rows, columns, filename))
+    if len(tables) > 0:
+        print('    %10s in total' % format_bytes(sum(t[3] for t in tables)))
+
+    stages = [r for r in mem_records if r[0] not in ['parse file', 'parse all']]
+    stages.sort(key=lambda r: r[3], reverse=True)
+    print('top %d stages by peak:' % min(top, len(stages)))
+    print('    %10s %10s  %-20s %s' % ('peak', 'retained', 'stage', 'target'))
+    for name, cat, target, stage_peak, retained, pid in stages[:top]:
+        stage = '%s/%s' % (cat, name) if cat else name
+        print('    %10s %10s  %-20s %s' % (format_bytes(stage_peak), format_bytes(retained), stage, target))
+
+
+class TestTrace(unittest.TestCase):
+
+    def test_span(self):
+        enable()
+        try:
+            with span('parse', 'parse', file='a.xlsx'):
+                with span('read sheet', 'parse'):
+                    pass
+            worker = collect()
+            self.assertEqual(events, [])
+            merge(worker)
+            self.assertEqual([e['name'] for e in events], ['read sheet', 'parse'])
+            self.assertEqual(events[1]['args'], {'file': 'a.xlsx'})
+            self.assertGreaterEqual(events[1]['dur'], events[0]['dur'])
+            filename = os.path.join(tempfile.gettempdir(), 'tabugen_trace_test.json')
+            save(filename)
+            with open(filename) as f:
+                doc = json.load(f)
+            os.remove(filename)
+            self.assertEqual(doc['traceEvents'][0]['name'], 'process_name')
+            self.assertEqual(doc['traceEvents'][-1]['name'], 'read sheet')
+        finally:
+            init_worker(False)
+
+    def test_memory(self):
+        enable_memory()
+        try:
+            with span('parse file', 'parse', file='a.xlsx'):
+                with span('read sheet', 'parse', file='a.xlsx'):
+                    rows = [[('%d,%d' % (i, j)) * 20 for j in range(10)] for i in range(100)]
+                    del rows
+                kept = [str(i) * 1000 for i in range(100)]
+            names = [r[0] for r in mem_records]
+            self.assertEqual(names, ['read sheet', 'parse file'])
+            read_peak, parse_peak, parse_retained = mem_records[0][3], mem_records[1][3], mem_records[1][4]
+            self.assertGreater(read_peak, 100 * 10 * 100)
+            self.assertGreaterEqual(parse_peak, read_peak)
+            self.assertGreater(parse_retained, 100 * 1000)
+            self.assertLess(parse_retained, parse_peak)
+            self.assertGreater(estimate_rows_bytes([['a', 'b']]), 0)
+            del kept
+        finally:
+            init_worker(False)
+            tracemalloc.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
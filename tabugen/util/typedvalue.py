@@ -0,0 +1,404 @@
+# Copyright (C) 2024 qi7chen@github. All rights reserved.
+# Distributed under the terms and conditions of the Apache License.
+# See accompanying files LICENSE.
+
+import math
+import sys
+import traceback
+import unittest
+from argparse import Namespace
+from dataclasses import dataclass, field
+import tabugen.predef as predef
+import tabugen.typedef as types
+import tabugen.util.helper as helper
+import tabugen.util.tableutil as tableutil
+import tabugen.util.trace as trace
+from tabugen.structs import Struct, StructField
+
+
+# 解析完成后把单元格转换为类型化的值，每列只转换一次，所有导出格式共用同一套转换规则
+# bool: helper.str2bool
+# 整数: 空白为0，小数四舍五入，兼容模式下支持16进制
+# 浮点数: 空白为0
+# 字符串: 去掉首尾空白
+# 数组和字典: 空白为空数组和空字典
+
+
+def parse_bool(text: str) -> bool:
+    return helper.str2bool(text.strip())
+
+
+def parse_int(text: str) -> int:
+    text = text.strip()
+    if len(text) == 0:
+        return 0
+    try:
+        return int(text)
+    except ValueError:
+        return int(round(float(text)))  # 四舍五入
+
+
+# 兼容模式下支持16进制
+def parse_legacy_int(text: str) -> int:
+    text = text.strip()
+    try:
+        return parse_int(text)
+    except ValueError:
+        return int(text, 16)
+
+
+def parse_float(text: str) -> float:
+    text = text.strip()
+    if len(text) == 0:
+        return 0.0
+    return float(text)
+
+
+# 替换类型别名，float[] => float32[]
+def normalize_type_name(typename: str) -> str:
+    typename = typename.strip()
+    if typename.endswith('[]'):
+        return normalize_type_name(typename[:-2]) + '[]'
+    if typename.startswith('<') and typename.endswith('>'):
+        parts = typename[1:-1].split(',')
+        if len(parts) == 2:
+            return '<%s,%s>' % (normalize_type_name(parts[0]), normalize_type_name(parts[1]))
+    return types.alias.get(typename, typename)
+
+
+# 基础类型的转换函数
+def compile_primitive_converter(typename: str, legacy: bool):
+    typename = normalize_type_name(typename)
+    if types.is_bool_type(typename):
+        return parse_bool
+    if types.is_integer_type(typename):
+        if legacy:
+            return parse_legacy_int
+        return parse_int
+    if types.is_floating_type(typename):
+        return parse_float
+    return str.strip
+
+
+def compile_array_converter(elem_type: str, legacy: bool):
+    elem_conv = compile_primitive_converter(elem_type, legacy)
+    delim = helper.Delim1
+
+    def convert(text: str) -> list:
+        if len(text.strip()) == 0:
+            return []
+        return [elem_conv(item) for item in text.split(delim)]
+    return convert
+
+
+def compile_map_converter(key_type: str, value_type: str, legacy: bool):
+    key_conv = compile_primitive_converter(key_type, legacy)
+    value_conv = compile_primitive_converter(value_type, legacy)
+    delim1 = helper.Delim1
+    delim2 = helper.Delim2
+
+    def convert(text: str) -> dict:
+        obj = {}
+        if len(text.strip()) == 0:
+            return obj
+        for item in text.split(delim1):
+            pair = item.split(delim2)
+            if len(pair) != 2:
+                raise ValueError('invalid map item %s' % item)
+            obj[key_conv(pair[0])] = value_conv(pair[1])
+        return obj
+    return convert
+
+
+# 根据类型名生成转换函数，同一类型只生成一次
+class ValueConverter:
+    def __init__(self, legacy: bool):
+        self.legacy = legacy
+        self.converters = {}
+
+    def get(self, typename: str):
+        conv = self.converters.get(typename)
+        if conv is not None:
+            return conv
+        name = normalize_type_name(typename)
+        abs_type = types.is_composite_type(name)
+        if abs_type == 'array':
+            conv = compile_array_converter(types.array_element_type(name), self.legacy)
+        elif abs_type == 'map':
+            ktype, vtype = types.map_key_value_types(name)
+            conv = compile_map_converter(ktype, vtype, self.legacy)
+        else:
+            conv = compile_primitive_converter(name, self.legacy)
+        self.converters[typename] = conv
+        return conv
+
+
+# 转换回文本，用于csv等文本格式
+def format_value(value) -> str:
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float):
+        if value.is_integer() and abs(value) < 1e16:
+            return str(int(value))
+        return repr(value)
+    if isinstance(value, list):
+        return helper.Delim1.join(format_value(v) for v in value)
+    if isinstance(value, dict):
+        return helper.Delim1.join(format_value(k) + helper.Delim2 + format_value(v) for k, v in value.items())
+    return str(value)
+
+
+# 一个结构的类型化数据
+@dataclass
+class TypedTable:
+    kv_mode: bool = False
+    row_count: int = 0
+    columns: dict[int, list] = field(default_factory=dict)     # 所在列 -> 每一行的值
+    kv_items: list[tuple[str, str, object]] = field(default_factory=list)  # KV模式的(键, 类型名, 值)
+
+    # 一行中多个列的值，用于数组字段
+    def row_values(self, cols: list[int], row: int) -> list:
+        return [self.columns[col][row] for col in cols]
+
+
+# KV模式每一行是一个字段，每行的类型不同
+def convert_kv_items(struct: Struct, converter: ValueConverter) -> list[tuple[str, str, object]]:
+    keyidx = struct.get_column_index(predef.PredefKVKeyName)
+    typeidx = struct.get_column_index(predef.PredefKVTypeName)
+    valueidx = struct.get_column_index(predef.PredefKVValueName)
+    items = []
+    for row in struct.data_rows:
+        key = row[keyidx].strip()
+        if key == '':
+            continue
+        typename = 'int'
+        if typeidx >= 0:
+            typename = row[typeidx].strip()
+        if converter.legacy and typename.isdigit():
+            typename = types.legacy_type_to_name(int(typename))
+        try:
+            items.append((key, typename, converter.get(typename)(row[valueidx])))
+        except Exception as e:
+            print(e, traceback.format_exc())
+    return items
+
+
+# 检查整数是否超出字段类型的取值范围，返回错误信息
+def check_int_overflow(struct: Struct, table: TypedTable) -> list[str]:
+    errors = []
+    for fld in struct.raw_fields:
+        typename = normalize_type_name(fld.origin_type_name)
+        elem_type = typename[:-2] if typename.endswith('[]') else typename
+        bound = tableutil.int_type_range(elem_type)
+        if bound is None:
+            continue
+        low, high = bound
+        for row, value in enumerate(table.columns[fld.column]):
+            values = value if isinstance(value, list) else [value]
+            for v in values:
+                if v < low or v > high:
+                    errors.append('%s field %s value %d overflows %s, data row %d' % (
+                        struct.name, fld.name, v, elem_type, row + 1))
+                    break
+    return errors
+
+
+# 值(包括数组和字典的元素)是否都是有限的数字，inf和nan没有对应的代码字面量
+def is_finite_value(value) -> bool:
+    if isinstance(value, float):
+        return math.isfinite(value)
+    if isinstance(value, list):
+        return all(is_finite_value(v) for v in value)
+    if isinstance(value, dict):
+        return all(is_finite_value(v) for v in value.values())
+    return True
+
+
+# 嵌入到代码中的浮点数不能是inf或者nan
+def check_embed_floats(struct: Struct, table: TypedTable) -> list[str]:
+    errors = []
+    if table.kv_mode:
+        for key, typename, value in table.kv_items:
+            if not is_finite_value(value):
+                errors.append('%s field %s value %s can not be embedded' % (struct.name, key, value))
+        return errors
+    for fld in struct.raw_fields:
+        for row, value in enumerate(table.columns[fld.column]):
+            if not is_finite_value(value):
+                errors.append('%s field %s value %s can not be embedded, data row %d' % (
+                    struct.name, fld.name, value, row + 1))
+                break
+    return errors
+
+
+# 转换一列的值，无法转换的单元格记录到errors
+def convert_column(struct: Struct, fld: StructField, conv, rows: list[list[str]], errors: list[str]) -> list:
+    col = fld.column
+    try:
+        return [conv(row[col]) for row in rows]
+    except ValueError:
+        pass
+    values = []
+    for i, row in enumerate(rows):
+        try:
+            values.append(conv(row[col]))
+        except ValueError:
+            errors.append('%s field %s invalid %s value "%s", data row %d' % (
+                struct.name, fld.name, fld.origin_type_name, row[col], i + 1))
+            values.append(None)
+    return values
+
+
+def convert_struct(struct: Struct, legacy: bool, check_overflow: bool = False) -> TypedTable:
+    with trace.span('validate', 'convert', struct=struct.name):
+        rows = tableutil.validate_unique_column(struct, struct.data_rows)
+    with trace.span('convert', 'convert', struct=struct.name):
+        converter = ValueConverter(legacy)
+        table = TypedTable(kv_mode=struct.options.get(predef.PredefParseKVMode, False), row_count=len(rows))
+        errors = []
+        for fld in struct.raw_fields:
+            conv = converter.get(fld.origin_type_name)
+            table.columns[fld.column] = convert_column(struct, fld, conv, rows, errors)
+        if len(errors) > 0:
+            for err in errors:
+                print(err)
+            sys.exit(1)
+        if table.kv_mode:
+            table.kv_items = convert_kv_items(struct, converter)
+    if check_overflow and not table.kv_mode:
+        errors = check_int_overflow(struct, table)
+        if len(errors) > 0:
+            for err in errors:
+                print(err)
+            sys.exit(1)
+    return table
+
+
+# 结构的类型化数据，转换一次后由所有导出格式共享
+def get_typed_table(struct: Struct, args: Namespace) -> TypedTable:
+    narrow_int = getattr(args, 'narrow_int', False)
+    key = (args.legacy, narrow_int, helper.Delim1, helper.Delim2)
+    cached = getattr(struct, 'typed_table', None)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    table = convert_struct(struct, args.legacy, narrow_int)
+    struct.typed_table = (key, table)
+    return table
+
+
+# 是否可以把数据嵌入到生成的代码中，超过行数或者文本大小限制的表格仍然通过数据文件加载
+def can_embed(struct: Struct, args: Namespace) -> bool:
+    rows = struct.data_rows
+    if len(rows) > args.embed_max_rows:
+        return False
+    size = 0
+    for row in rows:
+        size += sum(len(cell) for cell in row)
+        if size > args.embed_max_bytes:
+            return False
+    return True
+
+
+# 嵌入到代码中的数据，普通表格返回每一行的值(先是字段，之后是数组字段，与结构定义的顺序一致)
+# KV模式返回键 -> (类型名, 值)
+def embed_values(struct: Struct, args: Namespace):
+    typed = get_typed_table(struct, args)
+    errors = check_embed_floats(struct, typed)
+    if len(errors) > 0:
+        for err in errors:
+            print(err)
+        sys.exit(1)
+    if typed.kv_mode:
+        return {key: (typename, value) for key, typename, value in typed.kv_items}
+    columns = [typed.columns[fld.column] for fld in struct.fields]
+    arrays = []     # 每个数组字段的(元素所在列的值, 是否二维数组)
+    for array in struct.array_fields:
+        if array.is_nested():
+            arrays.append(([[typed.columns[fld.column] for fld in row] for row in array.element_rows], True))
+        else:
+            arrays.append(([typed.columns[fld.column] for fld in array.element_fields], False))
+    rows = []
+    for i in range(typed.row_count):
+        row = [values[i] for values in columns]
+        for elems, nested in arrays:
+            if nested:
+                row.append([[values[i] for values in elem_row] for elem_row in elems])
+            else:
+                row.append([values[i] for values in elems])
+        rows.append(row)
+    return rows
+
+
+class TestTypedValue(unittest.TestCase):
+
+    def test_convert_struct(self):
+        struct = Struct(name='Item', options={predef.PredefParseKVMode: False})
+        for col, (name, typename) in enumerate([('ID', 'int'), ('Enable', 'bool'), ('Rate', 'float'),
+                                                ('Items', 'int[]'), ('Drops', '<string,int>'), ('Name', 'string')]):
+            struct.raw_fields.append(StructField(name=name, origin_type_name=typename, column=col))
+        struct.data_rows = [
+            ['1', '0', '0.5', helper.Delim1.join(['1', '2']), 'x%s1' % helper.Delim2, ' a '],
+            ['2.6', 'yes', '', '', '', ''],
+        ]
+        table = get_typed_table(struct, Namespace(legacy=False, narrow_int=False))
+        self.assertEqual(table.row_values([0, 1, 2, 3, 4, 5], 0), [1, False, 0.5, [1, 2], {'x': 1}, 'a'])
+        self.assertEqual(table.row_values([0, 1, 2, 3, 4, 5], 1), [3, True, 0.0, [], {}, ''])
+        self.assertIs(get_typed_table(struct, Namespace(legacy=False, narrow_int=False)), table)
+        self.assertEqual([format_value(v) for v in table.row_values([0, 1, 2], 0)], ['1', '0', '0.5'])
+        self.assertEqual(format_value(table.columns[3][0]), helper.Delim1.join(['1', '2']))
+
+    def test_embed_values(self):
+        struct = Struct(name='Item', options={predef.PredefParseKVMode: False})
+        for col, name in enumerate(['ID', 'Cost[0]', 'Cost[1]']):
+            struct.raw_fields.append(StructField(name=name, origin_type_name='int', column=col))
+        struct.fields = struct.raw_fields[:]
+        struct.data_rows = [['1', '2', '3'], ['4', '5', '']]
+        struct.parse_array_fields()
+        args = Namespace(legacy=False, narrow_int=False, embed_max_rows=2, embed_max_bytes=100)
+        self.assertTrue(can_embed(struct, args))
+        self.assertEqual(embed_values(struct, args), [[1, [2, 3]], [4, [5, 0]]])
+        self.assertFalse(can_embed(struct, Namespace(legacy=False, narrow_int=False, embed_max_rows=1, embed_max_bytes=100)))
+        self.assertFalse(can_embed(struct, Namespace(legacy=False, narrow_int=False, embed_max_rows=2, embed_max_bytes=4)))
+
+    def test_embed_floats(self):
+        struct = Struct(name='Item', options={predef.PredefParseKVMode: False})
+        for col, (name, typename) in enumerate([('Rate', 'float'), ('Weights', 'float[]')]):
+            struct.raw_fields.append(StructField(name=name, origin_type_name=typename, column=col))
+        struct.data_rows = [['0.5', '1'], ['inf', helper.Delim1.join(['1', 'nan'])]]
+        errors = check_embed_floats(struct, convert_struct(struct, False))
+        self.assertEqual(errors, ['Item field Rate value inf can not be embedded, data row 2',
+                                  'Item field Weights value [1.0, nan] can not be embedded, data row 2'])
+
+    def test_int_overflow(self):
+        struct = Struct(name='Item', options={predef.PredefParseKVMode: False})
+        for col, (name, typename) in enumerate([('ID', 'uint8'), ('Items', 'int8[]')]):
+            struct.raw_fields.append(StructField(name=name, origin_type_name=typename, column=col))
+        struct.data_rows = [['1', helper.Delim1.join(['1', '2'])], ['256', helper.Delim1.join(['-128', '128'])]]
+        errors = check_int_overflow(struct, convert_struct(struct, False))
+        self.assertEqual(errors, ['Item field ID value 256 overflows uint8, data row 2',
+                                  'Item field Items value 128 overflows int8, data row 2'])
+
+    def test_invalid_value(self):
+        struct = Struct(name='Item', options={predef.PredefParseKVMode: False})
+        for col, (name, typename) in enumerate([('ID', 'int'), ('Items', 'int[]'), ('Drops', '<string,int>')]):
+            struct.raw_fields.append(StructField(name=name, origin_type_name=typename, column=col))
+        rows = [['1', helper.Delim1.join(['1', '2']), 'a%s1' % helper.Delim2],
+                ['abc', helper.Delim1.join(['3', 'x']), 'a=1']]
+        errors = []
+        for fld in struct.raw_fields:
+            convert_column(struct, fld, ValueConverter(False).get(fld.origin_type_name), rows, errors)
+        self.assertEqual(errors, ['Item field ID invalid int value "abc", data row 2',
+                                  'Item field Items invalid int[] value "%s", data row 2' % rows[1][1],
+                                  'Item field Drops invalid <string,int> value "a=1", data row 2'])
+        struct.data_rows = rows
+        with self.assertRaises(SystemExit):
+            convert_struct(struct, False)
+
+    def test_legacy_hex(self):
+        self.assertEqual(parse_legacy_int('0x1F'), 31)
+        with self.assertRaises(ValueError):
+            parse_int('0x1F')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+# Copyright (C) 2024 qi7chen@github. All rights reserved.
+# Distributed under the terms and conditions of the Apache License.
+# See accompanying files LICENSE.
+
+import os
+import copy
+import time
+import shutil
+import tempfile
+import traceback
+import unittest
+import dataclasses
+from argparse import Namespace
+import tabugen.predef as predef
+from tabugen.structs import Struct
+
+
+# 结构定义的签名，不包含数据行，用于判断是否需要重新生成代码
+# KV模式的字段定义来自数据行，需要包含数据行
+def struct_schema(struct: Struct) -> Struct:
+    rows = struct.data_rows if struct.options.get(predef.PredefParseKVMode, False) else []
+    return copy.deepcopy(dataclasses.replace(struct, data_rows=rows, parse_time=0))
+
+
+# 监视模式，解析结果常驻内存，轮询文件的修改时间，只重新解析修改过的文件
+# 结构定义有变化时才重新生成代码，数据只导出修改过的文件
+class WatchSession:
+
+    def __init__(self, parser, args: Namespace, generate_code, write_data):
+        self.parser = parser
+        self.args = args
+        self.generate_code = generate_code  # generate_code(descriptors)
+        self.write_data = write_data        # write_data(descriptors)
+        self.interval = args.watch_interval
+        self.structs = {}       # 文件名 -> Struct
+        self.schemas = {}       # 文件名 -> 结构签名
+        self.file_stats = {}    # 文件名 -> (大小, 修改时间)
+
+    @staticmethod
+    def stat_files(filenames: list[str]) -> dict:
+        stats = {}
+        for filename in filenames:
+            try:
+                st = os.stat(filename)
+            except OSError:
+                continue
+            stats[filename] = (st.st_size, st.st_mtime_ns)
+        return stats
+
+    # 记录初始解析结果，需要在生成代码之前调用
+    def track(self, descriptors: list[Struct]):
+        self.file_stats = self.stat_files(self.parser.filenames)
+        for struct in descriptors:
+            self.structs[struct.file] = struct
+            self.schemas[struct.file] = struct_schema(struct)
+
+    # 检查一次文件修改，返回是否有重新导出
+    def poll(self) -> bool:
+        filenames = list(self.parser.rescan_filenames(self.args.file_asset))
+        stats = self.stat_files(filenames)
+        changed = [name for name in filenames if name in stats and self.file_stats.get(name) != stats[name]]
+        removed = [name for name in self.structs if name not in stats]
+        self.file_stats = stats
+        if len(changed) == 0 and len(removed) == 0:
+            return False
+        self.rebuild(filenames, changed, removed)
+        return True
+
+    def rebuild(self, filenames: list[str], changed: list[str], removed: list[str]):
+        start_at = time.time()
+        schema_changed = False
+        for filename in removed:
+            print('workbook removed', filename)
+            del self.structs[filename]
+            del self.schemas[filename]
+            schema_changed = True
+
+        updated = []
+        for filename in changed:
+            _, struct, err = self.parser.try_parse_one_file(filename)
+            if struct is None:
+                print('parse file %s failed' % filename)
+                print(err)
+                continue
+            struct.file = filename
+            schema = struct_schema(struct)
+            if self.schemas.get(filename) != schema:
+                schema_changed = True
+            self.structs[filename] = struct
+            self.schemas[filename] = schema
+            updated.append(struct)
+
+        descriptors = [self.structs[name] for name in filenames if name in self.structs]
+        if schema_changed and len(descriptors) > 0:
+            self.generate_code(descriptors)
+        if len(updated) > 0:
+            self.write_data(updated)
+        print('%d file(s) re-exported in %.3fs' % (len(updated), time.time() - start_at))
+
+    def run_forever(self):
+        print('watching %d file(s) for changes, press Ctrl+C to stop' % len(self.file_stats))
+        try:
+            while True:
+                time.sleep(self.interval)
+                try:
+                    self.poll()
+                except (Exception, SystemExit):
+                    # 导出失败时继续监视，等待下一次修改
+                    print(traceback.format_exc())
+        except KeyboardInterrupt:
+            print('stop watching')
+
+
+class TestWatchSession(unittest.TestCase):
+
+    def test_poll(self):
+        from tabugen.parser.sheet_parser import SpreadSheetParser
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, 'Item.csv')
+            with open(filename, 'w') as f:
+                f.write('ID,Name\n1,a\n')
+            args = Namespace(legacy=False, project_kind='', jobs=1, xlsx_reader='openpyxl', schema_rows=0,
+                             without_data=False, file_skip=None, file_asset=[tmpdir], cache_dir='',
+                             infer_sample='', infer_strict=False, row_filter=None, narrow_int=False,
+                             watch_interval=0.1)
+            parser = SpreadSheetParser()
+            parser.init(args)
+            calls = []
+            session = WatchSession(parser, args,
+                                   lambda descriptors: calls.append(('code', [s.name for s in descriptors])),
+                                   lambda descriptors: calls.append(('data', [s.name for s in descriptors])))
+            session.track(parser.parse_all())
+            self.assertFalse(session.poll())
+
+            # 只修改数据，不需要重新生成代码
+            with open(filename, 'w') as f:
+                f.write('ID,Name\n1,b\n')
+            os.utime(filename, ns=(0, session.file_stats[filename][1] + 1000000000))
+            self.assertTrue(session.poll())
+            self.assertEqual(calls, [('data', ['Item'])])
+
+            # 新增文件
+            calls.clear()
+            with open(os.path.join(tmpdir, 'Box.csv'), 'w') as f:
+                f.write('ID,Count\n1,2\n')
+            self.assertTrue(session.poll())
+            self.assertEqual(calls[0][0], 'code')
+            self.assertEqual(sorted(calls[0][1]), ['Box', 'Item'])
+            self.assertEqual(calls[1], ('data', ['Box']))
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
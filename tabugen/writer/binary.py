@@ -0,0 +1,457 @@
+# Copyright (C) 2018-present qi7chen@github. All rights reserved.
+# Distributed under the terms and conditions of the Apache License.
+# See accompanying files LICENSE.
+
+import os
+import struct as pystruct
+import unittest
+from argparse import Namespace
+from dataclasses import dataclass
+import tabugen.predef as predef
+import tabugen.typedef as types
+import tabugen.util.helper as helper
+import tabugen.util.typedvalue as typedvalue
+import tabugen.util.trace as trace
+from tabugen.typedef import Type
+from tabugen.structs import Struct, StructField
+
+# 二进制数据文件格式，所有数值均为小端序，各个数据段按8字节对齐
+#
+#   header      固定48字节，见`HEADER_FORMAT`
+#   columns     column_count个列描述，每个24字节，见`COLUMN_FORMAT`
+#   column data 每列row_count个定长值，字符串为字符串表的索引，数组和字典为(起始元素, 元素个数)
+#   pools       数组和字典的元素，字典的key和value分开存放
+#   strings     (strings_count + 1)个u32偏移，之后是去重后的UTF-8字符串数据
+#
+# KV模式的表导出为只有一行的表，每个key是一列
+# 二维数组name[i][j]的每一行导出为一个数组列name[i]
+
+BINARY_MAGIC = b'TABU'
+BINARY_VERSION = 1
+FLAG_KV_MODE = 1
+
+HEADER_FORMAT = '<4sHHQIIIIIIII'
+HEADER_SIZE = pystruct.calcsize(HEADER_FORMAT)
+COLUMN_FORMAT = '<IBBBBIIII'
+COLUMN_SIZE = pystruct.calcsize(COLUMN_FORMAT)
+
+# 各类型的定长编码
+type_pack_codes = {
+    Type.Bool: 'B',
+    Type.Int8: 'b',
+    Type.UInt8: 'B',
+    Type.Int16: 'h',
+    Type.UInt16: 'H',
+    Type.Int32: 'i',
+    Type.UInt32: 'I',
+    Type.Int64: 'q',
+    Type.UInt64: 'Q',
+    Type.Float32: 'f',
+    Type.Float64: 'd',
+    Type.String: 'I',
+    Type.Array: 'II',
+    Type.Map: 'II',
+}
+
+
+def align8(n: int) -> int:
+    return (n + 7) & ~7
+
+
+# 64位FNV-1a哈希
+def fnv1a_64(data: bytes) -> int:
+    h = 0xcbf29ce484222325
+    for b in data:
+        h ^= b
+        h = (h * 0x100000001b3) & 0xFFFFFFFFFFFFFFFF
+    return h
+
+
+# 基础类型名转为类型枚举，未知类型按字符串处理
+def primitive_type_of(typename: str) -> Type:
+    typename = typename.strip()
+    typename = types.alias.get(typename, typename)
+    typ = types.get_type_by_name(typename)
+    if typ in (Type.Unknown, Type.Array, Type.Map):
+        return Type.String
+    return typ
+
+
+@dataclass
+class BinaryColumn:
+    name: str = ''
+    type: Type = Type.String        # 列类型
+    key_type: Type = Type.Unknown   # 字典的key类型
+    value_type: Type = Type.Unknown  # 数组元素或字典value类型
+
+    def schema_text(self) -> str:
+        return '%s:%d:%d:%d;' % (self.name, self.type.value, self.key_type.value, self.value_type.value)
+
+
+# 类型名对应的列描述
+def make_column(name: str, typename: str) -> BinaryColumn:
+    column = BinaryColumn(name=name)
+    typename = typename.strip()
+    abs_type = types.is_composite_type(typename)
+    if abs_type == 'array':
+        column.type = Type.Array
+        column.value_type = primitive_type_of(types.array_element_type(typename))
+    elif abs_type == 'map':
+        ktype, vtype = types.map_key_value_types(typename)
+        column.type = Type.Map
+        column.key_type = primitive_type_of(ktype)
+        column.value_type = primitive_type_of(vtype)
+    else:
+        column.type = primitive_type_of(typename)
+    return column
+
+
+# 表结构指纹，生成代码和数据文件的结构不一致时可以检查出来
+def schema_fingerprint(columns: list[BinaryColumn]) -> int:
+    text = ''.join(col.schema_text() for col in columns)
+    return fnv1a_64(text.encode('utf-8'))
+
+
+# 字符串去重表
+class StringTable:
+    def __init__(self):
+        self.index = {'': 0}
+        self.strings = ['']
+
+    def add(self, text: str) -> int:
+        idx = self.index.get(text)
+        if idx is None:
+            idx = len(self.strings)
+            self.index[text] = idx
+            self.strings.append(text)
+        return idx
+
+    def encode(self) -> bytes:
+        offsets = [0]
+        data = bytearray()
+        for text in self.strings:
+            data += text.encode('utf-8')
+            offsets.append(len(data))
+        return pystruct.pack('<%dI' % len(offsets), *offsets) + bytes(data)
+
+
+# 一列数据的编码结果
+class ColumnData:
+    def __init__(self, column: BinaryColumn):
+        self.column = column
+        self.data = b''
+        self.pool = b''
+        self.pool2 = b''
+        self.pool_count = 0
+
+
+# 把类型化的数据编码为二进制文件内容
+class BinaryTableEncoder:
+    def __init__(self):
+        self.strings = StringTable()
+
+    def pack_values(self, typ: Type, values: list) -> bytes:
+        if typ == Type.String:
+            values = [self.strings.add(v) for v in values]
+        return pystruct.pack('<%d%s' % (len(values), type_pack_codes[typ]), *values)
+
+    # values为每一行的值，数组为list，字典为dict
+    def encode_column(self, column: BinaryColumn, values: list) -> ColumnData:
+        out = ColumnData(column)
+        if column.type == Type.Array:
+            spans = []
+            elems = []
+            for value in values:
+                spans.extend((len(elems), len(value)))
+                elems.extend(value)
+            out.data = pystruct.pack('<%dI' % len(spans), *spans)
+            out.pool = self.pack_values(column.value_type, elems)
+            out.pool_count = len(elems)
+        elif column.type == Type.Map:
+            spans = []
+            keys = []
+            items = []
+            for value in values:
+                spans.extend((len(keys), len(value)))
+                keys.extend(value.keys())
+                items.extend(value.values())
+            out.data = pystruct.pack('<%dI' % len(spans), *spans)
+            out.pool = self.pack_values(column.key_type, keys)
+            out.pool2 = self.pack_values(column.value_type, items)
+            out.pool_count = len(keys)
+        else:
+            out.data = self.pack_values(column.type, values)
+        return out
+
+    def encode(self, columns: list[BinaryColumn], values_by_column: list[list], row_count: int, flags: int) -> bytes:
+        self.strings = StringTable()
+        for column in columns:
+            self.strings.add(column.name)
+        encoded = []
+        for column, values in zip(columns, values_by_column):
+            try:
+                encoded.append(self.encode_column(column, values))
+            except (ValueError, OverflowError, pystruct.error) as e:
+                raise ValueError('column %s: %s' % (column.name, e))
+
+        # 计算各段偏移
+        offset = HEADER_SIZE + align8(COLUMN_SIZE * len(columns))
+        entries = []
+        for item in encoded:
+            data_offset = offset
+            offset = align8(offset + len(item.data))
+            pool_offset = pool2_offset = 0
+            if item.column.type in (Type.Array, Type.Map):
+                pool_offset = offset
+                offset = align8(offset + len(item.pool))
+            if item.column.type == Type.Map:
+                pool2_offset = offset
+                offset = align8(offset + len(item.pool2))
+            entries.append((data_offset, pool_offset, pool2_offset))
+        strings_offset = offset
+        strings_data = self.strings.encode()
+        file_size = strings_offset + len(strings_data)
+
+        buf = bytearray(file_size)
+        pystruct.pack_into(HEADER_FORMAT, buf, 0, BINARY_MAGIC, BINARY_VERSION, flags,
+                           schema_fingerprint(columns), row_count, len(columns), HEADER_SIZE,
+                           strings_offset, len(self.strings.strings), len(strings_data), file_size, 0)
+        for i, item in enumerate(encoded):
+            col = item.column
+            data_offset, pool_offset, pool2_offset = entries[i]
+            pystruct.pack_into(COLUMN_FORMAT, buf, HEADER_SIZE + i * COLUMN_SIZE, self.strings.index[col.name],
+                               col.type.value, col.key_type.value, col.value_type.value, 0,
+                               data_offset, pool_offset, pool2_offset, item.pool_count)
+            buf[data_offset:data_offset + len(item.data)] = item.data
+            buf[pool_offset:pool_offset + len(item.pool)] = item.pool
+            buf[pool2_offset:pool2_offset + len(item.pool2)] = item.pool2
+        buf[strings_offset:] = strings_data
+        return bytes(buf)
+
+
+# 读取二进制数据文件
+class BinaryTableReader:
+    def __init__(self, data: bytes):
+        (magic, version, flags, fingerprint, row_count, column_count, columns_offset,
+         strings_offset, strings_count, strings_size, file_size, _) = pystruct.unpack_from(HEADER_FORMAT, data, 0)
+        if magic != BINARY_MAGIC:
+            raise ValueError('not a tabugen binary file')
+        if version != BINARY_VERSION:
+            raise ValueError('unsupported binary version %d' % version)
+        if file_size != len(data):
+            raise ValueError('file size mismatch, %d != %d' % (file_size, len(data)))
+        self.data = data
+        self.flags = flags
+        self.fingerprint = fingerprint
+        self.row_count = row_count
+
+        offsets = pystruct.unpack_from('<%dI' % (strings_count + 1), data, strings_offset)
+        base = strings_offset + (strings_count + 1) * 4
+        self.strings = [data[base + offsets[i]: base + offsets[i + 1]].decode('utf-8') for i in range(strings_count)]
+
+        self.columns = []
+        self.entries = []
+        for i in range(column_count):
+            entry = pystruct.unpack_from(COLUMN_FORMAT, data, columns_offset + i * COLUMN_SIZE)
+            name_idx, typ, key_type, value_type, _, data_offset, pool_offset, pool2_offset, pool_count = entry
+            column = BinaryColumn(name=self.strings[name_idx], type=Type(typ),
+                                  key_type=Type(key_type), value_type=Type(value_type))
+            self.columns.append(column)
+            self.entries.append((data_offset, pool_offset, pool2_offset, pool_count))
+        if schema_fingerprint(self.columns) != fingerprint:
+            raise ValueError('schema fingerprint mismatch')
+
+    @property
+    def is_kv_mode(self) -> bool:
+        return (self.flags & FLAG_KV_MODE) != 0
+
+    def unpack_values(self, typ: Type, offset: int, count: int) -> list:
+        values = list(pystruct.unpack_from('<%d%s' % (count, type_pack_codes[typ]), self.data, offset))
+        if typ == Type.String:
+            return [self.strings[i] for i in values]
+        if typ == Type.Bool:
+            return [v != 0 for v in values]
+        return values
+
+    # 读取一整列的值
+    def read_column(self, i: int) -> list:
+        column = self.columns[i]
+        data_offset, pool_offset, pool2_offset, pool_count = self.entries[i]
+        if column.type not in (Type.Array, Type.Map):
+            return self.unpack_values(column.type, data_offset, self.row_count)
+
+        spans = pystruct.unpack_from('<%dI' % (self.row_count * 2), self.data, data_offset)
+        if column.type == Type.Array:
+            elems = self.unpack_values(column.value_type, pool_offset, pool_count)
+            return [elems[spans[2 * n]: spans[2 * n] + spans[2 * n + 1]] for n in range(self.row_count)]
+        keys = self.unpack_values(column.key_type, pool_offset, pool_count)
+        values = self.unpack_values(column.value_type, pool2_offset, pool_count)
+        result = []
+        for n in range(self.row_count):
+            start, count = spans[2 * n], spans[2 * n + 1]
+            result.append(dict(zip(keys[start:start + count], values[start:start + count])))
+        return result
+
+    # 所有行，每行是字段名到值的字典
+    def read_rows(self) -> list[dict]:
+        column_values = [self.read_column(i) for i in range(len(self.columns))]
+        rows = []
+        for n in range(self.row_count):
+            rows.append({col.name: values[n] for col, values in zip(self.columns, column_values)})
+        return rows
+
+    # KV模式的表读取为一个字典
+    def read_object(self) -> dict:
+        rows = self.read_rows()
+        if len(rows) == 0:
+            return {}
+        return rows[0]
+
+
+def read_binary_file(filename: str) -> BinaryTableReader:
+    with open(filename, 'rb') as f:
+        return BinaryTableReader(f.read())
+
+
+# 写入二进制数据文件
+class BinaryDataWriter:
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def name() -> str:
+        return "binary"
+
+    # 普通表每个字段一列，数组字段合并为一列，二维数组每一行合并为一列
+    # 返回每一列的(列描述, 所在列)，数组列为元素所在列的列表
+    @staticmethod
+    def table_layout(struct: Struct) -> list[tuple[BinaryColumn, object]]:
+        layout = []
+        for field in struct.fields:
+            layout.append((make_column(field.name, field.origin_type_name), field.column))
+        for array in struct.array_fields:
+            elem_type = array.element_fields[0].origin_type_name
+            if array.is_nested():
+                # 二维数组每一行是一列，name[0], name[1]...
+                for n, row in enumerate(array.element_rows):
+                    column = make_column('%s[%d]' % (array.field_name, n), elem_type + '[]')
+                    layout.append((column, [field.column for field in row]))
+                continue
+            column = make_column(array.field_name, elem_type + '[]')
+            layout.append((column, [field.column for field in array.element_fields]))
+        return layout
+
+    @staticmethod
+    def table_columns(struct: Struct, typed: typedvalue.TypedTable) -> tuple[list[BinaryColumn], list[list]]:
+        columns = []
+        values_by_column = []
+        for column, cols in BinaryDataWriter.table_layout(struct):
+            columns.append(column)
+            if isinstance(cols, list):
+                values_by_column.append([typed.row_values(cols, i) for i in range(typed.row_count)])
+            else:
+                values_by_column.append(typed.columns[cols])
+        return columns, values_by_column
+
+    # KV模式的表转为只有一行，每个key是一列
+    @staticmethod
+    def kv_columns(typed: typedvalue.TypedTable) -> tuple[list[BinaryColumn], list[list]]:
+        columns = []
+        values_by_column = []
+        for key, typename, value in typed.kv_items:
+            columns.append(make_column(key, typename))
+            values_by_column.append([value])
+        return columns, values_by_column
+
+    # 数据文件的列描述，生成的读取代码按同样的列顺序和结构指纹访问数据文件
+    @staticmethod
+    def struct_columns(struct: Struct, args: Namespace) -> list[BinaryColumn]:
+        if struct.options[predef.PredefParseKVMode]:
+            columns, _ = BinaryDataWriter.kv_columns(typedvalue.get_typed_table(struct, args))
+            return columns
+        return [column for column, _ in BinaryDataWriter.table_layout(struct)]
+
+    def encode(self, struct: Struct, args: Namespace) -> bytes:
+        encoder = BinaryTableEncoder()
+        typed = typedvalue.get_typed_table(struct, args)
+        if typed.kv_mode:
+            columns, values = self.kv_columns(typed)
+            return encoder.encode(columns, values, 1, FLAG_KV_MODE)
+        columns, values = self.table_columns(struct, typed)
+        return encoder.encode(columns, values, typed.row_count, 0)
+
+    def process(self, descriptors: list[Struct], args: Namespace):
+        filepath = args.out_data_path
+        if filepath != '.':
+            os.makedirs(filepath, exist_ok=True)
+
+        helper.log('binary output path is', filepath)
+        for struct in descriptors:
+            try:
+                with trace.span('encode', 'binary', struct=struct.name):
+                    content = self.encode(struct, args)
+            except ValueError as e:
+                helper.log('encode %s failed, %s' % (struct.name, e))
+                raise
+            name = helper.camel_to_snake(struct.camel_case_name)
+            filename = os.path.abspath(os.path.join(filepath, name + '.bin'))
+            with trace.span('write', 'binary', struct=struct.name):
+                modified = helper.save_bytes_if_not_same(filename, content)
+            if modified:
+                helper.log("wrote binary data to", filename)
+
+
+class TestBinaryFormat(unittest.TestCase):
+
+    def test_round_trip(self):
+        from tabugen.parser.sheet_parser import SpreadSheetParser
+        table = [
+            ['ID', 'Name', 'Cost[0]', 'Cost[1]', 'Rate', 'Enable', 'Items', 'Drops', '#Note'],
+            ['int', 'string', 'int16', 'int16', 'float64', 'bool', 'int[]', '<string,int>', 'string'],
+            ['1', 'a', '3', '4', '0.5', '1', helper.Delim1.join(['1', '2']), 'x%s1' % helper.Delim2, ''],
+            ['2', '测试', '-5', '', '', '', '', '', 'note'],
+            ['3', 'a', '', '6', '2.25', 'false', '7', helper.Delim1.join(['x%s2' % helper.Delim2, 'y%s3' % helper.Delim2]), ''],
+        ]
+        meta = {predef.PredefClassName: 'Item', predef.PredefParseKVMode: False}
+        struct = SpreadSheetParser().parse_table_struct(meta, table)
+        struct.options = meta
+        struct.parse_array_fields()
+
+        data = BinaryDataWriter().encode(struct, Namespace(legacy=False, narrow_int=False))
+        reader = BinaryTableReader(data)
+        self.assertFalse(reader.is_kv_mode)
+        self.assertEqual(reader.columns[0].type, Type.Int32)
+        rows = reader.read_rows()
+        self.assertEqual(rows, [
+            {'ID': 1, 'Name': 'a', 'Rate': 0.5, 'Enable': True, 'Items': [1, 2], 'Drops': {'x': 1}, 'Costs': [3, 4]},
+            {'ID': 2, 'Name': '测试', 'Rate': 0.0, 'Enable': False, 'Items': [], 'Drops': {}, 'Costs': [-5, 0]},
+            {'ID': 3, 'Name': 'a', 'Rate': 2.25, 'Enable': False, 'Items': [7], 'Drops': {'x': 2, 'y': 3}, 'Costs': [0, 6]},
+        ])
+        self.assertEqual(reader.strings.count('a'), 1)
+        columns = BinaryDataWriter.struct_columns(struct, Namespace(legacy=False, narrow_int=False))
+        self.assertEqual(schema_fingerprint(columns), reader.fingerprint)
+
+    def test_kv_round_trip(self):
+        struct = Struct(name='Global')
+        struct.options = {predef.PredefParseKVMode: True}
+        for col, name in enumerate(['Key', 'Type', 'Value']):
+            struct.fields.append(StructField(name=name, column=col))
+        struct.data_rows = [
+            ['Speed', 'float', '1.5'],
+            ['Title', 'string', 'hello'],
+            ['Levels', 'int[]', helper.Delim1.join(['1', '2', '3'])],
+        ]
+        reader = BinaryTableReader(BinaryDataWriter().encode(struct, Namespace(legacy=False, narrow_int=False)))
+        self.assertTrue(reader.is_kv_mode)
+        self.assertEqual(reader.read_object(), {'Speed': 1.5, 'Title': 'hello', 'Levels': [1, 2, 3]})
+        columns = BinaryDataWriter.struct_columns(struct, Namespace(legacy=False, narrow_int=False))
+        self.assertEqual(schema_fingerprint(columns), reader.fingerprint)
+
+    def test_overflow(self):
+        encoder = BinaryTableEncoder()
+        with self.assertRaises(ValueError):
+            encoder.encode([make_column('Level', 'int8')], [[300]], 1, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
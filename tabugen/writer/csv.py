@@ -10,7 +10,8 @@ import filecmp
 import shutil
 from argparse import Namespace
 import tabugen.util.helper as helper
-import tabugen.util.tableutil as tableutil
+import tabugen.util.typedvalue as typedvalue
+import tabugen.util.trace as trace
 from tabugen.structs import Struct
 
 
@@ -41,14 +42,15 @@ class CsvDataWriter:
             os.remove(tmp_filename)
         else:
             shutil.move(tmp_filename, target_filename)
-            print("wrote csv file to", target_filename)
+            helper.log("wrote csv file to", target_filename)
 
-    #
-    def parse_table(self, struct: Struct):
-        data = struct.data_rows
-        data = tableutil.validate_unique_column(struct, data)
-        data = tableutil.convert_table_data(struct, data)
-        data = tableutil.table_remove_comment_columns(struct.field_columns, data)
+    # 使用类型化的数据生成文本，不修改原始数据行
+    @staticmethod
+    def parse_table(struct: Struct, args: Namespace):
+        typed = typedvalue.get_typed_table(struct, args)
+        columns = [typed.columns[col] for col in struct.field_columns]
+        format_value = typedvalue.format_value
+        data = [[format_value(values[i]) for values in columns] for i in range(typed.row_count)]
         return [struct.field_names] + data
 
     def process(self, descriptors: list[Struct], args: Namespace):
@@ -56,13 +58,15 @@ class CsvDataWriter:
         encoding = args.data_file_encoding
         if filepath != '.':
             try:
-                print('make dir', filepath)
+                helper.log('make dir', filepath)
                 os.makedirs(filepath)
             except OSError as e:
                 pass
 
-        print('csv output path is', filepath)
+        helper.log('csv output path is', filepath)
         for struct in descriptors:
-            table = self.parse_table(struct)
+            with trace.span('encode', 'csv', struct=struct.name):
+                table = self.parse_table(struct, args)
             name = helper.camel_to_snake(struct.camel_case_name)
-            self.write_file(name, table, filepath, encoding)
+            with trace.span('write', 'csv', struct=struct.name):
+                self.write_file(name, table, filepath, encoding)
@@ -4,12 +4,11 @@
 
 import os
 import json
-import traceback
 from argparse import Namespace
-import tabugen.predef as predef
 import tabugen.typedef as types
 import tabugen.util.helper as helper
-import tabugen.util.tableutil as tableutil
+import tabugen.util.typedvalue as typedvalue
+import tabugen.util.trace as trace
 from tabugen.structs import Struct
 
 
@@ -22,141 +21,121 @@ class JsonDataWriter:
     def name():
         return "json"
 
-    @staticmethod
-    def parse_primary_value(typename: str, text: str, args: Namespace):
-        typename = typename.strip()
-        text = text.strip()
-        if typename == 'bool':
-            if len(text) == 0:
-                return False
-            return bool(text)
-        if types.is_integer_type(typename):
-            if len(text) == 0:
-                return 0
-            if args.legacy:
-                try:
-                    return int(text)
-                except ValueError:
-                    return int(text, 16)  # try hex
-            else:
-                return int(text)
-
-        if types.is_floating_type(typename):
-            if len(text) == 0:
-                return 0.0
-            return float(text)
-        return text
-
-    # 解析为数组
-    def parse_to_array(self, ele_type: str, text: str, dim: str, args: Namespace):
-        values = []
-        for item in text.split(dim):
-            value = self.parse_primary_value(ele_type, item, args)
-            values.append(value)
-        return values
-
-    # 解析为字典
-    def parse_to_dict(self, ktype: str, vtype: str, text: str, args: Namespace):
+    # 字典的字符串key转为snake_case
+    def map_keys_case(self, value):
+        if not self.use_snake_case or not isinstance(value, dict):
+            return value
         obj = {}
-        for item in text.split(helper.Delim1):
-            pair = item.split(helper.Delim2)
-            assert len(pair) == 2, item
-            key = self.parse_primary_value(ktype, pair[0], args)
-            value = self.parse_primary_value(vtype, pair[1], args)
-            if self.use_snake_case and isinstance(key, str) and not key.isdigit():
+        for key, val in value.items():
+            if isinstance(key, str) and not key.isdigit():
                 key = helper.camel_to_snake(key)
-            obj[key] = value
-        return obj
-
-    # 解析字符串为对象
-    def parse_value(self, typename: str, text: str, args: Namespace):
-        abs_type = types.is_composite_type(typename)
-        if abs_type == '':
-            return self.parse_primary_value(typename, text, args)
-
-        if abs_type == 'array':
-            elem_type = types.array_element_type(typename)
-            return self.parse_to_array(elem_type, text, helper.Delim1, args)
-        elif abs_type == 'map':
-            ktype, vtype = types.map_key_value_types(typename)
-            return self.parse_to_dict(ktype, vtype, text, args)
-
-    def parse_kv_table(self, struct: Struct, args: Namespace):
-        rows = struct.data_rows
-        obj = {}
-        keyidx = struct.get_column_index(predef.PredefKVKeyName)
-        typeidx = struct.get_column_index(predef.PredefKVTypeName)
-        valueidx = struct.get_column_index(predef.PredefKVValueName)
-        for row in rows:
-            key = row[keyidx].strip()
-            typename = row[typeidx].strip()
-            if args.legacy:
-                try:
-                    typn = int(typename)
-                    typename = types.legacy_type_to_name(typn)
-                except ValueError:
-                    pass
-            valuetext = row[valueidx].strip()
-            # print(typename, valuetext)
-            try:
-                value = self.parse_value(typename, valuetext, args)
-                if self.use_snake_case:
-                    key = helper.camel_to_snake(key)
-                obj[key] = value
-            except Exception as e:
-                print(e, traceback.format_exc())
-
+            obj[key] = val
         return obj
 
-    def parse_row_to_dict(self, struct: Struct, row: list[str], args: Namespace):
-        obj = {}
+    # 把结构编译为(字段名, 该列的值, 是否字典)列表，数组字段为(字段名, [该列的值], 是否二维数组)
+    def compile_struct(self, struct: Struct, typed: typedvalue.TypedTable):
+        fields = []
         for field in struct.fields:
-            valuetext = row[field.column]
-            value = self.parse_value(field.origin_type_name, valuetext, args)
             if self.use_snake_case:
                 name = helper.camel_to_snake(field.camel_case_name)
             else:
                 name = field.name
-            obj[name] = value
+            is_map = types.is_map_type(field.origin_type_name)
+            fields.append((name, typed.columns[field.column], is_map and self.use_snake_case))
 
+        arrays = []
         for array in struct.array_fields:
-            array_name = array.field_name
-            array_obj = []
-            for field in array.element_fields:
-                valuetext = row[field.column]
-                value = self.parse_value(field.origin_type_name, valuetext, args)
-                array_obj.append(value)
-            obj[array_name] = array_obj
+            if array.is_nested():
+                rows = [[typed.columns[field.column] for field in row] for row in array.element_rows]
+                arrays.append((array.field_name, rows, True))
+            else:
+                arrays.append((array.field_name, [typed.columns[field.column] for field in array.element_fields], False))
+        return fields, arrays
+
+    def parse_kv_table(self, typed: typedvalue.TypedTable):
+        obj = {}
+        for key, typename, value in typed.kv_items:
+            if self.use_snake_case:
+                key = helper.camel_to_snake(key)
+            obj[key] = self.map_keys_case(value)
         return obj
 
-    # 解析数据行
-    def parse_table(self, struct: Struct, args: Namespace):
-        rows = struct.data_rows
-        rows = tableutil.validate_unique_column(struct, rows)
+    def parse_row_to_dict(self, fields, arrays, i: int):
+        obj = {}
+        for name, values, is_map in fields:
+            obj[name] = self.map_keys_case(values[i]) if is_map else values[i]
+        for name, elems, nested in arrays:
+            if nested:
+                obj[name] = [[values[i] for values in row] for row in elems]
+            else:
+                obj[name] = [values[i] for values in elems]
+        return obj
 
-        dict_list = []
-        for row in rows:
-            d = self.parse_row_to_dict(struct, row, args)
-            dict_list.append(d)
-        return dict_list
+    # 逐行生成对象
+    def parse_table(self, struct: Struct, typed: typedvalue.TypedTable):
+        fields, arrays = self.compile_struct(struct, typed)
+        return (self.parse_row_to_dict(fields, arrays, i) for i in range(typed.row_count))
 
     # 生成
     def generate(self, struct: Struct, args: Namespace):
-        if struct.options[predef.PredefParseKVMode]:
-            return self.parse_kv_table(struct, args)
-        return self.parse_table(struct, args)
+        typed = typedvalue.get_typed_table(struct, args)
+        if typed.kv_mode:
+            return self.parse_kv_table(typed)
+        return self.parse_table(struct, typed)
 
-    # 写入JSON文件
-    def write_file(self, struct: Struct, filepath: str, encoding: str, json_indent: bool, obj: dict):
-        filename = "%s/%s.json" % (filepath, helper.camel_to_snake(struct.camel_case_name))
-        filename = os.path.abspath(filename)
+    # 逐行编码写入JSON文件，不在内存中生成整个文档
+    @staticmethod
+    def write_json_document(stream, obj, json_indent: bool):
+        indent = 2 if json_indent else None
+        encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, sort_keys=True, indent=indent)
+        if isinstance(obj, dict):
+            for chunk in encoder.iterencode(obj):
+                stream.write(chunk)
+            return
+
+        # 输出格式与json.dumps整个数组保持一致
         if json_indent:
-            content = json.dumps(obj, ensure_ascii=False, allow_nan=False, sort_keys=True, indent=2)
+            first_sep, sep, last_sep = '[\n  ', ',\n  ', '\n]'
         else:
-            content = json.dumps(obj, ensure_ascii=False, allow_nan=False, sort_keys=True)
+            first_sep, sep, last_sep = '[', ', ', ']'
+        count = 0
+        for row in obj:
+            text = encoder.encode(row)
+            if json_indent:
+                text = text.replace('\n', '\n  ')
+            stream.write(sep if count > 0 else first_sep)
+            stream.write(text)
+            count += 1
+        stream.write(last_sep if count > 0 else '[]')
+
+    # JSON Lines格式，每行一个对象
+    @staticmethod
+    def write_json_lines(stream, obj):
+        encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, sort_keys=True)
+        if isinstance(obj, dict):
+            obj = [obj]
+        for row in obj:
+            stream.write(encoder.encode(row))
+            stream.write('\n')
+
+    # 写入JSON文件
+    def write_file(self, struct: Struct, filepath: str, encoding: str, json_indent: bool, obj, json_lines=False):
+        ext = 'jsonl' if json_lines else 'json'
+        filename = "%s/%s.%s" % (filepath, helper.camel_to_snake(struct.camel_case_name), ext)
+        filename = os.path.abspath(filename)
+
+        # 逐行编码的同时写入临时文件，encode之外的时间是比较和替换文件
+        def write_content(stream):
+            with trace.span('encode', 'json', struct=struct.name):
+                if json_lines:
+                    self.write_json_lines(stream, obj)
+                else:
+                    self.write_json_document(stream, obj, json_indent)
 
-        if helper.save_content_if_not_same(filename, content, encoding):
-            print("wrote JSON data to", filename)
+        with trace.span('write', 'json', struct=struct.name):
+            modified = helper.save_stream_if_not_same(filename, write_content, encoding)
+        if modified:
+            helper.log("wrote JSON data to", filename)
 
     def process(self, descriptors: list[Struct], args: Namespace):
         filepath = args.out_data_path
@@ -172,7 +151,8 @@ class JsonDataWriter:
         if args.json_snake_case:
             self.use_snake_case = True
 
-        print('json output path is', filepath)
+        helper.log('json output path is', filepath)
         for struct in descriptors:
             obj = self.generate(struct, args)
-            self.write_file(struct, filepath, encoding, args.json_indent, obj)
+            self.write_file(struct, filepath, encoding, args.json_indent, obj, args.json_lines)
+